@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import re
+import sys
+from functools import lru_cache
+
+import fitz
+
+# 生成逻辑有改动时递增，使 corpus/ 下缓存的旧文档重新生成
+GENERATOR_VERSION = "1"
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN_X = 72
+# 页眉/页脚都在距页边 40pt 以内，裁剪 BAND_CM 即可完整去掉
+BAND_CM = 1.5
+BODY_TOP, BODY_BOTTOM = 60, PAGE_HEIGHT - 60
+COLUMN_GAP = 20
+LINE_GAP = 1.4
+
+# 内置的简体中文字体同时带有拉丁字符，中英文都用它绘制
+FONT = "china-s"
+
+# 正文与标题用词里不含数字，避免换行后行首出现数字被误判为编号标题
+CJK_WORDS = ["系统", "配置", "接口", "服务器", "管理", "网络", "存储", "性能", "监控", "告警",
+             "部署", "升级", "安全", "策略", "日志", "数据", "备份", "恢复", "硬件", "固件"]
+CJK_SENTENCE_END = "。"
+LATIN_WORDS = ["system", "configuration", "interface", "server", "management", "network", "storage",
+               "performance", "monitoring", "alarm", "deployment", "upgrade", "security", "policy",
+               "log", "data", "backup", "recovery", "hardware", "firmware"]
+LATIN_SENTENCE_END = "."
+
+_tokens = re.compile(r"[A-Za-z.]+ ?|[^A-Za-z ] ?")
+
+
+def corpus_name(pages, density, script, columns, bands, seed):
+    return f"v{GENERATOR_VERSION}_{script}_{pages}p_{columns}col_d{density:g}_{'bands' if bands else 'nobands'}_s{seed}"
+
+
+def _sentence(rng, script):
+    if script == "mixed":
+        script = rng.choice(["cjk", "latin"])
+    if script == "cjk":
+        return "".join(rng.choice(CJK_WORDS) for _ in range(rng.randint(6, 14))) + CJK_SENTENCE_END
+    words = [rng.choice(LATIN_WORDS) for _ in range(rng.randint(6, 14))]
+    return " ".join(words).capitalize() + LATIN_SENTENCE_END
+
+
+def _title(rng, script):
+    if script == "mixed":
+        script = rng.choice(["cjk", "latin"])
+    if script == "cjk":
+        return "".join(rng.choice(CJK_WORDS) for _ in range(rng.randint(2, 4)))
+    return " ".join(rng.choice(LATIN_WORDS) for _ in range(rng.randint(2, 3))).title()
+
+
+@lru_cache(maxsize=None)
+def _width(token, fontsize):
+    return fitz.get_text_length(token, fontname=FONT, fontsize=fontsize)
+
+
+def _wrap(text, width, fontsize):
+    """按宽度贪心折行：中文逐字，英文按词（连同其后的空格）"""
+    lines, line, used = [], "", 0.0
+    for token in _tokens.findall(text):
+        size = _width(token, fontsize)
+        if line and used + _width(token.rstrip(), fontsize) > width:
+            lines.append(line.rstrip())
+            line, used = token, size
+        else:
+            line, used = line + token, used + size
+    if line.strip():
+        lines.append(line.rstrip())
+    return lines
+
+
+class _Numbering:
+    """多级编号 1 / 1.1 / 1.1.1：下一个标题最多比当前标题深一级"""
+
+    def __init__(self):
+        self.counters = []
+
+    def next(self, rng):
+        depth = len(self.counters)
+        level = rng.choices([1, 2, 3], weights=[1, 3, 4])[0] if depth else 1
+        level = min(level, depth + 1, 3)
+        self.counters = self.counters[:level]
+        if len(self.counters) < level:
+            self.counters.append(0)
+        self.counters[-1] += 1
+        return level, ".".join(str(n) for n in self.counters)
+
+
+def generate(path, pages=50, density=0.2, script="cjk", columns=1, bands=True, seed=0):
+    """
+    生成一份合成 PDF，返回清单（manifest）：
+      - density  每段落位置出现标题的概率
+      - script   cjk / latin / mixed
+      - columns  1 或 2 栏；两栏时按栏顺序写入内容流（先左栏后右栏）
+      - bands    每页是否带页眉、页脚（页眉文字与页码），裁剪 BAND_CM 可去掉
+    清单中的 headings 为各层级标题数，作为各提取器章节数的参照。
+    """
+    rng = random.Random(seed)
+    numbering = _Numbering()
+    headings = {"1": 0, "2": 0, "3": 0}
+    usable = PAGE_WIDTH - 2 * MARGIN_X
+    column_width = (usable - COLUMN_GAP * (columns - 1)) / columns
+
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        # 整页内容画在一个 Shape 上、最后一次提交，比逐行 page.insert_text 快得多
+        shape = page.new_shape()
+        if bands:
+            shape.insert_text((MARGIN_X, 28), "页眉 Company 产品技术白皮书 公开", fontsize=9, fontname=FONT)
+            shape.draw_line((MARGIN_X, 34), (PAGE_WIDTH - MARGIN_X, 34))
+            shape.finish(width=0.5)
+            shape.insert_text((PAGE_WIDTH / 2 - 30, PAGE_HEIGHT - 22), f"第 {page_no + 1} 页 共 {pages} 页",
+                              fontsize=9, fontname=FONT)
+
+        for column in range(columns):
+            x = MARGIN_X + column * (column_width + COLUMN_GAP)
+            y = BODY_TOP
+            while True:
+                if rng.random() < density:
+                    level, number = numbering.next(rng)
+                    fontsize = {1: 15, 2: 13, 3: 11.5}[level]
+                    lines = [f"{number} {_title(rng, script)}"]
+                else:
+                    level, fontsize = 0, 10
+                    lines = _wrap(" ".join(_sentence(rng, script) for _ in range(rng.randint(1, 4))),
+                                  column_width, fontsize)
+                height = len(lines) * fontsize * LINE_GAP
+                if y + height > BODY_BOTTOM:
+                    break
+                for line in lines:
+                    y += fontsize * LINE_GAP
+                    shape.insert_text((x, y), line, fontsize=fontsize, fontname=FONT)
+                if level:
+                    headings[str(level)] += 1
+                y += fontsize * 0.6
+        shape.commit()
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+
+    manifest = {
+        "generator": GENERATOR_VERSION, "pages": pages, "density": density, "script": script,
+        "columns": columns, "bands": bands, "seed": seed,
+        "top_cm": BAND_CM if bands else 0.0, "bottom_cm": BAND_CM if bands else 0.0,
+        "headings": headings,
+    }
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def ensure(directory, **config):
+    """按配置生成（或复用已生成的）文档，返回 (PDF 路径, 清单)"""
+    config = {"pages": 50, "density": 0.2, "script": "cjk", "columns": 1, "bands": True, "seed": 0, **config}
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, corpus_name(**config) + ".pdf")
+    manifest_path = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(path) and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            return path, json.load(f)
+    return path, generate(path, **config)
+
+
+if __name__ == "__main__":
+    # python -m bench.corpus out.pdf 200 → 生成一份 200 页的默认配置文档
+    print(json.dumps(generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50), ensure_ascii=False))
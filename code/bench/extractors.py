@@ -0,0 +1,92 @@
+import os
+import shutil
+
+# 各提取器所在目录（相对 code/）、需预先导入的模块、能识别的标题层级、CSV 表头行数，以及调用方式。
+# 每个提取器都在独立子进程中、以临时目录为工作目录运行（见 worker.py），
+# 同名模块（process.py、app.py ……）互不干扰，输出写到工作目录下。
+
+
+def _remove_extraction(pdf, csv_path, top_cm, bottom_cm):
+    from Remove_extraction import extract_multilevel_from_cropped_pdf
+    extract_multilevel_from_cropped_pdf(pdf, csv_path, top_cm * 28.35, bottom_cm * 28.35)
+    return csv_path
+
+
+def _third_level(pdf, csv_path, top_cm, bottom_cm):
+    # 不裁剪页眉页脚，只收集 1.1.1 形式的三级标题
+    from ThirdlevelTitle_extraction import extract_third_level_sections
+    extract_third_level_sections(pdf, csv_path)
+    return csv_path
+
+
+def _pdf_processor(pdf, csv_path, top_cm, bottom_cm):
+    # CSV 写在 PDF 旁边，先复制到工作目录
+    from pdf_processor import process_pdf
+    local = os.path.abspath("input.pdf")
+    shutil.copy(pdf, local)
+    return process_pdf(local, top_cm, bottom_cm)
+
+
+def _process(pdf, csv_path, top_cm, bottom_cm):
+    from process import process_pdf_and_extract
+    return process_pdf_and_extract(pdf, top_cm, bottom_cm, "bench.pdf")
+
+
+def _text_main(pdf, csv_path, top_cm, bottom_cm):
+    from main import extract_to_csv
+    extract_to_csv(pdf, csv_path, int(top_cm * 28.35), int(bottom_cm * 28.35))
+    return csv_path
+
+
+class _Upload:
+    """Gradio 传给回调的上传文件只用到 save(path)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, path):
+        shutil.copy(self.path, path)
+
+
+def _text_app(pdf, csv_path, top_cm, bottom_cm):
+    from app import extract_pdf
+    csv_path, _ = extract_pdf(_Upload(pdf), top_cm, bottom_cm)
+    if not os.path.exists(csv_path):
+        # extract_pdf 出错时返回错误信息而不是路径
+        raise RuntimeError(csv_path)
+    return csv_path
+
+
+def _automatic_detection(pdf, csv_path, top_cm, bottom_cm):
+    # 页眉页脚高度自动检测，不使用传入的裁剪距离
+    import fitz
+    from Automatic_detection import detect_header_footer_heights, extract_multilevel_to_csv
+    with fitz.open(pdf) as doc:
+        crops = detect_header_footer_heights(doc)
+    extract_multilevel_to_csv(pdf, csv_path, crops)
+    return csv_path
+
+
+EXTRACTORS = {
+    "base/Remove_extraction": {"dir": "base", "module": "Remove_extraction",
+        "levels": (1, 2, 3), "header_rows": 1, "run": _remove_extraction},
+    "base/ThirdlevelTitle_extraction": {"dir": "base", "module": "ThirdlevelTitle_extraction",
+        "levels": (3,), "header_rows": 1, "run": _third_level},
+    "pdf_tool/pdf_processor": {"dir": "pdf_tool", "module": "pdf_processor",
+        "levels": (1, 2, 3), "header_rows": 1, "run": _pdf_processor},
+    "word_tool_v1/process": {"dir": "word_tool_v1", "module": "process",
+        "levels": (1, 2, 3), "header_rows": 0, "run": _process},
+    "pdf_tool_v1/process": {"dir": "pdf_tool_v1", "module": "process",
+        "levels": (1, 2, 3), "header_rows": 0, "run": _process},
+    "text/main": {"dir": "text", "module": "main",
+        "levels": (1, 2, 3), "header_rows": 1, "run": _text_main},
+    "text/app": {"dir": "text", "module": "app",
+        "levels": (1, 2, 3), "header_rows": 1, "run": _text_app},
+    "text/Automatic_detection": {"dir": "text", "module": "Automatic_detection",
+        "levels": (1, 2, 3), "header_rows": 1, "run": _automatic_detection},
+}
+
+
+def expected_sections(name, manifest):
+    """清单中该提取器能识别的各层级标题数之和"""
+    return sum(manifest["headings"][str(level)] for level in EXTRACTORS[name]["levels"])
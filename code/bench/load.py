@@ -0,0 +1,502 @@
+"""
+端到端压测：在本机临时目录里启动 word_tool_v1 / pdf_tool_v1 的 uvicorn，
+用 PDF 与 Word 混合负载驱动 /preview/、/process_batch/（随后 /download/ 结果），
+统计各接口吞吐、p50/p95/p99 延迟、错误率，以及服务进程树（含进程池、soffice）的 RSS 随时间变化。
+
+闭环（固定并发，每个虚拟用户做完一次再发下一次）或开环（按 --rate 泊松到达）：
+    python -m bench.load --app word_tool_v1 --duration 60 --concurrency 8
+    python -m bench.load --rate 4 --mix pdf=6,docx=3,doc=1 --env WORKER_PROCESSES=2
+    python -m bench.load --cache-hits 0.5          # 一半请求复用相同内容，命中结果缓存
+未安装 LibreOffice（或指定 --stub-office）时用 bench/soffice_stub.py 代替，完全离线运行。
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from collections import Counter, defaultdict
+from uuid import uuid4
+
+import httpx
+
+from bench.corpus import ensure
+from bench.run import CODE_DIR, CORPUS_DIR, RESULTS_DIR, git_revision
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各服务支持的上传类型
+APPS = {
+    "word_tool_v1": {"kinds": ("pdf", "docx", "doc")},
+    "pdf_tool_v1": {"kinds": ("pdf",)},
+}
+# 服务启动（含进程池预热）的最长等待时间（秒）
+STARTUP_TIMEOUT = 60
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def parse_weights(text):
+    """"pdf=6,docx=3" → {"pdf": 6.0, "docx": 3.0}"""
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# ---------- 负载内容 ----------
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>"""
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+_DOCX_DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _sections(sections, paragraphs):
+    """(层级, 编号, 标题, [正文段落]) 序列，编号形如 1 / 1.1 / 1.1.1"""
+    counters = [0, 0, 0]
+    for i in range(sections):
+        level = (1, 2, 3, 3, 2, 3)[i % 6]
+        counters[level - 1] += 1
+        counters[level:] = [0] * (3 - level)
+        number = ".".join(str(n) for n in counters[:level])
+        body = [f"第 {i + 1} 节正文，描述系统配置与接口管理的要求。" * 3 for _ in range(paragraphs)]
+        yield level, number, f"测试标题 {i + 1}", body
+
+
+def build_docx(sections=40, paragraphs=3):
+    """最小的 .docx：Heading1-3 样式（带大纲级别）+ 正文段落，标题文字自带编号"""
+    styles = "".join(
+        f'<w:style w:type="paragraph" w:styleId="Heading{n}"><w:name w:val="heading {n}"/>'
+        f'<w:pPr><w:outlineLvl w:val="{n - 1}"/></w:pPr></w:style>' for n in (1, 2, 3))
+    body = []
+    for level, number, title, paragraphs_ in _sections(sections, paragraphs):
+        body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading{level}"/></w:pPr>'
+                    f'<w:r><w:t>{number} {title}</w:t></w:r></w:p>')
+        body.extend(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs_)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", _DOCX_RELS)
+        z.writestr("word/_rels/document.xml.rels", _DOCX_DOCUMENT_RELS)
+        z.writestr("word/styles.xml", f'<?xml version="1.0" encoding="UTF-8"?><w:styles {_W}>{styles}</w:styles>')
+        z.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8"?>'
+                                        f'<w:document {_W}><w:body>{"".join(body)}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+def build_doc(sections=40, paragraphs=3):
+    """
+    代替 .doc 的 RTF 内容（Word 与 LibreOffice 都按内容识别，扩展名为 .doc 也能打开），
+    只能经 LibreOffice 转换，用来覆盖转换路径。
+    """
+    def rtf(text):
+        return "".join(c if ord(c) < 128 else f"\\u{ord(c)}?" for c in text)
+
+    parts = ["{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 SimSun;}}"]
+    for level, number, title, paragraphs_ in _sections(sections, paragraphs):
+        parts.append(f"{{\\pard\\outlinelevel{level - 1}\\b\\fs{32 - 4 * level} {number} {rtf(title)}\\par}}")
+        parts.extend(f"{{\\pard\\fs21 {rtf(text)}\\par}}" for text in paragraphs_)
+    parts.append("}")
+    return "\n".join(parts).encode("ascii")
+
+
+def load_payloads(pdf_pages, word_sections):
+    payloads = []
+    for pages in pdf_pages:
+        path, _ = ensure(CORPUS_DIR, pages=pages)
+        with open(path, "rb") as f:
+            payloads.append({"kind": "pdf", "name": f"load_{pages}p.pdf", "data": f.read()})
+    for sections in word_sections:
+        payloads.append({"kind": "docx", "name": f"load_{sections}s.docx", "data": build_docx(sections)})
+        payloads.append({"kind": "doc", "name": f"load_{sections}s.doc", "data": build_doc(sections)})
+    return payloads
+
+
+def unique_variant(payload, nonce):
+    """改动几个字节让内容哈希不同（不影响解析），避免压测只打到结果缓存"""
+    data = payload["data"]
+    if payload["kind"] == "pdf":
+        # %%EOF 之后的注释行会被忽略
+        return data + b"\n%" + nonce + b"\n"
+    if payload["kind"] == "docx":
+        # 改写 ZIP 末尾的注释（生成时为空，最后两个字节是注释长度）
+        return data[:-2] + len(nonce).to_bytes(2, "little") + nonce
+    return data.replace(b"{\\rtf1", b"{\\rtf1{\\*\\loadnonce " + nonce + b"}", 1)
+
+
+# ---------- 被测服务 ----------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def office_binary(work_dir, force_stub):
+    """返回 (SOFFICE_BIN, 是否为桩)；找不到 LibreOffice 时在 work_dir/bin 下生成调用 soffice_stub.py 的脚本"""
+    if not force_stub:
+        for name in (os.environ.get("SOFFICE_BIN"), "libreoffice", "soffice"):
+            if name and shutil.which(name):
+                return shutil.which(name), False
+    stub = os.path.join(work_dir, "bin", "soffice")
+    os.makedirs(os.path.dirname(stub), exist_ok=True)
+    with open(stub, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(BENCH_DIR, "soffice_stub.py")}" "$@"\n')
+    os.chmod(stub, 0o755)
+    return stub, True
+
+
+class Server:
+    """把服务目录复制到临时目录后启动 uvicorn，outputs/、缓存等都写在副本里，结束时整体删除"""
+
+    def __init__(self, app, workers=1, env=None, stub_office=False, stub_delay=0.3):
+        self.app = app
+        self.work_dir = tempfile.mkdtemp(prefix=f"load_{app}_")
+        self.app_dir = os.path.join(self.work_dir, app)
+        # 共用的 common/ 包一起复制，保持与 code/ 下相同的相对位置
+        for name in (app, "common"):
+            shutil.copytree(os.path.join(CODE_DIR, name), os.path.join(self.work_dir, name),
+                            ignore=shutil.ignore_patterns("outputs", "uploads", "cache", "tmp", "__pycache__"))
+        for name in ("outputs", "uploads"):
+            os.makedirs(os.path.join(self.app_dir, name), exist_ok=True)
+
+        self.env = {**os.environ, **(env or {})}
+        self.office = None
+        if "doc" in APPS[app]["kinds"]:
+            soffice, stubbed = office_binary(self.work_dir, stub_office)
+            self.env.update(SOFFICE_BIN=soffice, STUB_CONVERT_DELAY=str(stub_delay))
+            self.office = "stub" if stubbed else soffice
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.process = None
+        self.log_path = os.path.join(self.work_dir, "server.log")
+
+    def start(self):
+        self.log = open(self.log_path, "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=self.app_dir, env=self.env, stdout=self.log, stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if httpx.get(self.url + "/", timeout=2).status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"{self.app} 启动失败：\n{self.log_tail()}")
+
+    def log_tail(self, lines=20):
+        with open(self.log_path, encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+                self.process.wait(15)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+            except ProcessLookupError:
+                pass
+        self.log.close()
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def process_tree(root):
+    """root 及其全部子孙进程的 pid（uvicorn worker、提取进程池、soffice 都在其中）"""
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 第 2 个字段是括号里的进程名（可能含空格），其后依次为 state、ppid
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        children[ppid].append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, ()))
+    return pids
+
+
+def tree_rss_mb(root):
+    total, count = 0, 0
+    for pid in process_tree(root):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+            count += 1
+        except OSError:
+            continue
+    return total / (1024 * 1024), count
+
+
+async def sample_rss(pid, started, interval, samples):
+    while True:
+        rss, count = tree_rss_mb(pid)
+        samples.append([round(time.monotonic() - started, 2), round(rss, 1), count])
+        await asyncio.sleep(interval)
+
+
+# ---------- 负载生成 ----------
+
+class Load:
+    def __init__(self, client, payloads, args, started):
+        self.client = client
+        self.payloads = payloads
+        self.args = args
+        self.started = started
+        self.records = []
+        self.rng = random.Random(args.seed)
+        self.mix = {kind: weight for kind, weight in parse_weights(args.mix).items()
+                    if any(p["kind"] == kind for p in payloads)}
+        self.endpoints = parse_weights(args.endpoints)
+        self.form = {"top_cm": str(args.top_cm), "bottom_cm": str(args.bottom_cm)}
+
+    def pick_file(self):
+        kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        payload = self.rng.choice([p for p in self.payloads if p["kind"] == kind])
+        data = payload["data"]
+        if self.rng.random() >= self.args.cache_hits:
+            data = unique_variant(payload, uuid4().hex.encode("ascii"))
+        return payload["name"], data
+
+    async def request(self, endpoint, method, url, **kwargs):
+        start = time.monotonic()
+        record = {"endpoint": endpoint, "start": round(start - self.started, 3)}
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            record.update(status=response.status_code, bytes=len(response.content))
+            if response.status_code >= 400:
+                record["error"] = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            record.update(status=None, error=f"{type(e).__name__}: {e}"[:200])
+            response = None
+        record["latency"] = round(time.monotonic() - start, 4)
+        self.records.append(record)
+        return response
+
+    async def operation(self):
+        """一次用户操作：预览，或提交批处理后按返回的路径下载结果"""
+        endpoint = self.rng.choices(list(self.endpoints), weights=list(self.endpoints.values()))[0]
+        if endpoint == "preview":
+            await self.request("preview", "POST", "/preview/",
+                               files={"file": self.pick_file()}, data=self.form)
+            return
+        files = [("files", self.pick_file()) for _ in range(self.args.batch)]
+        response = await self.request("process_batch", "POST", "/process_batch/", files=files, data=self.form)
+        if response is None or response.status_code != 200 or \
+                not response.headers.get("content-type", "").startswith("application/json"):
+            # 多文件时 word_tool_v1 直接流式返回 ZIP，没有单独的下载步骤
+            return
+        await self.request("download", "GET", "/download/", params={"path": response.json()["path"]})
+
+    async def closed_loop(self, deadline):
+        async def user():
+            while time.monotonic() < deadline:
+                await self.operation()
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self, deadline):
+        """按泊松过程到达；在途操作达到 --concurrency 时丢弃新到达并计数（客户端侧饱和）"""
+        tasks, dropped = set(), 0
+        while True:
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+            if time.monotonic() >= deadline:
+                break
+            if len(tasks) >= self.args.concurrency:
+                dropped += 1
+                continue
+            task = asyncio.create_task(self.operation())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        return dropped
+
+
+# ---------- 统计 ----------
+
+def percentile(values, q):
+    """最近秩法，values 已排序"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))]
+
+
+def summarize(records, window):
+    latencies = sorted(r["latency"] for r in records)
+    errors = [r for r in records if "error" in r]
+    return {
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(records), 4) if records else None,
+        "throughput": round(len(records) / window, 2) if window else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "top_errors": Counter(r["error"] for r in errors).most_common(3),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def timeline(records, rss_samples, duration):
+    """每秒完成数、错误数与该秒内采到的最大 RSS"""
+    rows = [{"t": t, "completed": 0, "errors": 0, "rss_mb": None} for t in range(int(duration) + 1)]
+    for r in records:
+        row = rows[min(int(r["start"] + r["latency"]), len(rows) - 1)]
+        row["completed"] += 1
+        row["errors"] += "error" in r
+    for t, rss, _ in rss_samples:
+        row = rows[min(int(t), len(rows) - 1)]
+        row["rss_mb"] = max(row["rss_mb"] or 0, rss)
+    return rows
+
+
+async def drive(server, payloads, args):
+    started = time.monotonic()
+    rss_samples = []
+    sampler = asyncio.create_task(sample_rss(server.process.pid, started, args.sample_interval, rss_samples))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=server.url, timeout=args.request_timeout, limits=limits) as client:
+        load = Load(client, payloads, args, started)
+        deadline = started + args.warmup + args.duration
+        dropped = await load.open_loop(deadline) if args.rate else await load.closed_loop(deadline) or 0
+    elapsed = time.monotonic() - started
+    sampler.cancel()
+    rss_samples.append([round(elapsed, 2), *[round(v, 1) for v in tree_rss_mb(server.process.pid)]])
+
+    # 预热期内发出的请求不计入统计
+    measured = [r for r in load.records if r["start"] >= args.warmup]
+    window = elapsed - args.warmup
+    by_endpoint = defaultdict(list)
+    for r in measured:
+        by_endpoint[r["endpoint"]].append(r)
+    rss = [s[1] for s in rss_samples]
+    return {
+        "app": server.app,
+        "office": server.office,
+        "endpoints": {name: summarize(rs, window) for name, rs in sorted(by_endpoint.items())},
+        "overall": summarize(measured, window),
+        "dropped": dropped,
+        "rss": {"start_mb": rss[0], "peak_mb": max(rss), "end_mb": rss[-1], "samples": rss_samples},
+        "timeline": timeline(load.records, rss_samples, elapsed),
+    }
+
+
+def print_report(result):
+    office = f'（LibreOffice: {result["office"]}）' if result["office"] else ""
+    print(f'\n{result["app"]}{office}')
+    print(f'{"endpoint":<16} {"requests":>9} {"req/s":>8} {"errors":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for name, s in [*result["endpoints"].items(), ("(all)", result["overall"])]:
+        print(f'{name:<16} {s["requests"]:>9} {s["throughput"]:>8} {s["error_rate"]:>8.1%} '
+              f'{s["p50_ms"]!s:>9} {s["p95_ms"]!s:>9} {s["p99_ms"]!s:>9}')
+        for error, count in s["top_errors"] if name != "(all)" else ():
+            print(f'{"":<16} {count} × {error}')
+    rss = result["rss"]
+    print(f'RSS MB: 开始 {rss["start_mb"]}  峰值 {rss["peak_mb"]}  结束 {rss["end_mb"]}'
+          + (f'  客户端丢弃 {result["dropped"]}' if result["dropped"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI 服务端到端压测")
+    parser.add_argument("--app", action="append", choices=sorted(APPS), help="被测服务，可重复，默认全部")
+    parser.add_argument("--duration", type=float, default=30, help="统计时长（秒），不含预热")
+    parser.add_argument("--warmup", type=float, default=5, help="预热时长（秒），期间的请求不计入统计")
+    parser.add_argument("--concurrency", type=int, default=4, help="闭环时的虚拟用户数；开环时的最大在途操作数")
+    parser.add_argument("--rate", type=float, help="开环：每秒到达的操作数（泊松分布），不指定则为闭环")
+    parser.add_argument("--mix", default="pdf=6,docx=3,doc=1", help="上传类型权重；pdf_tool_v1 只用 pdf")
+    parser.add_argument("--endpoints", default="preview=1,process_batch=2",
+                        help="操作权重；process_batch 返回路径时随后请求 /download/")
+    parser.add_argument("--batch", type=int, default=1, help="每次 /process_batch/ 上传的文件数")
+    parser.add_argument("--pdf-pages", default="5,40", help="PDF 负载的页数，逗号分隔")
+    parser.add_argument("--word-sections", default="20,120", help="Word 负载的章节数，逗号分隔")
+    parser.add_argument("--cache-hits", type=float, default=0.0, help="复用相同内容（可命中结果缓存）的请求比例")
+    parser.add_argument("--top-cm", type=float, default=1.5)
+    parser.add_argument("--bottom-cm", type=float, default=1.5)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 数")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="传给服务的环境变量，如 WORKER_PROCESSES=2、OFFICE_INSTANCES=1")
+    parser.add_argument("--stub-office", action="store_true", help="即使装有 LibreOffice 也使用桩脚本")
+    parser.add_argument("--stub-delay", type=float, default=0.3, help="桩脚本每个文件的转换耗时（秒）")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="RSS 采样间隔（秒）")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果 JSON 路径，默认写到 bench/results/")
+    args = parser.parse_args()
+
+    env = dict(item.split("=", 1) for item in args.env)
+    payloads = load_payloads([int(p) for p in args.pdf_pages.split(",")],
+                             [int(s) for s in args.word_sections.split(",")])
+    results = []
+    for app in args.app or sorted(APPS):
+        server = Server(app, args.workers, env, args.stub_office, args.stub_delay)
+        try:
+            server.start()
+            result = asyncio.run(drive(server, [p for p in payloads if p["kind"] in APPS[app]["kinds"]], args))
+        finally:
+            server.stop()
+            server.cleanup()
+        results.append(result)
+        print_report(result)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {**vars(args), "env": env},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'load_{time.strftime("%Y%m%d-%H%M%S")}_{report["revision"] or "nogit"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
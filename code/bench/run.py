@@ -0,0 +1,183 @@
+"""
+提取器基准测试：生成合成 PDF，逐个提取器在独立子进程中运行，
+统计每秒页数、峰值 RSS，以及章节数与生成时记录的标题数是否一致，结果写成 JSON。
+
+在 code/ 目录下运行：
+    python -m bench.run                          # 默认语料（quick）
+    python -m bench.run --preset full            # 更大的语料
+    python -m bench.run --pages 2000 --columns 2 --script latin
+    python -m bench.run --only word_tool_v1 --baseline bench/results/上一次.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+
+from bench.corpus import ensure
+from bench.extractors import EXTRACTORS, expected_sections
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# 每秒页数比基线低于该比例、或峰值 RSS 高出该比例时视为退化
+REGRESSION_THRESHOLD = 0.1
+
+PRESETS = {
+    "quick": [
+        {"pages": 50, "script": "cjk"},
+        {"pages": 50, "script": "latin", "columns": 2},
+        {"pages": 50, "script": "mixed", "density": 0.4, "bands": False},
+    ],
+    "full": [
+        {"pages": 500, "script": "cjk"},
+        {"pages": 500, "script": "latin", "columns": 2},
+        {"pages": 500, "script": "mixed", "density": 0.4},
+        {"pages": 2000, "script": "cjk", "density": 0.1},
+    ],
+}
+
+
+def run_one(name, pdf, manifest, timeout):
+    """在临时工作目录中启动 bench.worker 子进程运行一个提取器"""
+    env = {**os.environ, "PYTHONPATH": CODE_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    with tempfile.TemporaryDirectory(prefix="bench_") as cwd:
+        try:
+            proc = subprocess.run(
+                [sys.executable, "-m", "bench.worker", name, pdf, str(manifest["top_cm"]), str(manifest["bottom_cm"])],
+                cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"error": f"timeout after {timeout}s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]}
+    return json.loads(lines[-1])
+
+
+def bench(name, pdf, manifest, repeat, timeout):
+    runs = [run_one(name, pdf, manifest, timeout) for _ in range(repeat)]
+    failed = next((r for r in runs if "seconds" not in r), None)
+    if failed is not None:
+        return failed
+    seconds = statistics.median(r["seconds"] for r in runs)
+    expected = expected_sections(name, manifest)
+    sections = runs[0]["sections"]
+    return {
+        "seconds": round(seconds, 4),
+        "pages_per_sec": round(manifest["pages"] / seconds, 1) if seconds else None,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "rss_before_mb": runs[0]["rss_before_mb"],
+        "sections": sections,
+        "expected_sections": expected,
+        "parity": sections == expected,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CODE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """与基线结果逐项比较，返回退化项的说明列表"""
+    previous = {(r["corpus"], r["extractor"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["corpus"], r["extractor"]))
+        if old is None or "pages_per_sec" not in r or "pages_per_sec" not in old:
+            continue
+        key = f'{r["extractor"]} @ {r["corpus"]}'
+        if r["pages_per_sec"] < old["pages_per_sec"] * (1 - threshold):
+            regressions.append(f'{key}: {old["pages_per_sec"]} → {r["pages_per_sec"]} 页/秒')
+        if r["peak_rss_mb"] > old["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f'{key}: 峰值 RSS {old["peak_rss_mb"]} → {r["peak_rss_mb"]} MB')
+        if old.get("parity") and not r["parity"]:
+            regressions.append(f'{key}: 章节数 {r["sections"]}，应为 {r["expected_sections"]}')
+    return regressions
+
+
+def print_header():
+    print(f'{"corpus":<42} {"extractor":<32} {"pages/s":>9} {"RSS MB":>8} {"sections":>14}')
+
+
+def print_row(r):
+    if "seconds" in r:
+        sections = f'{r["sections"]}/{r["expected_sections"]}' + ("" if r["parity"] else " ✗")
+        print(f'{r["corpus"]:<42} {r["extractor"]:<32} {r["pages_per_sec"]:>9} {r["peak_rss_mb"]:>8} {sections:>14}')
+    else:
+        print(f'{r["corpus"]:<42} {r["extractor"]:<32} {r.get("skipped") or r.get("error")}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 提取器基准测试")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--pages", type=int, help="只用一份自定义文档（以下参数同 bench.corpus.generate）")
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--script", choices=["cjk", "latin", "mixed"], default="cjk")
+    parser.add_argument("--columns", type=int, choices=[1, 2], default=1)
+    parser.add_argument("--no-bands", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", action="append", help="只运行名称中包含该字符串的提取器，可重复")
+    parser.add_argument("--repeat", type=int, default=3, help="每项运行次数，耗时取中位数")
+    parser.add_argument("--timeout", type=int, default=900)
+    parser.add_argument("--output", help="结果 JSON 路径，默认写到 bench/results/")
+    parser.add_argument("--baseline", help="与之前的结果 JSON 比较，有退化时以非零状态退出")
+    args = parser.parse_args()
+
+    if args.pages:
+        configs = [{"pages": args.pages, "density": args.density, "script": args.script,
+                    "columns": args.columns, "bands": not args.no_bands, "seed": args.seed}]
+    else:
+        configs = PRESETS[args.preset]
+    names = [name for name in EXTRACTORS if not args.only or any(s in name for s in args.only)]
+
+    results = []
+    print_header()
+    for config in configs:
+        pdf, manifest = ensure(CORPUS_DIR, **config)
+        corpus = os.path.splitext(os.path.basename(pdf))[0]
+        for name in names:
+            result = {"corpus": corpus, "extractor": name, "pages": manifest["pages"],
+                      **bench(name, pdf, manifest, args.repeat, args.timeout)}
+            results.append(result)
+            print_row(result)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}_{report["revision"] or "nogit"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print("退化:", line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+没有安装 LibreOffice 时 bench.load 用来代替 soffice 的脚本，只实现服务用到的两种调用：
+    soffice --headless --terminate_after_init ...                 预热 profile，直接退出
+    soffice --headless --convert-to pdf --outdir DIR a.doc b.docx 为每个输入写一份带编号标题的 PDF
+转换前按 STUB_CONVERT_DELAY（秒/文件）休眠，模拟真实转换的耗时。
+"""
+import os
+import sys
+import time
+
+import fitz
+
+STUB_CONVERT_DELAY = float(os.environ.get("STUB_CONVERT_DELAY", "0.3"))
+STUB_PAGES = int(os.environ.get("STUB_PAGES", "3"))
+
+
+def convert(src, out_dir):
+    doc = fitz.open()
+    for page_no in range(STUB_PAGES):
+        page = doc.new_page()
+        y = 100
+        for n in range(1, 4):
+            page.insert_text((72, y), f"{page_no + 1}.{n} Stub heading", fontsize=13)
+            page.insert_text((72, y + 20), f"stub body {os.path.basename(src)}", fontsize=10)
+            y += 60
+    doc.save(os.path.join(out_dir, os.path.splitext(os.path.basename(src))[0] + ".pdf"))
+    doc.close()
+
+
+def main(args):
+    if "--terminate_after_init" in args:
+        return 0
+    out_dir = args[args.index("--outdir") + 1]
+    skip = {args.index("--outdir") + 1, args.index("--convert-to") + 1}
+    inputs = [a for i, a in enumerate(args) if i not in skip and not a.startswith("-")]
+    for src in inputs:
+        time.sleep(STUB_CONVERT_DELAY)
+        convert(src, out_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,58 @@
+import csv
+import importlib
+import json
+import os
+import resource
+import sys
+import time
+
+import common  # noqa: F401  各提取器依赖的共用包，先导入，之后的子模块按包路径查找
+from bench.extractors import EXTRACTORS
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# code/ 只用于导入 bench 与 common 包；留在 sys.path 上会让 code/gradio 目录遮住真正的 gradio 包
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != CODE_DIR]
+
+
+def _rss_mb():
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def count_rows(csv_path, header_rows):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return sum(1 for _ in csv.reader(f)) - header_rows
+
+
+def run(name, pdf, top_cm, bottom_cm):
+    """
+    在当前进程（由 run.py 启动的子进程，工作目录为临时目录）里运行一个提取器，
+    返回耗时（只计提取本身，不含模块导入）、导入后与结束时的峰值 RSS 和章节数。
+    """
+    extractor = EXTRACTORS[name]
+    sys.path.insert(0, os.path.join(CODE_DIR, extractor["dir"]))
+    # 先导入一次，让模块级初始化（建目录、启动清理线程等）不计入耗时
+    importlib.import_module(extractor["module"])
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    csv_path = extractor["run"](pdf, os.path.abspath("output.csv"), top_cm, bottom_cm)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "sections": count_rows(csv_path, extractor["header_rows"]),
+    }
+
+
+if __name__ == "__main__":
+    name, pdf, top_cm, bottom_cm = sys.argv[1], sys.argv[2], float(sys.argv[3]), float(sys.argv[4])
+    try:
+        result = run(name, pdf, top_cm, bottom_cm)
+    except ImportError as e:
+        # 缺少可选依赖（如 gradio、pdfplumber）时跳过该提取器
+        result = {"skipped": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,5 @@
+"""
+各应用（word_tool_v1、pdf_tool_v1、text、gradio、pdf_tool）共用的模块：
+存储清理、指标、调度与准入、线程池与进程池、批处理任务、结果缓存、上传落盘、ZIP 流式打包、
+页眉页脚检测、标题识别与分节输出 CSV 等。应用统一以 `from common.xxx import ...` 导入。
+"""
@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from .metrics import QUEUE_DEPTH, HTTP_REJECTED
+
+
+def _parse_limits(value, default):
+    """"/preview/=8,/process_batch/=2" 形式的环境变量，未列出的接口取默认值"""
+    limits = dict(default)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        path, _, limit = item.rpartition("=")
+        limits[path] = int(limit)
+    return limits
+
+
+# 同时处理的重型请求总数（含流式响应发送完毕之前），0 表示不限
+ADMIT_GLOBAL = int(os.environ.get("ADMIT_GLOBAL", "8"))
+# 各接口的并发上限；只有这里列出的接口参与准入控制，其它接口（状态查询、下载、/metrics 等）不受影响
+ADMIT_LIMITS = _parse_limits(os.environ.get("ADMIT_LIMITS", ""), {
+    "/preview/": 6,
+    "/process_batch/": 2,
+    "/extract/stream": 2,
+    "/auto_crop/": 4,
+    "/documents/": 4,
+    "/jobs/": 4,
+})
+# 拿不到名额时最多排队等待的请求数，超出直接返回 429
+ADMIT_QUEUE = int(os.environ.get("ADMIT_QUEUE", "16"))
+# 排队等待的最长时间（秒），超时返回 503
+ADMIT_WAIT = float(os.environ.get("ADMIT_WAIT", "10"))
+# 429 / 503 响应里建议客户端重试的间隔（秒）
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER", "5"))
+# 单个上传文件的大小上限（MB），落盘时逐个检查，超出返回 413
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "200"))
+# 单个请求体（一次上传的全部文件及 multipart 开销）的大小上限（MB），超出返回 413；
+# 要给批量上传留出余量，默认可容纳若干个接近 MAX_UPLOAD_MB 的文件
+MAX_REQUEST_MB = int(os.environ.get("MAX_REQUEST_MB", "1024"))
+# 单个文档的页数上限，超出返回 413（批处理任务记为失败）
+MAX_PAGES = int(os.environ.get("MAX_PAGES", "5000"))
+
+
+def reject(status, detail):
+    """准入失败的响应：429 表示排队已满，503 表示排队超时，都带 Retry-After"""
+    return JSONResponse(status_code=status, content={"error": "服务繁忙，请稍后重试", "detail": detail},
+                        headers={"Retry-After": str(RETRY_AFTER)})
+
+
+def check_upload_size(size, filename):
+    if MAX_UPLOAD_MB and size > MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"文件 {filename} 超过 {MAX_UPLOAD_MB} MB")
+
+
+def check_pages(page_count):
+    if MAX_PAGES and page_count > MAX_PAGES:
+        raise HTTPException(status_code=413, detail=f"文档共 {page_count} 页，超过上限 {MAX_PAGES} 页")
+
+
+class _Gate:
+    """信号量 + 有界的等待队列；limit 为 0 时不限"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.waiting = 0
+        # 在事件循环中首次使用时才创建（Python 3.9 的 asyncio 原语会绑定创建时的事件循环）
+        self._semaphore = None
+
+    async def acquire(self, timeout):
+        """拿到名额返回 None，否则返回拒绝原因 "queue_full" / "timeout" """
+        if not self.limit:
+            return None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return None
+        if self.waiting >= ADMIT_QUEUE:
+            return "queue_full"
+        self.waiting += 1
+        QUEUE_DEPTH.inc(queue="admission")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "timeout"
+        finally:
+            self.waiting -= 1
+            QUEUE_DEPTH.dec(queue="admission")
+
+    def release(self):
+        if self.limit:
+            self._semaphore.release()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI 中间件：重型接口先按接口、再按全局取得处理名额，名额用尽时在有界队列中等待；
+    队列已满立即返回 429，等待超过 ADMIT_WAIT 返回 503，都带 Retry-After，
+    不再让突发的大批量请求把容器内存耗尽。请求体超过 MAX_REQUEST_MB 返回 413（单个文件的上限见 check_upload_size）。
+    名额一直占用到响应（包括流式 ZIP / CSV）发送完毕。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.routes = {path: _Gate(limit) for path, limit in ADMIT_LIMITS.items()}
+        self.total = _Gate(ADMIT_GLOBAL)
+
+    async def __call__(self, scope, receive, send):
+        gate = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if gate is None or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        limit = MAX_REQUEST_MB * 1024 * 1024
+        length = dict(scope.get("headers", ())).get(b"content-length")
+        if limit and length is not None and int(length) > limit:
+            HTTP_REJECTED.inc(route=path, reason="too_large")
+            return await self._too_large(scope, receive, send)
+
+        # 先取接口名额再取全局名额，顺序固定，不会互相等待
+        reason = await gate.acquire(ADMIT_WAIT)
+        if reason is None:
+            reason = await self.total.acquire(ADMIT_WAIT)
+            if reason is not None:
+                gate.release()
+        if reason is not None:
+            HTTP_REJECTED.inc(route=path, reason=reason)
+            status = 429 if reason == "queue_full" else 503
+            detail = "排队请求过多" if reason == "queue_full" else f"排队超过 {ADMIT_WAIT:g} 秒"
+            return await reject(status, detail)(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            # 没有 Content-Length（分块上传）时边收边计数
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if limit and received > limit:
+                    HTTP_REJECTED.inc(route=path, reason="too_large")
+                    raise HTTPException(status_code=413, detail=f"上传内容超过 {MAX_REQUEST_MB} MB")
+            return message
+
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            self.total.release()
+            gate.release()
+
+    async def _too_large(self, scope, receive, send):
+        response = JSONResponse(status_code=413, content={"error": "上传内容过大",
+                                                          "detail": f"请求体超过 {MAX_REQUEST_MB} MB"})
+        await response(scope, receive, send)
@@ -0,0 +1,173 @@
+import os
+import re
+import zlib
+
+import fitz
+import numpy as np
+
+# 检测逻辑有改动时递增，使缓存中按 "auto" 裁剪的旧结果失效
+DETECT_VERSION = "1"
+
+# 在整份文档中均匀分层抽样的页数
+SAMPLE_PAGES = int(os.environ.get("AUTO_CROP_SAMPLE_PAGES", "48"))
+# 页眉/页脚只在页面上下这一比例的区域内查找
+ZONE = 0.1
+# 同一位置或同一文字出现在不少于该比例的抽样页上，视为重复的页眉/页脚
+REPEAT_RATIO = 0.5
+# y 坐标量化的粒度（pt），落在同一格内视为同一位置
+Y_BIN = 2.0
+# 裁剪线在页眉/页脚与正文之间留出的最大余量（pt），实际取二者间距的一半
+PAD = 6.0
+
+# 比较文字时把数字统一替换掉，“第 3 页”和“第 4 页”视为同一页脚
+_digits = re.compile(r"\d+")
+
+
+def sample_pages(page_count, n=SAMPLE_PAGES):
+    """把文档均分成 n 段，每段取一页，保证开头、中间、结尾都能抽到"""
+    if page_count <= n:
+        return np.arange(page_count)
+    return np.unique(np.linspace(0, page_count - 1, n).round().astype(np.int64))
+
+
+def _text_hash(text):
+    return zlib.crc32(_digits.sub("#", " ".join(text.split())).encode("utf-8"))
+
+
+def collect_blocks(pdf, pages):
+    """
+    抽样页上所有文本块的坐标汇总成 NumPy 数组：
+    返回 (块数组 dict, 各抽样页宽高数组)，坐标已换算为相对页面左上角的位置。
+    """
+    sizes = np.zeros((len(pages), 2))
+    columns = {"sample": [], "y0": [], "y1": [], "hash": []}
+    for i, page_no in enumerate(pages):
+        page = pdf[int(page_no)]
+        rect = page.rect
+        sizes[i] = rect.width, rect.height
+        for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+            if block_type != 0 or not text.strip():
+                continue
+            columns["sample"].append(i)
+            columns["y0"].append(y0 - rect.y0)
+            columns["y1"].append(y1 - rect.y0)
+            columns["hash"].append(_text_hash(text))
+    blocks = {
+        "sample": np.array(columns["sample"], dtype=np.int64),
+        "y0": np.array(columns["y0"], dtype=np.float64),
+        "y1": np.array(columns["y1"], dtype=np.float64),
+        "hash": np.array(columns["hash"], dtype=np.int64),
+    }
+    return blocks, sizes
+
+
+def _page_counts(sample, key):
+    """每个块的 key 在多少个不同的抽样页上出现过"""
+    if not len(key):
+        return np.zeros(0, dtype=np.int64)
+    pairs = np.unique(np.stack([key, sample]), axis=1)
+    keys, counts = np.unique(pairs[0], return_counts=True)
+    return counts[np.searchsorted(keys, key)]
+
+
+def _edge_only(key, y0, y1, height):
+    """
+    每个块的 key 是否只出现在页面上边缘（header）/下边缘（footer）区域。
+    正文里反复出现的相同文字（如“续表”）分散在页面各处，不应算作页眉页脚。
+    """
+    keys, inverse = np.unique(key, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    lowest = np.full(len(keys), -np.inf)
+    highest = np.full(len(keys), np.inf)
+    np.maximum.at(lowest, inverse, y1)
+    np.minimum.at(highest, inverse, y0)
+    return lowest[inverse] <= height * ZONE, highest[inverse] >= height * (1 - ZONE)
+
+
+def _band_margins(y0, y1, height, header, footer):
+    """根据页眉、页脚块求 (上边距, 下边距)（pt），没有时为 0"""
+    top = bottom = 0.0
+    if header.any():
+        edge = y1[header].max()
+        below = y0[~header & (y0 >= edge)]
+        gap = below.min() - edge if len(below) else 2 * PAD
+        top = edge + min(gap / 2, PAD)
+
+    if footer.any():
+        edge = y0[footer].min()
+        above = y1[~footer & (y1 <= edge)]
+        gap = edge - above.max() if len(above) else 2 * PAD
+        bottom = height - edge + min(gap / 2, PAD)
+    return top, bottom
+
+
+class PageMargins:
+    """按页面尺寸（宽, 高，取整到 pt）给出的自动裁剪距离（cm）"""
+
+    def __init__(self, margins):
+        self.margins = margins
+
+    def lookup(self, width, height):
+        """返回 (top_cm, bottom_cm)；抽样中没出现过的尺寸不裁剪"""
+        return self.margins.get((round(width), round(height)), (0.0, 0.0))
+
+    def resolve(self, top_cm, bottom_cm, widths, heights):
+        """
+        把取值为 "auto" 的一侧换成逐页数组（与 widths/heights 一一对应），
+        数值的一侧原样保留。
+        """
+        per_page = [self.lookup(w, h) for w, h in zip(widths, heights)]
+        if top_cm == "auto":
+            top_cm = np.array([t for t, _ in per_page], dtype=np.float64)
+        if bottom_cm == "auto":
+            bottom_cm = np.array([b for _, b in per_page], dtype=np.float64)
+        return top_cm, bottom_cm
+
+    def to_list(self):
+        return [{"width": w, "height": h, "top_cm": top, "bottom_cm": bottom}
+                for (w, h), (top, bottom) in self.margins.items()]
+
+
+def detect_margins(file, sample=SAMPLE_PAGES):
+    """
+    在分层抽样的页面上统计文本块：同一 y 位置（上下边都一致）或同一文字（忽略数字）
+    在多数抽样页上重复出现、且位于页面上下边缘区域的块视为页眉/页脚。
+    不同尺寸（如横版页）的页面分别统计，返回 PageMargins。
+    file 为 PDF 路径或已打开的 fitz.Document。
+    """
+    pdf = fitz.open(file) if not isinstance(file, fitz.Document) else file
+    blocks, sizes = collect_blocks(pdf, sample_pages(pdf.page_count, sample))
+    if pdf is not file:
+        pdf.close()
+
+    size_keys = np.round(sizes).astype(np.int64)
+    groups, group_of_sample = np.unique(size_keys, axis=0, return_inverse=True)
+    group_of_sample = group_of_sample.reshape(-1)
+    margins = {}
+    for g, (width, height) in enumerate(groups.tolist()):
+        samples = np.flatnonzero(group_of_sample == g)
+        rows = np.isin(blocks["sample"], samples)
+        sample, y0, y1 = blocks["sample"][rows], blocks["y0"][rows], blocks["y1"][rows]
+        # 上下边都落在同一格的位置才算同一位置，正文段落往往起点相同但高度不同
+        bins0 = np.round(np.maximum(y0, 0) / Y_BIN).astype(np.int64)
+        bins1 = np.round(np.maximum(y1, 0) / Y_BIN).astype(np.int64)
+        band = bins0 << 32 | bins1
+        text = blocks["hash"][rows]
+        min_pages = max(2, int(np.ceil(len(samples) * REPEAT_RATIO)))
+        in_header, in_footer = y1 <= height * ZONE, y0 >= height * (1 - ZONE)
+        same_place = _page_counts(sample, band) >= min_pages
+        # 文字相同但位置略有浮动的块（如页码、每页高度不同的页眉）要求只出现在边缘区域
+        same_text = _page_counts(sample, text) >= min_pages
+        text_header, text_footer = _edge_only(text, y0, y1, height) if len(text) else (same_text, same_text)
+        header = in_header & (same_place | (same_text & text_header))
+        footer = in_footer & (same_place | (same_text & text_footer))
+        top, bottom = _band_margins(y0, y1, height, header, footer)
+        margins[(width, height)] = (round(float(top) / 28.35, 3), round(float(bottom) / 28.35, 3))
+    return PageMargins(margins)
+
+
+def crop_key(top_cm, bottom_cm):
+    """缓存键里的裁剪参数；自动裁剪时带上检测版本"""
+    if "auto" in (top_cm, bottom_cm):
+        return top_cm, bottom_cm, f"auto{DETECT_VERSION}"
+    return top_cm, bottom_cm
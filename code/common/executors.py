@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .request_profile import wrap_thread
+from .scheduler import FairScheduler
+
+# 事件循环线程只做调度，阻塞操作按类型交给各自有界的线程池，某类工作排满时不会占用其它类的线程：
+#   render  打开、渲染、解析 PDF（PyMuPDF 执行时大多持有 GIL，线程多了也不会更快）
+#   io      上传落盘、结果缓存读写、删除临时文件、读取待打包的 CSV 等文件操作
+#   office  等待 LibreOffice 转换（仅 word_tool_v1），线程数与实例数一致，多出的转换在队列中等待而不占线程
+THREADS = {
+    "render": int(os.environ.get("RENDER_THREADS", "4")),
+    "io": int(os.environ.get("IO_THREADS", "8")),
+    # LibreOffice 常驻实例数，office_pool 也从这里读取
+    "office": int(os.environ.get("OFFICE_INSTANCES", "2")),
+}
+# 只给交互请求（预览、单文件小文档等）使用的渲染线程数，批量任务再多也不会占满渲染线程池
+PRIORITY_RENDER_THREADS = int(os.environ.get("PRIORITY_RENDER_THREADS", "1"))
+RENDER_SCHEDULER = FairScheduler("render", THREADS["render"], PRIORITY_RENDER_THREADS)
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(kind):
+    """懒加载线程池（每个 uvicorn worker 进程各自一份）"""
+    with _lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            executor = _executors[kind] = ThreadPoolExecutor(
+                max_workers=THREADS[kind], thread_name_prefix=kind)
+        return executor
+
+
+async def run(kind, fn, *args):
+    """
+    在 kind 线程池中执行 fn；与 asyncio.to_thread 一样带上当前的 contextvars（指标标签、性能分析会话），
+    分析中的请求在工作线程里另开一个 cProfile（见 request_profile.wrap_thread）。
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(kind), context.run, wrap_thread(fn), *args)
+
+
+async def run_render(fn, *args):
+    """渲染任务先按通道和客户端排队（见 scheduler），拿到名额再交给渲染线程池，线程池内部不再排队"""
+    async with RENDER_SCHEDULER.slot():
+        return await run("render", fn, *args)
+
+
+async def run_io(fn, *args):
+    return await run("io", fn, *args)
+
+
+async def run_office(fn, *args):
+    return await run("office", fn, *args)
+
+
+def shutdown_executors():
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
@@ -0,0 +1,142 @@
+import os
+import re
+from collections import Counter
+
+import fitz
+
+# 标题判定方式：regex 为逐行匹配编号（默认）；font 按字号、粗细、缩进判断
+HEADING_MODE = os.environ.get("HEADING_MODE", "regex")
+# 分类规则有改动时递增，使缓存中按 font 方式提取的旧结果失效
+CLASSIFIER_VERSION = "1"
+
+heading_pattern = re.compile(r'^(\d+(\.\d+)*)(\s+)(.+)')
+
+# 字号不小于正文字号的该倍数即视为标题
+SIZE_RATIO = 1.15
+# 标题最多的字符数和行数，超过的按正文处理
+MAX_CHARS = 60
+MAX_LINES = 3
+# 左边界比正文多缩进超过该距离（pt）的编号行视为列表项
+INDENT = 8
+# 以这些符号结尾的是句子（如编号列表项），不是标题
+SENTENCE_END = tuple("。；;，,：:.!?！？")
+
+BOLD = fitz.TEXT_FONT_BOLD
+
+
+def page_blocks(page, clip=None):
+    """
+    单次 get_text("dict") 得到裁剪区域内各文本块的 (文字, 最大字号, 首行字体标志, 左边界, 行数)，
+    按 (y, x) 阅读顺序排列；文字与 get_text("blocks") 相同。
+    """
+    blocks = []
+    for block in page.get_text("dict", clip=clip, flags=fitz.TEXTFLAGS_BLOCKS)["blocks"]:
+        lines = block["lines"]
+        if not lines:
+            continue
+        texts = ["".join(span["text"] for span in line["spans"]) for line in lines]
+        sizes = [span["size"] for line in lines for span in line["spans"]]
+        spans = lines[0]["spans"]
+        x0, y0 = block["bbox"][:2]
+        blocks.append((y0, x0, ("\n".join(texts), max(sizes, default=0), spans[0]["flags"] if spans else 0,
+                                x0, len(lines))))
+    return [b[2] for b in sorted(blocks, key=lambda b: (b[0], b[1]))]
+
+
+class FontStats:
+    """逐页累加的文档级字体统计：按字符数加权的字号分布、左边界分布和粗体占比"""
+
+    def __init__(self):
+        self.sizes = Counter()
+        self.lefts = Counter()
+        self.chars = 0
+        self.bold_chars = 0
+
+    def add(self, blocks):
+        for text, size, flags, x0, _ in blocks:
+            n = len(text.strip())
+            self.sizes[round(size * 2) / 2] += n
+            self.lefts[round(x0)] += n
+            self.chars += n
+            if flags & BOLD:
+                self.bold_chars += n
+
+    @property
+    def body_size(self):
+        return self.sizes.most_common(1)[0][0] if self.sizes else 0
+
+    @property
+    def body_left(self):
+        return self.lefts.most_common(1)[0][0] if self.lefts else 0
+
+    @property
+    def body_bold(self):
+        # 正文本身就是粗体时，粗体不再作为标题的依据
+        return self.bold_chars * 2 > self.chars
+
+
+def numbering_level(text):
+    """编号标题的层级（"1" 为 1，"1.2" 为 2 ……），不是编号开头返回 0"""
+    match = heading_pattern.match(text)
+    return match.group(1).count(".") + 1 if match else 0
+
+
+class FontClassifier:
+    """
+    按字号、粗细和缩进判断标题：能识别没有编号的标题，也能排除缩进或以句号结尾的编号列表项。
+    同一文档的各页必须按顺序交给同一个实例，正文字号等统计随页累加。
+    """
+
+    def __init__(self):
+        self.stats = FontStats()
+
+    def classify(self, blocks):
+        """对一页的 page_blocks 结果逐块返回标题层级（1 起），正文为 0"""
+        stats = self.stats
+        stats.add(blocks)
+        # 正文字号等在一页之内不变，每页只统计一次
+        body = stats.body_size, stats.body_left, stats.body_bold
+        return [self.level(block, *body) for block in blocks]
+
+    def classify_pages(self, blocks, pages):
+        """blocks 为多页按顺序拼接的块，pages 为每块所在页号，返回逐块的层级"""
+        levels = []
+        start = 0
+        for i in range(1, len(blocks) + 1):
+            if i == len(blocks) or pages[i] != pages[start]:
+                levels.extend(self.classify(blocks[start:i]))
+                start = i
+        return levels
+
+    def level(self, block, body_size, body_left, body_bold):
+        text, size, flags, x0, lines = block
+        if lines > MAX_LINES or len(text) > MAX_CHARS * 2 or not body_size:
+            return 0
+        text = " ".join(text.split())
+        if not text or len(text) > MAX_CHARS:
+            return 0
+
+        ratio = size / body_size
+        bold = flags & BOLD and not body_bold
+        sentence = text.endswith(SENTENCE_END)
+        numbered = numbering_level(text)
+        if ratio >= SIZE_RATIO or (bold and not sentence):
+            pass
+        elif numbered and ratio >= 1 and not sentence and x0 <= body_left + INDENT:
+            pass
+        else:
+            return 0
+
+        if numbered:
+            return numbered
+        return 1 if ratio >= 1.5 else 2 if ratio >= 1.25 else 3
+
+
+def make_classifier(mode=HEADING_MODE):
+    """regex 方式返回 None（沿用逐行正则，不需要字体信息）"""
+    return FontClassifier() if mode == "font" else None
+
+
+def heading_key(mode=HEADING_MODE):
+    """缓存键里的标题判定方式；默认的 regex 方式不改变原有的键"""
+    return () if mode == "regex" else (f"{mode}{CLASSIFIER_VERSION}",)
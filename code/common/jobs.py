@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+import traceback
+from uuid import uuid4
+
+from .executors import run_io
+from .metrics import QUEUE_DEPTH
+from .scheduler import bind, current, unbind
+
+# 同时执行的批处理任务数；任务内部的文件仍由进程池并行处理
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+# 排队等待执行的任务数上限，超出时提交返回 429
+JOB_QUEUE = int(os.environ.get("JOB_QUEUE", "32"))
+# 已结束任务在内存中保留的时间（秒），过期后不再能查询进度
+JOB_TTL = int(os.environ.get("JOB_TTL", "3600"))
+# SSE 心跳间隔（秒）
+SSE_KEEPALIVE = 15
+
+
+class Job:
+    def __init__(self, paths, filenames, top_cm, bottom_cm, digests=None, cleanup=None):
+        self.id = uuid4().hex
+        self.paths = paths
+        self.digests = digests
+        # 任务结束（成功或失败）后调用，用于删除临时上传文件或释放文档会话
+        self.cleanup = cleanup
+        self.top_cm = top_cm
+        self.bottom_cm = bottom_cm
+        # 提交请求的客户端与调度通道，执行时沿用（见 scheduler）
+        self.client, self.lane = current()
+        self.state = "queued"  # queued / running / done / failed
+        self.files = [
+            {"name": name, "state": "queued", "pages_done": 0, "pages_total": 0, "path": None}
+            for name in filenames
+        ]
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        # 每次状态变化都替换一个新的 Event，唤醒正在等待的 SSE 订阅者
+        self._changed = asyncio.Event()
+
+    @property
+    def filenames(self):
+        return [f["name"] for f in self.files]
+
+    def notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def changed(self):
+        """返回下一次状态变化时会被 set 的 Event"""
+        return self._changed
+
+    def to_dict(self):
+        pages_total = sum(f["pages_total"] for f in self.files)
+        pages_done = sum(f["pages_done"] for f in self.files)
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "pages_done": pages_done,
+            "pages_total": pages_total,
+            "files_done": sum(f["state"] == "done" for f in self.files),
+            "files_total": len(self.files),
+            "files": self.files,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    进程内任务队列：提交后立即返回任务 ID，由后台 worker 协程依次执行。
+    process 为各应用 worker_pool 的 process_saved_files，
+    签名为 (paths, top_cm, bottom_cm, filenames, progress, digests) -> [csv_path, ...]。
+    """
+
+    def __init__(self, process, workers=JOB_WORKERS):
+        self.process = process
+        self.workers = workers
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, paths, filenames, top_cm, bottom_cm, digests=None, cleanup=None):
+        self._prune()
+        job = Job(paths, filenames, top_cm, bottom_cm, digests, cleanup)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        QUEUE_DEPTH.inc(queue="jobs")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def full(self):
+        return bool(JOB_QUEUE) and self.queue_depth() >= JOB_QUEUE
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [j.id for j in self.jobs.values() if j.finished and now - j.finished > JOB_TTL]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            QUEUE_DEPTH.dec(queue="jobs")
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        job.state = "running"
+        job.notify()
+        token = bind(job.client, job.lane)
+
+        def progress(index, **fields):
+            job.files[index].update(fields)
+            job.notify()
+
+        try:
+            csv_paths = await self.process(
+                job.paths, job.top_cm, job.bottom_cm, job.filenames,
+                progress=progress, digests=job.digests)
+            if len(csv_paths) == 1:
+                job.result = {"path": csv_paths[0], "is_zip": False}
+            else:
+                # 多个 CSV 在下载时由 /jobs/{job_id}/download 现场流式打包
+                job.result = {"path": None, "paths": csv_paths, "is_zip": True}
+            job.state = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            if job.cleanup is not None:
+                await run_io(job.cleanup)
+            job.finished = time.time()
+            job.notify()
+            unbind(token)
+
+    async def events(self, job):
+        """Server-Sent Events：每次状态变化推送一条 JSON，任务结束后关闭流"""
+        while True:
+            changed = job.changed()
+            yield f"data: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            if job.state in ("done", "failed"):
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE)
+                    break
+                except asyncio.TimeoutError:
+                    # 长时间无进度时发送注释行，防止反向代理判定连接空闲而断开
+                    yield ": keep-alive\n\n"
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import resource
+import time
+
+logger = logging.getLogger("uvicorn.error")
+
+# 请求期间采样进程树 RSS、结束后把峰值写入日志：off（默认）/ on。
+# 采样要读 /proc 下本进程和各子进程的文件，只在排查内存问题时开启
+MEM_MONITOR = os.environ.get("MEM_MONITOR", "off")
+# 采样间隔（秒）
+SAMPLE_INTERVAL = 0.05
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _child_pids():
+    pids = []
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children") as f:
+                pids.extend(f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def tree_rss():
+    """本进程 + 直接子进程（进程池 worker、LibreOffice）的 RSS 之和，单位字节"""
+    return _rss() + sum(_rss(pid) for pid in _child_pids())
+
+
+class _Sampler:
+    """
+    进程内所有进行中的请求共用一个采样任务：有请求时每 SAMPLE_INTERVAL 采样一次 tree_rss，
+    更新各请求各自的峰值；没有请求时任务退出，不再读 /proc。
+    """
+
+    def __init__(self):
+        self.peaks = {}  # 请求标记 -> 该请求期间的峰值
+        self._task = None
+
+    def track(self, start_rss):
+        token = object()
+        self.peaks[token] = start_rss
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.create_task(self._run())
+        return token
+
+    def finish(self, token):
+        return self.peaks.pop(token)
+
+    async def _run(self):
+        while self.peaks:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            rss = tree_rss()
+            for token, peak in self.peaks.items():
+                self.peaks[token] = max(peak, rss)
+
+
+_sampler = _Sampler()
+
+
+class MemoryPeakMiddleware:
+    """
+    ASGI 中间件：MEM_MONITOR 为 on 时，在 POST 请求处理期间采样进程树 RSS，结束后把峰值写入日志；
+    关闭时直接调用下游应用，没有额外开销。
+    并发请求共用一个采样任务，日志里的峰值是“该请求执行期间整个服务的峰值”。
+    """
+
+    def __init__(self, app, enabled=None):
+        self.app = app
+        self.enabled = MEM_MONITOR == "on" if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        start_rss = tree_rss()
+        token = _sampler.track(start_rss)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_rss = tree_rss()
+            peak = max(_sampler.finish(token), end_rss)
+            logger.info(
+                "%s %s: %.2fs, RSS %.1f MB -> %.1f MB, peak %.1f MB (+%.1f MB), maxrss %.1f MB",
+                scope["method"], scope["path"], time.perf_counter() - started,
+                start_rss / 2**20, end_rss / 2**20, peak / 2**20, (peak - start_rss) / 2**20,
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            )
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 阶段耗时直方图的桶上限（秒）
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# 文档页数分档，作为阶段耗时的标签（避免按具体页数产生大量时间序列）
+PAGE_BUCKETS = (10, 50, 200, 1000)
+
+# 当前请求 / 文件的 (文件类型, 页数分档)，随 asyncio 任务与 asyncio.to_thread 传递
+_file = ContextVar("metrics_file", default=("unknown", "unknown"))
+# 进程池子进程里暂存的阶段耗时，由 call_collecting 随结果带回主进程
+_pending = None
+
+
+def page_bucket(pages):
+    if pages is None:
+        return "unknown"
+    for limit in PAGE_BUCKETS:
+        if pages <= limit:
+            return f"<={limit}"
+    return f">{PAGE_BUCKETS[-1]}"
+
+
+def file_type(path):
+    return os.path.splitext(path)[1].lstrip(".").lower() or "unknown"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # 无标签的计数器/仪表从 0 开始输出，不必等到第一次更新
+        self._values = {} if self.labelnames or self.kind == "histogram" else {(): 0}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value:g}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # 各桶的计数（非累计）+ 超出最大桶的计数，以及总和
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for limit, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            le = f'le="{limit:g}"' if limit != "+Inf" else 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "doc_stage_seconds", "各处理阶段耗时（秒）", ("stage", "file_type", "pages")))
+PAGES_PROCESSED = REGISTRY.register(Counter(
+    "doc_pages_processed_total", "已提取的页数", ("file_type",)))
+FILES_PROCESSED = REGISTRY.register(Counter(
+    "doc_files_processed_total", "已提取的文件数（不含结果缓存命中）", ("file_type",)))
+UPLOAD_BYTES = REGISTRY.register(Counter(
+    "doc_upload_bytes_total", "落盘的上传文件字节数", ("file_type",)))
+HTTP_REQUESTS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（秒），到响应发送完毕为止", ("method", "route", "status")))
+HTTP_BYTES_IN = REGISTRY.register(Counter(
+    "http_request_bytes_total", "HTTP 请求体字节数", ("route",)))
+HTTP_BYTES_OUT = REGISTRY.register(Counter(
+    "http_response_bytes_total", "HTTP 响应体字节数（含流式响应）", ("route",)))
+HTTP_REJECTED = REGISTRY.register(Counter(
+    "http_requests_rejected_total", "被准入控制拒绝的请求数：queue_full 为 429，timeout 为 503，too_large 为 413",
+    ("route", "reason")))
+HTTP_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "正在处理的 HTTP 请求数"))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "queue_depth", "排队中的任务数：jobs 为待执行的批处理任务，worker_pool 为已提交到进程池未完成的任务，"
+    "office 为等待空闲 LibreOffice 实例的转换，admission 为等待准入名额的请求，"
+    "render_* / worker_pool_* 为按通道（interactive / bulk）等待执行名额的渲染与进程池任务", ("queue",)))
+
+
+def set_file(file_type=None, pages=None):
+    """设置当前任务后续阶段耗时的标签；只传其一时另一个保持不变"""
+    current_type, current_pages = _file.get()
+    _file.set((file_type or current_type, current_pages if pages is None else page_bucket(pages)))
+
+
+def observe_stage(name, seconds, file_type=None, pages=None):
+    """file_type、pages 缺省时取当前任务的标签（见 set_file）"""
+    if _pending is not None:
+        _pending.append((name, seconds))
+        return
+    current_type, current_pages = _file.get()
+    STAGE_SECONDS.observe(seconds, stage=name, file_type=file_type or current_type,
+                          pages=current_pages if pages is None else page_bucket(pages))
+
+
+@contextmanager
+def stage(name, file_type=None):
+    """记录一个阶段的耗时；在进程池子进程中先暂存，由 call_collecting 带回"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start, file_type)
+
+
+def call_collecting(fn, *args):
+    """在进程池子进程中执行 fn，返回 (结果, 执行期间记录的阶段耗时列表)"""
+    global _pending
+    _pending = []
+    try:
+        return fn(*args), _pending
+    finally:
+        _pending = None
+
+
+def record_collected(stages):
+    """主进程记录子进程带回的阶段耗时，标签取当前任务的文件类型与页数"""
+    for name, seconds in stages:
+        observe_stage(name, seconds)
+
+
+def _route(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：按路由模板统计请求耗时、状态码、请求体与响应体字节数。
+    指标保存在各 uvicorn worker 进程内，多 worker 时 /metrics 只反映处理该次抓取的进程。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        bytes_in = bytes_out = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal bytes_out, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = _route(scope)
+            if route != "/metrics":
+                HTTP_REQUESTS.observe(time.perf_counter() - started,
+                                      method=scope["method"], route=route, status=status)
+                HTTP_BYTES_IN.inc(bytes_in, route=route)
+                HTTP_BYTES_OUT.inc(bytes_out, route=route)
+
+
+def render():
+    return REGISTRY.render()
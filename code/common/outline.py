@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+# 书签模式：auto 为文档带书签时按书签切分章节（否则退回标题识别）；off 为始终按标题识别
+OUTLINE_MODE = os.environ.get("OUTLINE_MODE", "auto")
+# 书签条目少于该数量（如只有封面、目录两条）时不采用
+OUTLINE_MIN_ENTRIES = int(os.environ.get("OUTLINE_MIN_ENTRIES", "3"))
+# 切分逻辑有改动时递增，使缓存中按书签提取的旧结果失效
+OUTLINE_VERSION = "1"
+
+# 文本块顶部比书签目标点略高（目标点常落在首行文字内部）时仍归入该书签的容差（pt）
+Y_TOLERANCE = 4.0
+# 页号乘以该值再加 y 得到全文档内的位置，用于一次 searchsorted 定位
+PAGE_STRIDE = 100000.0
+
+
+def _norm(text):
+    return " ".join(text.split())
+
+
+def read_outline(pdf, mode=OUTLINE_MODE):
+    """
+    读取 doc.get_toc()，返回 [(层级, 标题, 页号（从 0 开始）, 目标 y)]；
+    只保留指向本文档页面的条目，没有书签、条目太少或 mode 为 off 时返回 []。
+    目标 y 与文本块坐标一致（页面左上角为原点），没有目标点时为 0。
+    """
+    if mode == "off":
+        return []
+    entries = []
+    for level, title, page_no, *rest in pdf.get_toc(simple=False):
+        dest = rest[0] if rest and isinstance(rest[0], dict) else {}
+        page = dest.get("page", page_no - 1)
+        if page is None or not 0 <= page < pdf.page_count:
+            continue
+        to = dest.get("to")
+        title = _norm(title)
+        if title:
+            entries.append((level, title, page, max(to.y, 0) if to is not None else 0))
+    return entries if len(entries) >= OUTLINE_MIN_ENTRIES else []
+
+
+def outline_key(mode=OUTLINE_MODE):
+    """缓存键里的书签模式；off 时不改变原有的键"""
+    return () if mode == "off" else (f"outline{OUTLINE_VERSION}",)
+
+
+def slice_outline(entries, pages, ys, texts):
+    """
+    把按阅读顺序排列的文本块（所在页号、块顶部 y、文字）按书签目标位置切分，
+    返回与 entries 一一对应的章节内容；第一个书签之前的文本丢弃。
+    目标页上有以标题开头的文本块时以该块位置为准（书签常只指定页码或指向页顶），否则用目标点；
+    章节开头与书签标题相同的文字（即标题本身）不计入内容。
+    """
+    titles = [title for _, title, _, _ in entries]
+    norm_texts = [_norm(text) for text in texts]
+    on_page = {}
+    for i, page in enumerate(pages):
+        on_page.setdefault(page, []).append(i)
+
+    positions = []
+    for _, title, page, y in entries:
+        # 目标页上以标题开头的块最能代表章节起点（多个时取离目标点最近的）
+        matches = [i for i in on_page.get(page, []) if norm_texts[i].startswith(title)]
+        if matches:
+            y = ys[min(matches, key=lambda i: abs(ys[i] - y))]
+        positions.append(page * PAGE_STRIDE + y)
+
+    # 书签顺序不一定与页面顺序一致，按位置排序后一次 searchsorted 找到每个块所属的书签
+    order = np.argsort(np.array(positions, dtype=np.float64), kind="stable")
+    sorted_positions = np.array(positions, dtype=np.float64)[order]
+    block_positions = np.array(pages, dtype=np.float64) * PAGE_STRIDE + np.array(ys, dtype=np.float64)
+    owners = np.searchsorted(sorted_positions, block_positions + Y_TOLERANCE, side="right") - 1
+
+    contents = [[] for _ in entries]
+    previous = -1
+    for i, owner in enumerate(owners.tolist()):
+        if owner < 0:
+            continue
+        entry = int(order[owner])
+        text = texts[i].strip()
+        if owner != previous:
+            # 章节的第一个块：去掉与标题相同的开头
+            if norm_texts[i].startswith(titles[entry]):
+                text = norm_texts[i][len(titles[entry]):].strip()
+            previous = owner
+        elif owner + 1 < len(order) and norm_texts[i] == titles[int(order[owner + 1])]:
+            # 目标点落在标题下方时，标题块会被归到上一节末尾
+            continue
+        if text:
+            contents[entry].append(text)
+    return [" ".join(content) for content in contents]
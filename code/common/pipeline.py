@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+# 相邻阶段之间的队列长度：下游处理不过来时上游暂停，做完但还没被取走的中间结果不会无限堆积
+PIPELINE_QUEUE = int(os.environ.get("PIPELINE_QUEUE", "4"))
+
+
+class Stage:
+    """
+    流水线的一个阶段：workers 个协程并发地从输入队列取 item，用 fn 处理后交给下一阶段。
+    batch 为 1 时 fn(item) 返回处理后的 item；大于 1 时一次最多取 batch 个（只取已在排队的，不等凑满），
+    fn(items) 返回同样多个处理后的 item。accepts(item) 为 False 的 item 跳过本阶段。
+    """
+
+    def __init__(self, name, fn, workers=1, batch=1, accepts=None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch = max(1, batch)
+        self.accepts = accepts or (lambda item: True)
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+async def run_pipeline(items, stages, queue_size=PIPELINE_QUEUE):
+    """
+    items 依次流经 stages，各阶段同时运行，整批耗时接近最慢的一个阶段，而不是各阶段之和。
+    异步生成器，按完成先后产出最后一个阶段的结果，调用方即是下一个阶段（如边收边打包）；
+    任一阶段出错时抛出该异常，调用方出错或提前停止迭代时取消其余工作。
+    """
+    items = list(items)
+    queues = [asyncio.Queue(queue_size) for _ in stages]
+    output = asyncio.Queue(queue_size)
+
+    async def forward(item, k):
+        while k < len(stages) and not stages[k].accepts(item):
+            k += 1
+        await (queues[k] if k < len(stages) else output).put(item)
+
+    async def work(k):
+        stage, queue = stages[k], queues[k]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < stage.batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                results = await stage.fn(batch) if stage.batch > 1 else [await stage.fn(batch[0])]
+            except Exception as e:
+                await output.put(_Failed(e))
+                return
+            for item in results:
+                await forward(item, k + 1)
+
+    async def feed():
+        for item in items:
+            await forward(item, 0)
+
+    tasks = [asyncio.ensure_future(feed())] + [
+        asyncio.ensure_future(work(k)) for k, stage in enumerate(stages) for _ in range(stage.workers)]
+    try:
+        for _ in items:
+            item = await output.get()
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
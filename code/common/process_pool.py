@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .executors import run_io
+from .metrics import FILES_PROCESSED, QUEUE_DEPTH, file_type, record_collected, set_file
+from .pipeline import Stage
+from .request_profile import run_in_executor
+from .result_cache import get_cache
+from .scheduler import FairScheduler
+from .sections import output_csv_path
+
+# 进程池大小：默认与 CPU 核数一致，可用环境变量 WORKER_PROCESSES 覆盖
+MAX_WORKERS = int(os.environ.get("WORKER_PROCESSES", "0")) or os.cpu_count() or 1
+# 只给交互请求（单文件小文档）使用的进程数
+PRIORITY_WORKERS = int(os.environ.get("PRIORITY_WORKERS", max(1, MAX_WORKERS // 4)))
+# 批处理流水线中同时进行的提取任务数（默认为进程池大小的两倍，下一个文件统计页数时进程池不空闲，超出的分片在 FairScheduler 中排队）
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", 2 * MAX_WORKERS))
+
+_pool = None
+_preload = []
+_scheduler = FairScheduler("worker_pool", MAX_WORKERS, PRIORITY_WORKERS)
+
+
+def preload(*modules):
+    """登记 forkserver 预先导入的应用模块（子进程要执行的函数所在的模块），需在第一次 get_pool 之前调用"""
+    _preload.extend(modules)
+
+
+def get_pool():
+    """懒加载全局进程池（每个 uvicorn worker 进程各自一份）"""
+    global _pool
+    if _pool is None:
+        # 子进程经 forkserver 启动，不直接从本进程 fork：这里有渲染/I/O 线程在跑 PyMuPDF、
+        # 可能有线程在启动 LibreOffice，fork 出的工作进程会继承其它线程持有的锁和正在创建的子进程的管道
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(_preload)
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=context)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool(fn, *args):
+    """
+    把 CPU 密集任务丢给进程池执行，不阻塞事件循环；子进程里记录的阶段耗时随结果带回，
+    请求开启了性能分析时子进程同样在 cProfile / tracemalloc 下运行（见 request_profile）。
+    任务先按通道和客户端排队（见 scheduler），拿到名额才提交，进程池内部不再排队。
+    """
+    QUEUE_DEPTH.inc(queue="worker_pool")
+    try:
+        async with _scheduler.slot():
+            result, stages = await run_in_executor(get_pool(), fn, *args)
+    finally:
+        QUEUE_DEPTH.dec(queue="worker_pool")
+    record_collected(stages)
+    return result
+
+
+def no_progress(index, **fields):
+    pass
+
+
+async def lookup_results(keys, filenames, progress=no_progress):
+    """
+    批处理的第一步：按 keys 查结果缓存，命中的复制到 outputs/ 并上报完成。
+    返回 (命中的 [(上传序号, CSV 路径)], 未命中的上传序号)。
+    """
+    cache = get_cache()
+    csv_paths = await run_io(lambda: [cache.get(key, output_csv_path(name)) for key, name in zip(keys, filenames)])
+    hits = [(i, csv_path) for i, csv_path in enumerate(csv_paths) if csv_path is not None]
+    for i, csv_path in hits:
+        progress(i, state="done", path=csv_path)
+    return hits, [i for i, csv_path in enumerate(csv_paths) if csv_path is None]
+
+
+def extract_stage(extract, keys, filenames, progress=no_progress):
+    """
+    批处理流水线的提取阶段：extract(i) 返回第 i 个文件的 CSV 路径，
+    完成后写回结果缓存、计数并上报进度，产出 (上传序号, CSV 路径)。
+    """
+    cache = get_cache()
+
+    async def run(i):
+        progress(i, state="extracting")
+        # 每个文件是独立的任务，阶段耗时按该文件的类型和页数打标签
+        set_file(file_type(filenames[i]))
+        csv_path = await extract(i)
+        await run_io(cache.put, keys[i], csv_path)
+        FILES_PROCESSED.inc(file_type=file_type(filenames[i]))
+        progress(i, state="done", path=csv_path)
+        return i, csv_path
+
+    return Stage("extract", run, EXTRACT_WORKERS)
+
+
+async def collect_results(results, count):
+    """把 iter_saved_files 按完成先后产出的 (上传序号, CSV 路径) 排回上传顺序"""
+    csv_paths = [None] * count
+    async for i, csv_path in results:
+        csv_paths[i] = csv_path
+    return csv_paths
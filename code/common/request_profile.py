@@ -0,0 +1,253 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import zipfile
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+from .metrics import call_collecting
+
+# 按请求开启性能分析的口令；未设置时该功能关闭，请求头/参数一律忽略
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+# 分析结果（ZIP）的存放目录，与 outputs/ 一样受存储 TTL 和容量管理，但不对外静态挂载
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+# 报告中列出的函数数、内存分配位置数和最慢页数
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "40"))
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 1
+# 可以开启分析的接口
+PROFILE_PATHS = ("/preview/", "/process_batch/")
+PROFILE_HEADER = "x-profile-token"
+PROFILE_QUERY = "profile"
+
+# 当前请求的分析会话，随 asyncio 任务与 asyncio.to_thread 传递
+_session = ContextVar("request_profile", default=None)
+# 同一进程同一时刻只分析一个请求：tracemalloc 是全进程的，并发分析会互相混淆
+_busy = threading.Lock()
+# 进程池子进程中记录逐页耗时的列表，不在分析时为 None
+_pages = None
+
+
+def authorized(token):
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def artifact_path(profile_id):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.zip")
+
+
+def record_page(page_no, seconds):
+    """逐页解析的耗时，只在被分析的子进程任务中记录，用于找出异常慢的页"""
+    if _pages is not None:
+        _pages.append((page_no, seconds))
+
+
+class _Stats:
+    """让 pstats.Stats.add 接受子进程带回的原始统计字典"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _top_allocations(snapshot, limit=PROFILE_TOP):
+    return [(str(stat.traceback[0]), stat.size, stat.count)
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+
+def call_profiled(fn, *args):
+    """
+    在进程池子进程中于 cProfile 与 tracemalloc 下执行 fn，
+    返回 (call_collecting 的结果, 性能统计字典, 内存分配最多的位置, 逐页耗时, 内存峰值)。
+    """
+    global _pages
+    _pages = []
+    profiler = cProfile.Profile()
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler.enable()
+    try:
+        result = call_collecting(fn, *args)
+    finally:
+        profiler.disable()
+        allocations = _top_allocations(tracemalloc.take_snapshot())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        pages, _pages = _pages, None
+    profiler.create_stats()
+    return result, profiler.stats, allocations, pages, peak
+
+
+class ProfileSession:
+    """一个被分析请求的累计结果：事件循环线程、线程池调用与进程池子进程的统计合并在一起"""
+
+    def __init__(self, path):
+        self.id = uuid4().hex
+        self.path = path
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.stats = None
+        self.allocations = {}
+        self.pages = []
+        self.peaks = []
+        self._lock = threading.Lock()
+
+    def add(self, stats, allocations=(), pages=(), task="", peak=None):
+        with self._lock:
+            if stats:
+                if self.stats is None:
+                    self.stats = pstats.Stats(_Stats(stats))
+                else:
+                    self.stats.add(_Stats(stats))
+            for site, size, count in allocations:
+                total = self.allocations.setdefault(site, [0, 0])
+                total[0] += size
+                total[1] += count
+            self.pages.extend((task, page_no, seconds) for page_no, seconds in pages)
+            if peak is not None:
+                self.peaks.append((task, peak))
+
+    def start(self):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        allocations = _top_allocations(tracemalloc.take_snapshot())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.profiler.create_stats()
+        self.add(self.profiler.stats, allocations, task="主进程", peak=peak)
+        self.seconds = time.perf_counter() - self.started
+
+    def report(self):
+        out = io.StringIO()
+        out.write(f"{self.path}  {self.seconds:.3f}s  profile {self.id}\n\n")
+        out.write("== tracemalloc 内存峰值 ==\n")
+        for task, peak in self.peaks:
+            out.write(f"{peak / 2**20:10.1f} MiB  {task}\n")
+        out.write("\n")
+        out.write(f"== 最慢的 {PROFILE_TOP} 页（进程池中逐页解析的耗时）==\n")
+        for task, page_no, seconds in sorted(self.pages, key=lambda p: -p[2])[:PROFILE_TOP]:
+            out.write(f"{seconds * 1000:10.1f} ms  第 {page_no + 1} 页  {task}\n")
+        out.write(f"\n== 结束时仍占用内存最多的 {PROFILE_TOP} 处（各进程分别统计后相加）==\n")
+        for site, (size, count) in sorted(self.allocations.items(), key=lambda a: -a[1][0])[:PROFILE_TOP]:
+            out.write(f"{size / 1024:12.1f} KiB {count:9d} 次  {site}\n")
+        out.write("\n== CPU（按累计耗时）==\n")
+        if self.stats is not None:
+            self.stats.stream = out
+            self.stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return out.getvalue()
+
+    def save(self):
+        """写出 {id}.zip：report.txt、可用 snakeviz / pstats 打开的 profile.pstats、pages.json"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = artifact_path(self.id)
+        part_path = f"{path}.part"
+        with zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("report.txt", self.report())
+            if self.stats is not None:
+                pstats_path = f"{path}.pstats"
+                self.stats.dump_stats(pstats_path)
+                z.write(pstats_path, "profile.pstats")
+                os.remove(pstats_path)
+            z.writestr("pages.json", json.dumps(
+                [{"task": task, "page": page_no, "seconds": seconds} for task, page_no, seconds in self.pages]))
+        os.replace(part_path, path)
+        return path
+
+
+def active():
+    return _session.get()
+
+
+async def run_in_executor(executor, fn, *args):
+    """
+    分析中的请求在子进程里同样开启 cProfile 与 tracemalloc，结果并入当前会话；
+    返回值与 metrics.call_collecting 相同：(结果, 阶段耗时列表)。
+    """
+    loop = asyncio.get_running_loop()
+    session = active()
+    if session is None:
+        return await loop.run_in_executor(executor, call_collecting, fn, *args)
+    result, stats, allocations, pages, peak = await loop.run_in_executor(executor, call_profiled, fn, *args)
+    session.add(stats, allocations, pages, task=f"{fn.__name__}{args[1:3]}", peak=peak)
+    return result
+
+
+def wrap_thread(fn):
+    """分析中的请求返回在工作线程里另开一个 cProfile 执行 fn 的包装，结束后并入会话；否则原样返回 fn"""
+    session = active()
+    if session is None:
+        return fn
+
+    def run(*args):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+            profiler.create_stats()
+            session.add(profiler.stats)
+
+    return run
+
+
+class ProfileMiddleware:
+    """
+    ASGI 中间件：请求带有正确的 X-Profile-Token 头（或 ?profile= 参数）时，
+    在 cProfile 与 tracemalloc 下处理该请求，响应头 X-Profile-Id 给出分析结果的编号，
+    请求结束后可通过 GET /profiles/{id}（同样需要口令）下载。
+    事件循环线程的统计会包含同一 worker 中并发的其它请求；同一时刻已有请求在分析时不再分析，
+    响应头 X-Profile-Id 为 busy。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_TOKEN or scope["path"] not in PROFILE_PATHS:
+            return await self.app(scope, receive, send)
+        if not authorized(_request_token(scope)):
+            return await self.app(scope, receive, send)
+        if not _busy.acquire(blocking=False):
+            return await self.app(scope, receive, _with_header(send, "busy"))
+
+        session = ProfileSession(scope["path"])
+        token = _session.set(session)
+        session.start()
+        try:
+            await self.app(scope, receive, _with_header(send, session.id))
+        finally:
+            session.stop()
+            _session.reset(token)
+            try:
+                await asyncio.to_thread(session.save)
+            finally:
+                _busy.release()
+
+
+def _request_token(scope):
+    for name, value in scope.get("headers", ()):
+        if name.decode("latin-1") == PROFILE_HEADER:
+            return value.decode("latin-1")
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(PROFILE_QUERY)
+    return values[0] if values else ""
+
+
+def _with_header(send, profile_id):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+        await send(message)
+    return wrapped
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from uuid import uuid4
+
+# 结果缓存目录与容量上限（MB），超出后按最近最少使用（LRU）淘汰
+CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
+CACHE_MAX_MB = int(os.environ.get("CACHE_MAX_MB", "1024"))
+
+
+def file_sha256(source, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256；source 可以是路径或可 seek 的二进制流（读完会复位）"""
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    else:
+        pos = source.tell()
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+        source.seek(pos)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """
+    内容寻址的磁盘缓存：key 由文件 SHA-256 + 裁剪参数 + 提取器版本组成，
+    value 为生成的 CSV / 预览 PNG / 文档索引文件。
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (path, size)，越靠后越新
+        self._total = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # 最近使用顺序只记在内存里，不修改缓存文件的时间：put 写入的缓存文件与 outputs/ 中的结果共用 inode，
+        # 修改它会让存储清理认为结果一直是新的。重启后按文件的访问时间近似恢复 LRU 顺序
+        files = [os.path.join(directory, name) for name in os.listdir(directory)]
+        for path in sorted(files, key=os.path.getatime):
+            if path.endswith(".tmp"):  # 上次写入中途退出留下的半成品
+                os.remove(path)
+                continue
+            key = os.path.splitext(os.path.basename(path))[0]
+            size = os.path.getsize(path)
+            self._entries[key] = (path, size)
+            self._total += size
+
+    @staticmethod
+    def make_key(digest, kind, version, *params):
+        raw = "|".join([digest, kind, str(version), *[repr(p) for p in params]])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key, dest_path):
+        """
+        命中时把缓存文件复制到 dest_path 并返回它，未命中返回 None。
+        复制而不是硬链接：outputs/ 里的文件要有自己的修改时间，存储清理才能按 TTL 正常过期。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            shutil.copyfile(entry[0], dest_path)
+        except FileNotFoundError:  # 复制前刚好被并发写入淘汰
+            return None
+        return dest_path
+
+    def read(self, key):
+        """命中时直接返回缓存文件的内容（bytes），未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            with open(entry[0], "rb") as f:
+                data = f.read()
+        except FileNotFoundError:  # 读取前刚好被并发写入淘汰
+            return None
+        return data
+
+    def put(self, key, src_path):
+        suffix = os.path.splitext(src_path)[1]
+        path = os.path.join(self.directory, key + suffix)
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        _link_or_copy(src_path, tmp_path)
+        self._commit(key, tmp_path, path)
+
+    def write(self, key, data, suffix):
+        """与 put 相同，但缓存内容直接来自内存中的 bytes"""
+        path = os.path.join(self.directory, key + suffix)
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._commit(key, tmp_path, path)
+
+    def _commit(self, key, tmp_path, path):
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[key] = (path, size)
+            self._total += size
+
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                _, (old_path, old_size) = self._entries.popitem(last=False)
+                self._total -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
@@ -0,0 +1,138 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from .metrics import QUEUE_DEPTH
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# 按客户端轮转时用来区分客户端的请求头（API Key），没有时按客户端 IP
+API_KEY_HEADER = os.environ.get("API_KEY_HEADER", "x-api-key")
+# 走交互通道的接口；其余接口默认走批量通道，单文件请求再由接口自己改到交互通道
+INTERACTIVE_PATHS = ("/preview/", "/auto_crop/", "/documents/", "/ws/preview/")
+# 单文件请求超过这个页数时改回批量通道，大文档不占用为交互请求预留的名额
+SMALL_JOB_PAGES = int(os.environ.get("SMALL_JOB_PAGES", "50"))
+
+# 当前请求的 (客户端, 通道)，随 asyncio 任务传递；批处理任务在执行时重新绑定提交时的值
+_current = ContextVar("scheduler_client", default=("", BULK))
+
+
+def current():
+    return _current.get()
+
+
+def bind(client, lane):
+    """设置当前任务的客户端与通道，返回供 unbind 恢复的 token"""
+    return _current.set((client, lane))
+
+
+def unbind(token):
+    _current.reset(token)
+
+
+def set_lane(lane):
+    client, _ = _current.get()
+    _current.set((client, lane))
+
+
+def demote_if_large(page_count):
+    """交互通道中的大文档改走批量通道"""
+    client, lane = _current.get()
+    if lane == INTERACTIVE and page_count > SMALL_JOB_PAGES:
+        _current.set((client, BULK))
+
+
+class FairScheduler:
+    """
+    在有限的执行名额（线程池 / 进程池的 worker 数）前排队：
+    交互通道优先，且 reserved 个名额只给交互通道，批量任务再多也占不满；
+    同一通道内按客户端轮转，一个客户端提交 300 个文件不会让其它客户端排在它全部文件之后。
+    批处理已按文件、按页范围分片提交，每个分片各自排队，批量任务在空闲时仍能用满其余名额。
+    """
+
+    def __init__(self, name, slots, reserved):
+        self.name = name
+        self.slots = slots
+        # 至少给批量通道留一个名额
+        self.reserved = min(reserved, slots - 1)
+        self.running = {INTERACTIVE: 0, BULK: 0}
+        self.queues = {INTERACTIVE: OrderedDict(), BULK: OrderedDict()}  # client -> deque[Future]
+
+    def _can_run(self, lane):
+        if sum(self.running.values()) >= self.slots:
+            return False
+        return lane == INTERACTIVE or self.running[BULK] < self.slots - self.reserved
+
+    async def acquire(self):
+        client, lane = current()
+        if not self.queues[lane] and self._can_run(lane):
+            self.running[lane] += 1
+            return lane
+        future = asyncio.get_running_loop().create_future()
+        self.queues[lane].setdefault(client, deque()).append(future)
+        QUEUE_DEPTH.inc(queue=f"{self.name}_{lane}")
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 刚分到名额调用方就被取消了，把名额让给下一个
+                self.release(lane)
+            raise
+        finally:
+            QUEUE_DEPTH.dec(queue=f"{self.name}_{lane}")
+        return lane
+
+    def release(self, lane):
+        self.running[lane] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for lane in (INTERACTIVE, BULK):
+            queue = self.queues[lane]
+            while queue and self._can_run(lane):
+                client, waiters = next(iter(queue.items()))
+                future = waiters.popleft()
+                # 轮到的客户端还有任务就排到队尾，下一个名额给别的客户端
+                if waiters:
+                    queue.move_to_end(client)
+                else:
+                    del queue[client]
+                if future.cancelled():
+                    continue
+                self.running[lane] += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        lane = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+
+def _client(scope):
+    for name, value in scope.get("headers", ()):
+        if name.decode("latin-1") == API_KEY_HEADER:
+            return "key:" + value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class SchedulingMiddleware:
+    """ASGI 中间件：按 API Key（或客户端 IP）与接口确定请求的客户端和通道"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        lane = INTERACTIVE if scope["path"].startswith(INTERACTIVE_PATHS) else BULK
+        token = bind(_client(scope), lane)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            unbind(token)
@@ -0,0 +1,99 @@
+import csv
+import os
+from uuid import uuid4
+
+import fitz  # PyMuPDF
+
+from .metrics import stage
+
+OUTPUT_DIR = "outputs"
+# 每个分片的页数：超过该页数的文档按页范围切片，交给多个 worker 并行提取
+SHARD_PAGES = int(os.environ.get("SHARD_PAGES", "200"))
+
+
+def open_pdf(file):
+    # 处理传入的 file 参数：可能是 BytesIO、UploadFile 或 str 路径
+    if hasattr(file, "read"):
+        return fitz.open(stream=file.read(), filetype="pdf")
+    elif isinstance(file, (bytes, bytearray)):
+        return fitz.open(stream=file, filetype="pdf")
+    elif isinstance(file, str):
+        return fitz.open(file)  # 是一个 PDF 文件路径
+    else:
+        raise TypeError(f"Unsupported file input type: {type(file)}")
+
+
+def count_pages(path):
+    with fitz.open(path) as pdf:
+        return pdf.page_count
+
+
+def page_ranges(page_count, shard_pages=SHARD_PAGES):
+    """把 [0, page_count) 切成若干个 [start, stop) 分片"""
+    return [(start, min(start + shard_pages, page_count))
+            for start in range(0, page_count, shard_pages)] or [(0, 0)]
+
+
+def merge_sections(parts):
+    """
+    按分片顺序拼接各应用 extract_page_range 的结果 (prefix, sections)，和串行的 current_heading 状态机等价：
+    分片开头的 prefix 续接到上一节；重复出现的标题会重置该标题的内容。
+    """
+    current_heading = None
+    content_dict = {}
+    for prefix, sections in parts:
+        if current_heading:
+            content_dict[current_heading] += prefix
+        for heading, content in sections:
+            current_heading = heading
+            content_dict[current_heading] = content
+    return content_dict
+
+
+def _stem(filename):
+    return os.path.basename(filename).rsplit('.', 1)[0]
+
+
+def output_csv_path(filename=None):
+    if filename is None:
+        filename = f"{uuid4().hex}"
+
+    # 加 uuid 前缀，避免不同用户同时上传同名文件时互相覆盖；前缀只出现在磁盘路径上，下载名见 download_name
+    return f"{OUTPUT_DIR}/{uuid4().hex}_{_stem(filename)}.csv"
+
+
+def download_name(csv_path):
+    """output_csv_path 生成的路径去掉 uuid 前缀，即原上传文件名对应的 CSV 文件名"""
+    name = os.path.basename(csv_path)
+    prefix, sep, rest = name.partition("_")
+    return rest if sep and len(prefix) == 32 else name
+
+
+def result_names(filenames):
+    """
+    一批上传文件各自的结果文件名（原文件名换成 .csv），用作 ZIP 成员名；
+    同一批中重名的依次改为 "name (2).csv"、"name (3).csv"，打包时不会互相覆盖。
+    """
+    names, used = [], set()
+    for filename in filenames:
+        stem = _stem(filename) or "result"
+        name, n = f"{stem}.csv", 1
+        while name in used:
+            n += 1
+            name = f"{stem} ({n}).csv"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def write_csv(content_dict, filename=None):
+    """content_dict 为 merge_sections 的结果，或按书签切分的 [[标题, 内容], ...]"""
+    csv_path = output_csv_path(filename)
+    rows = content_dict.items() if isinstance(content_dict, dict) else content_dict
+    # 使用 utf-8-sig 编码，Excel 打开不乱码
+    with stage("write_csv"), open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        for heading, content in rows:
+            writer.writerow([heading, content.strip()])
+
+    return csv_path
@@ -0,0 +1,198 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("uvicorn.error")
+
+# 产物保留时间（秒）与所有受管目录的总容量上限（MB）
+STORAGE_TTL = int(os.environ.get("STORAGE_TTL", "86400"))
+STORAGE_QUOTA_MB = int(os.environ.get("STORAGE_QUOTA_MB", "2048"))
+# 后台清理间隔（秒）
+SWEEP_INTERVAL = int(os.environ.get("STORAGE_SWEEP_INTERVAL", "300"))
+# 超出容量时只淘汰生成超过该时间（秒）的产物，避免删掉刚写出、还没来得及下载的文件
+MIN_AGE = int(os.environ.get("STORAGE_MIN_AGE", "600"))
+# 临时工作目录（Word 转换等），同样受 TTL 和容量管理
+TEMP_DIR = "tmp"
+
+
+def _entry_stat(path):
+    """返回 (总字节数, 最近修改时间)；目录按其中所有文件统计"""
+    try:
+        if not os.path.isdir(path):
+            st = os.stat(path)
+            return st.st_size, st.st_mtime
+        size, mtime = 0, os.stat(path).st_mtime
+        for dirpath, _, names in os.walk(path):
+            for name in names:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                size += st.st_size
+                mtime = max(mtime, st.st_mtime)
+        return size, mtime
+    except FileNotFoundError:
+        return 0, 0
+
+
+def discard(path):
+    """删除文件或整个目录，不存在时忽略"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class StorageManager:
+    """
+    管理若干目录下的全部产物（CSV、ZIP、上传文件、转换中间文件等）：
+    每个目录的顶层条目（文件或子目录）作为一个产物，后台线程定期清理
+    超过 TTL 的产物，总大小超出配额时再按最旧优先淘汰。
+    正在使用的路径用 pin/unpin 标记，不会被清理；以 "_" 或 "." 开头的占位文件不计入。
+    """
+
+    def __init__(self, roots, ttl=STORAGE_TTL, quota_bytes=STORAGE_QUOTA_MB * 1024 * 1024,
+                 interval=SWEEP_INTERVAL, temp_root=TEMP_DIR):
+        self.temp_root = temp_root
+        self.roots = list(dict.fromkeys([*roots, temp_root]))
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for root in self.roots:
+            os.makedirs(root, exist_ok=True)
+
+    def temp_dir(self, prefix="tmp"):
+        """在受管的临时目录下新建一个工作目录，用完可 discard，遗漏的由 TTL 兜底"""
+        return tempfile.mkdtemp(prefix=prefix, dir=self.temp_root)
+
+    def pin(self, *paths):
+        with self._lock:
+            for path in paths:
+                key = self._artifact(path)
+                self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, *paths):
+        with self._lock:
+            for path in paths:
+                key = self._artifact(path)
+                if self._pins.get(key, 0) > 1:
+                    self._pins[key] -= 1
+                else:
+                    self._pins.pop(key, None)
+
+    def _artifact(self, path):
+        # 受管目录下更深层的路径归属到其顶层条目（如 tmp/tmpxxxx/a.pdf -> tmp/tmpxxxx）
+        path = os.path.abspath(path)
+        for root in self.roots:
+            root = os.path.abspath(root)
+            if os.path.dirname(path) != root and path.startswith(root + os.sep):
+                return os.path.join(root, os.path.relpath(path, root).split(os.sep)[0])
+        return path
+
+    def _scan(self):
+        entries = []
+        for root in self.roots:
+            try:
+                names = os.listdir(root)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if name.startswith(("_", ".")):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                size, mtime = _entry_stat(path)
+                entries.append((path, root, size, mtime))
+        return entries
+
+    def sweep(self):
+        """清理一次：先删过期产物，再按最旧优先把总大小压到配额以内；返回删除的条目数"""
+        now = time.time()
+        entries = sorted(self._scan(), key=lambda e: e[3])
+        with self._lock:
+            pinned = set(self._pins)
+        total = sum(e[2] for e in entries)
+        removed = 0
+        for path, _, size, mtime in entries:
+            if path in pinned:
+                continue
+            age = now - mtime
+            if age > self.ttl or (total > self.quota_bytes and age > MIN_AGE):
+                discard(path)
+                total -= size
+                removed += 1
+                self.evicted_files += 1
+                self.evicted_bytes += size
+        self.last_sweep = now
+        if removed:
+            logger.info("storage sweep: removed %d entries, %.1f MB in use", removed, total / 2**20)
+        return removed
+
+    def usage(self):
+        entries = self._scan()
+        by_root = {root: {"bytes": 0, "entries": 0} for root in self.roots}
+        for _, root, size, _ in entries:
+            by_root[root]["bytes"] += size
+            by_root[root]["entries"] += 1
+        with self._lock:
+            pinned = len(self._pins)
+        return {
+            "bytes": sum(e[2] for e in entries),
+            "entries": len(entries),
+            "quota_bytes": self.quota_bytes,
+            "ttl": self.ttl,
+            "pinned": pinned,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "last_sweep": self.last_sweep,
+            "roots": by_root,
+        }
+
+    def start(self):
+        """启动后台清理线程（文件系统操作是阻塞的，放在线程里，FastAPI 与 Gradio 通用）"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("storage sweep failed")
+                if self._stop.wait(self.interval):
+                    return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="storage-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage(roots=("outputs", "uploads")):
+    """进程内共享的 StorageManager；roots 只在第一次调用时生效"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = StorageManager(roots)
+    return _storage
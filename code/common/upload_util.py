@@ -0,0 +1,63 @@
+import hashlib
+import os
+from uuid import uuid4
+
+from .admission import check_upload_size
+from .executors import run_io
+from .metrics import UPLOAD_BYTES, file_type, stage
+
+UPLOAD_DIR = "uploads"
+# 分块拷贝大小：上传内容按块从 Starlette 的临时文件写到 uploads/，
+# 任何时刻内存里只保留一个块，而不是整个文件的 bytes
+CHUNK_SIZE = 1024 * 1024
+
+
+def spool_upload(file, directory=UPLOAD_DIR):
+    """
+    把 UploadFile 分块落盘，同时计算 SHA-256（供结果缓存使用），避免再读一遍文件。
+    返回 (path, sha256)，后续一律按路径用 fitz.open(path) 打开。
+    文件超过 MAX_UPLOAD_MB 时删除已写入的部分并返回 413。
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid4().hex}_{os.path.basename(file.filename)}")
+    digest = hashlib.sha256()
+    kind = file_type(path)
+    size = 0
+    file.file.seek(0)
+    try:
+        with stage("upload", kind), open(path, "wb") as f:
+            for chunk in iter(lambda: file.file.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                check_upload_size(size, file.filename)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        remove_quietly(path)
+        raise
+    UPLOAD_BYTES.inc(size, file_type=kind)
+    return path, digest.hexdigest()
+
+
+async def spool_uploads(files, directory=UPLOAD_DIR):
+    """在 I/O 线程池中依次落盘多个上传文件（见 spool_upload），不阻塞事件循环；返回 [(path, sha256), ...]"""
+    return await run_io(_spool_all, files, directory)
+
+
+def _spool_all(files, directory):
+    spooled = []
+    try:
+        for file in files:
+            spooled.append(spool_upload(file, directory))
+    except BaseException:
+        # 某个文件超限或写入失败时，已落盘的文件也一并删除
+        for path, _ in spooled:
+            remove_quietly(path)
+        raise
+    return spooled
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
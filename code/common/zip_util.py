@@ -0,0 +1,77 @@
+import os
+import time
+import zipfile
+
+from .executors import run_io
+from .metrics import observe_stage
+
+# ZIP 压缩级别：0 为只打包不压缩，1-9 为 deflate 级别（越大越慢、越小）
+ZIP_COMPRESSLEVEL = int(os.environ.get("ZIP_COMPRESSLEVEL", "6"))
+# 每次从成员文件读取并压缩的字节数，压缩出的数据随即发给客户端
+ZIP_CHUNK = 1024 * 1024
+
+
+class _ZipSink:
+    """
+    ZipFile 的输出端：只支持 write，不支持 seek/tell，
+    ZipFile 会改用数据描述符（data descriptor）在成员数据之后写入 CRC 和大小，无需回填文件头。
+    写入的字节暂存在这里，由 stream_zip 取走后发给客户端。
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _copy_chunk(src, dst):
+    # 读取和 deflate 都是阻塞的，放在 I/O 线程池里执行；返回本块耗时，读完时返回 None
+    start = time.perf_counter()
+    data = src.read(ZIP_CHUNK)
+    if not data:
+        return None
+    dst.write(data)
+    return time.perf_counter() - start
+
+
+async def stream_zip(members, compresslevel=ZIP_COMPRESSLEVEL):
+    """
+    流式生成 ZIP：members 为 (成员名, 文件路径) 的异步可迭代对象，
+    每拿到一个文件就边压缩边产出字节，可直接交给 StreamingResponse。
+    整个归档既不落盘也不在内存中完整保留，前面的文件处理完即可开始下载。
+    """
+    sink = _ZipSink()
+    compression = zipfile.ZIP_DEFLATED if compresslevel > 0 else zipfile.ZIP_STORED
+    # 只累计压缩本身的耗时，不含等待成员文件提取完成和客户端接收的时间
+    elapsed = 0.0
+    with zipfile.ZipFile(sink, "w", compression=compression,
+                         compresslevel=compresslevel if compresslevel > 0 else None) as zf:
+        async for arcname, path in members:
+            src = await run_io(open, path, "rb")
+            with src, zf.open(arcname, "w") as dst:
+                while (seconds := await run_io(_copy_chunk, src, dst)) is not None:
+                    elapsed += seconds
+                    data = sink.take()
+                    if data:
+                        yield data
+            # 关闭成员时写出剩余的压缩数据和数据描述符
+            yield sink.take()
+    # 中央目录在 ZipFile 关闭时写出
+    yield sink.take()
+    observe_stage("zip", elapsed, "zip")
+
+
+async def iter_members(paths, names):
+    """已生成好的文件依次以 names 中对应的成员名打包"""
+    for name, path in zip(names, paths):
+        yield name, path
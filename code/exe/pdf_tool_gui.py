@@ -7,12 +7,22 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-def extract_pdf(input_pdf, top_percent, bottom_percent):
+def crop_rects(page, top_percent, bottom_percent):
+    """
+    返回 (提取文字用的 clip, 写入 PDF 的 cropbox)，都按未旋转的页面计算，
+    CSV 里的文字与裁剪后 PDF 上看到的内容一致。
+    """
+    box = page.cropbox
+    top_crop = box.height * top_percent / 100
+    bottom_crop = box.height * bottom_percent / 100
+    clip = fitz.Rect(0, top_crop, box.width, box.height - bottom_crop)
+    return clip, clip + (box.x0, box.y0, box.x0, box.y0)
+
+def extract_pdf(input_pdf, top_percent, bottom_percent, make_pdf=False):
     output_csv = os.path.splitext(input_pdf)[0] + "_output.csv"
     cropped_pdf = os.path.splitext(input_pdf)[0] + "_cropped.pdf"
     
     doc = fitz.open(input_pdf)
-    cropped_doc = fitz.open()
     
     with open(output_csv, 'w', newline='', encoding='utf-8-sig') as csvfile:
         writer = csv.writer(csvfile)
@@ -21,15 +31,10 @@ def extract_pdf(input_pdf, top_percent, bottom_percent):
         current_title = None
         current_content = []
 
-        for i, page in enumerate(doc):
-            h = page.rect.height
-            top_crop = h * top_percent / 100
-            bottom_crop = h * bottom_percent / 100
-            crop_rect = fitz.Rect(page.rect.x0, page.rect.y0 + top_crop, page.rect.x1, page.rect.y1 - bottom_crop)
-            text = page.get_text(clip=crop_rect)
-
-            new_page = cropped_doc.new_page(width=page.rect.width, height=crop_rect.height)
-            new_page.show_pdf_page(fitz.Rect(0, 0, page.rect.width, crop_rect.height), doc, i, clip=crop_rect)
+        # 按裁剪区域一次遍历提取文字，不生成裁剪后的页面
+        for page in doc:
+            clip, _ = crop_rects(page, top_percent, bottom_percent)
+            text = page.get_text(clip=clip)
 
             if not text:
                 continue
@@ -51,8 +56,15 @@ def extract_pdf(input_pdf, top_percent, bottom_percent):
         if current_title:
             writer.writerow([current_title, '\n'.join(clean_content(current_content))])
 
-    cropped_doc.save(cropped_pdf)
-    cropped_doc.close()
+    if not make_pdf:
+        doc.close()
+        return output_csv, None
+
+    # 裁剪后的 PDF 只在勾选时生成：只改写 cropbox，保存时回收未引用对象并压缩流
+    for page in doc:
+        _, box = crop_rects(page, top_percent, bottom_percent)
+        page.set_cropbox(box)
+    doc.save(cropped_pdf, garbage=1, deflate=True)
     doc.close()
     return output_csv, cropped_pdf
 
@@ -94,8 +106,8 @@ def run_extraction():
         return
 
     try:
-        csv_out, pdf_out = extract_pdf(path, top, bottom)
-        messagebox.showinfo("成功", f"已生成:\n{csv_out}\n{pdf_out}")
+        csv_out, pdf_out = extract_pdf(path, top, bottom, make_pdf.get())
+        messagebox.showinfo("成功", f"已生成:\n{csv_out}" + (f"\n{pdf_out}" if pdf_out else ""))
     except Exception as e:
         messagebox.showerror("错误", str(e))
 
@@ -118,6 +130,9 @@ entry_bottom = tk.Entry(root, width=10)
 entry_bottom.insert(0, "10")
 entry_bottom.grid(row=2, column=1, sticky="w")
 
-tk.Button(root, text="开始处理", command=run_extraction, bg="#4CAF50", fg="white").grid(row=3, column=1, pady=10)
+make_pdf = tk.BooleanVar(value=False)
+tk.Checkbutton(root, text="同时生成裁剪后PDF", variable=make_pdf).grid(row=3, column=1, sticky="w")
+
+tk.Button(root, text="开始处理", command=run_extraction, bg="#4CAF50", fg="white").grid(row=4, column=1, pady=10)
 
 root.mainloop()
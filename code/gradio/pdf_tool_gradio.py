@@ -5,27 +5,50 @@ import fitz  # PyMuPDF
 import pdfplumber
 import re
 import csv
-import tempfile
 import os
+import sys
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.storage import discard, get_storage
+
+# 结果文件需要保留到 Gradio 提供下载，放在受管的 tmp/ 下，由 TTL + 容量清理
+storage = get_storage(())
+
+# 同时处理的任务数；其余请求在 Gradio 队列中等待，排队数超过 GRADIO_QUEUE 时新请求直接提示队列已满
+GRADIO_CONCURRENCY = int(os.environ.get("GRADIO_CONCURRENCY", "5"))
+GRADIO_QUEUE = int(os.environ.get("GRADIO_QUEUE", "20"))
+# 单个上传文件的大小上限（MB，Gradio 按文件检查）与页数上限
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "200"))
+MAX_PAGES = int(os.environ.get("MAX_PAGES", "5000"))
 
 def process_pdf(file, top_crop, bottom_crop):
-    # 创建临时目录
-    with tempfile.TemporaryDirectory() as tmpdir:
-        input_path = os.path.join(tmpdir, "input.pdf")
-        cropped_path = os.path.join(tmpdir, "cropped.pdf")
-        csv_path = os.path.join(tmpdir, "output.csv")
+    # 创建临时目录（TemporaryDirectory 会在返回前删除结果，Gradio 就拿不到文件了）
+    tmpdir = storage.temp_dir(prefix="process_")
+    input_path = os.path.join(tmpdir, "input.pdf")
+    cropped_path = os.path.join(tmpdir, "cropped.pdf")
+    csv_path = os.path.join(tmpdir, "output.csv")
 
+    try:
         # 保存上传的文件
         with open(input_path, "wb") as f:
-            f.write(file.read())
+            f.write(file)
+        with fitz.open(input_path) as doc:
+            if MAX_PAGES and doc.page_count > MAX_PAGES:
+                raise gr.Error(f"文档共 {doc.page_count} 页，超过上限 {MAX_PAGES} 页")
 
         # Step 1: 裁剪 PDF 页眉页脚
         crop_pdf(input_path, cropped_path, top_crop, bottom_crop)
 
         # Step 2: 提取结构化内容
         extract_pdf_sections(cropped_path, csv_path)
-
-        return cropped_path, csv_path
+    except BaseException:
+        # 出错时不会有结果交给 Gradio，整个工作目录一并删除
+        discard(tmpdir)
+        raise
+    finally:
+        # 原始上传文件不再需要（页数超限等提前退出时也要删除）
+        discard(input_path)
+    return cropped_path, csv_path
 
 def crop_pdf(input_pdf, output_pdf, top_crop, bottom_crop):
     doc = fitz.open(input_pdf)
@@ -108,5 +131,13 @@ gr_interface = gr.Interface(
     description="上传 PDF，设置裁剪高度后，自动生成裁剪后的 PDF 和结构化 CSV 文件"
 )
 
+with gr.Blocks() as demo:
+    gr_interface.render()
+    with gr.Accordion("存储占用", open=False):
+        usage_output = gr.JSON()
+        gr.Button("刷新").click(fn=storage.usage, outputs=usage_output)
+
 if __name__ == "__main__":
-    gr_interface.launch()
+    storage.start()
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE).launch(
+        max_file_size=f"{MAX_UPLOAD_MB}mb")
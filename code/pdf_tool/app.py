@@ -2,10 +2,23 @@ from fastapi import FastAPI, UploadFile, Form, Request
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import os, shutil
-from pdf_processor import process_pdf
+import os, shutil, sys
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_processor import process_pdf, crop_pdf
+from common.storage import get_storage
 
 app = FastAPI()
+# output/ 下的上传文件、裁剪后的 PDF 和 CSV 按 TTL + 容量清理
+storage = get_storage(("output",))
+
+@app.on_event("startup")
+async def on_startup():
+    storage.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    storage.stop()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
@@ -25,14 +38,27 @@ async def process_pdf_endpoint(
     with open(temp_path, "wb") as f:
         shutil.copyfileobj(file.file, f)
 
-    cropped_pdf, csv_file = process_pdf(temp_path, top_cm, bottom_cm)
+    csv_file = process_pdf(temp_path, top_cm, bottom_cm)
 
+    # 裁剪后的 PDF 不在这里生成，点击下载链接时再由 /cropped/ 生成
     return templates.TemplateResponse("index.html", {
         "request": request,
-        "pdf_path": cropped_pdf,
-        "csv_path": csv_file
+        "pdf_path": temp_path,
+        "csv_path": csv_file,
+        "top_cm": top_cm,
+        "bottom_cm": bottom_cm
     })
 
+@app.get("/storage/usage")
+def storage_usage():
+    return storage.usage()
+
+@app.get("/cropped/")
+def download_cropped(path: str, top_cm: float, bottom_cm: float):
+    """按需生成并下载裁剪后的 PDF，path 为 /process/ 保存的上传文件"""
+    cropped_pdf = crop_pdf(f"output/{os.path.basename(path)}", top_cm, bottom_cm)
+    return FileResponse(cropped_pdf, filename=os.path.basename(cropped_pdf), media_type='application/pdf')
+
 @app.get("/download/")
 def download_file(path: str):
     return FileResponse(path, filename=os.path.basename(path), media_type='application/octet-stream')
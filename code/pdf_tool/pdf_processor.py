@@ -1,26 +1,29 @@
 import fitz  # PyMuPDF
-import pdfplumber
 import re
 import csv
 import os
+from uuid import uuid4
+
+
+def crop_rects(page, top_px, bottom_px):
+    """
+    返回 (提取文字用的 clip, 写入 PDF 的 cropbox)。
+    两者都按未旋转的页面计算：clip 相对当前裁剪框左上角，cropbox 为 mediabox 坐标，
+    这样 CSV 里的文字与裁剪后 PDF 上看到的内容一致。
+    """
+    box = page.cropbox
+    clip = fitz.Rect(0, top_px, box.width, box.height - bottom_px)
+    return clip, clip + (box.x0, box.y0, box.x0, box.y0)
+
 
 def process_pdf(pdf_path: str, top_cm: float, bottom_cm: float):
+    """用 PyMuPDF 按裁剪区域一次遍历提取标题和内容，返回 CSV 路径；不生成裁剪后的 PDF"""
     # 单位换算
     top_px = int(top_cm * 28.35)
     bottom_px = int(bottom_cm * 28.35)
 
-    cropped_path = pdf_path.replace(".pdf", "_cropped.pdf")
     csv_path = pdf_path.replace(".pdf", ".csv")
 
-    # 裁剪 PDF
-    doc = fitz.open(pdf_path)
-    for page in doc:
-        rect = page.rect
-        crop_rect = fitz.Rect(rect.x0, rect.y0 + top_px, rect.x1, rect.y1 - bottom_px)
-        page.set_cropbox(crop_rect)
-    doc.save(cropped_path)
-    doc.close()
-
     # 提取结构化信息
     with open(csv_path, "w", newline='', encoding='utf-8-sig') as f:
         writer = csv.writer(f)
@@ -29,9 +32,10 @@ def process_pdf(pdf_path: str, top_cm: float, bottom_cm: float):
         current_title = None
         current_content = []
 
-        with pdfplumber.open(cropped_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                clip, _ = crop_rects(page, top_px, bottom_px)
+                text = page.get_text(clip=clip)
                 if not text:
                     continue
                 for line in text.split('\n'):
@@ -48,7 +52,30 @@ def process_pdf(pdf_path: str, top_cm: float, bottom_cm: float):
         if current_title:
             writer.writerow([current_title, '\n'.join(current_content)])
 
-    return cropped_path, csv_path
+    return csv_path
+
+
+def crop_pdf(pdf_path: str, top_cm: float, bottom_cm: float):
+    """
+    需要下载时才生成裁剪后的 PDF：只改写每页的 cropbox，不复制页面内容，
+    保存时回收未引用对象并压缩流，已生成过的直接复用。
+    """
+    top_px = int(top_cm * 28.35)
+    bottom_px = int(bottom_cm * 28.35)
+    cropped_path = pdf_path.replace(".pdf", f"_cropped_{top_px}_{bottom_px}.pdf")
+    if os.path.exists(cropped_path):
+        return cropped_path
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            _, box = crop_rects(page, top_px, bottom_px)
+            page.set_cropbox(box)
+        # 先写临时文件再改名，同时请求同一份裁剪结果时不会读到写了一半的文件
+        part_path = f"{cropped_path}.{uuid4().hex}.part"
+        doc.save(part_path, garbage=1, deflate=True)
+    os.replace(part_path, cropped_path)
+    return cropped_path
+
 
 def is_heading(line):
     if len(line) > 50:
@@ -1,12 +1,29 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, Form, Query, Request, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import List, Literal, Union
+import traceback
 import os
-from process import process_pdf_and_extract
-from preview import generate_preview_image
-from zip_util import zip_csvs
+import sys
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.auto_crop import crop_key
+from preview import generate_preview_image, PREVIEW_VERSION
+from common.result_cache import get_cache
+from common.zip_util import ZIP_COMPRESSLEVEL, iter_members, stream_zip
+from common.sections import download_name, result_names
+from worker_pool import iter_saved_files, process_saved_files
+from common.process_pool import shutdown_pool
+from common.jobs import JobManager
+from common.upload_util import spool_uploads, remove_quietly
+from common.executors import run_io, run_render, shutdown_executors
+from common.mem_monitor import MemoryPeakMiddleware
+from common.admission import AdmissionMiddleware, reject
+from common.scheduler import INTERACTIVE, SchedulingMiddleware, set_lane
+from common.metrics import HTTP_REJECTED, MetricsMiddleware, file_type, set_file, render as render_metrics
+from common.request_profile import PROFILE_DIR, PROFILE_HEADER, ProfileMiddleware, artifact_path, authorized
+from common.storage import get_storage
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -16,30 +33,198 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
+app.add_middleware(MemoryPeakMiddleware)
+# 在指标中间件之内：被拒绝的请求同样计入请求耗时与状态码
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(SchedulingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfileMiddleware)
+
+# 首页在启动时读入内存，之后每次请求不再读盘
+with open("static/index.html", "r", encoding="utf-8") as f:
+    INDEX_HTML = f.read()
+
+job_manager = JobManager(process_saved_files)
+# outputs/、uploads/ 及性能分析结果的 TTL + 容量管理
+storage = get_storage(("outputs", "uploads", PROFILE_DIR))
+
+@app.on_event("startup")
+async def on_startup():
+    job_manager.start()
+    storage.start()
+    # 结果缓存首次创建时会扫描缓存目录，提前在 I/O 线程池中完成
+    await run_io(get_cache)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_manager.stop()
+    storage.stop()
+    shutdown_pool()
+    shutdown_executors()
 
 @app.get("/")
 async def root():
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+    return HTMLResponse(content=INDEX_HTML, status_code=200)
+
+# 裁剪距离（cm）；"auto" 表示按自动检测的页眉页脚高度裁剪
+CropCm = Union[float, Literal["auto"]]
+
 
 @app.post("/preview/")
-async def preview(file: UploadFile = File(...), top_cm: float = Form(...), bottom_cm: float = Form(...)):
-    preview_path = generate_preview_image(file, top_cm, bottom_cm)
-    return {"preview_path": preview_path}
+async def preview(file: UploadFile = File(...), top_cm: CropCm = Form(...), bottom_cm: CropCm = Form(...)):
+    set_file(file_type(file.filename))
+    # 分块落盘并顺带计算哈希，按路径打开 PDF，不在内存里保留整份文件
+    [(upload_path, digest)] = await spool_uploads([file])
+    try:
+        cache = get_cache()
+        key = cache.make_key(digest, "preview", PREVIEW_VERSION, *crop_key(top_cm, bottom_cm))
+        # 预览直接返回 PNG 内容，命中缓存时也不再往 outputs/ 写文件
+        png = await run_io(cache.read, key)
+        if png is None:
+            png = await run_render(generate_preview_image, upload_path, top_cm, bottom_cm)
+            await run_io(cache.write, key, png, ".png")
+        return Response(content=png, media_type="image/png")
+    finally:
+        await run_io(remove_quietly, upload_path)
+
+ZIP_HEADERS = {"Content-Disposition": "attachment; filename=csvs.zip", "X-Accel-Buffering": "no"}
 
 @app.post("/process_batch/")
-async def process_batch(files: List[UploadFile] = File(...), top_cm: float = Form(...), bottom_cm: float = Form(...)):
-    csv_paths = []
-    for file in files:
-        csv_path = process_pdf_and_extract(file, top_cm, bottom_cm)
-        csv_paths.append(csv_path)
-
-    if len(csv_paths) == 1:
-        return {"path": csv_paths[0], "is_zip": False}
-    else:
-        zip_path = zip_csvs(csv_paths)
-        return {"path": zip_path, "is_zip": True}
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    top_cm: CropCm = Form(...),
+    bottom_cm: CropCm = Form(...),
+    compresslevel: int = Form(ZIP_COMPRESSLEVEL, ge=0, le=9)
+):
+    """
+    单个文件返回 CSV 路径（JSON）；多个文件直接流式返回 ZIP，
+    每个文件提取完成即写入压缩包发出，不在 outputs/ 生成完整的 ZIP。
+    ZIP 开始发送后再出错只能中断连接，客户端会得到不完整的压缩包。
+    """
+    spooled = await spool_uploads(files)
+    if len(files) == 1:
+        # 单文件请求走交互通道，得知页数后大文档再改回批量通道（见 worker_pool.extract_in_pool）
+        set_lane(INTERACTIVE)
+    paths = [path for path, _ in spooled]
+
+    def cleanup():
+        for path in paths:
+            remove_quietly(path)
+
+    # 先查结果缓存，未命中的交给进程池并行处理，按完成先后产出
+    filenames = [file.filename for file in files]
+    results = iter_saved_files(paths, top_cm, bottom_cm, filenames, digests=[digest for _, digest in spooled])
+    try:
+        # 等第一个文件完成再开始响应，早期错误仍能返回错误状态码
+        first = await results.__anext__()
+    except BaseException:
+        await results.aclose()
+        await run_io(cleanup)
+        raise
+
+    if len(paths) == 1:
+        await results.aclose()
+        await run_io(cleanup)
+        return {"path": first[1], "is_zip": False}
+
+    # ZIP 成员名取自原上传文件名，磁盘上的 uuid 前缀不出现在压缩包里
+    names = result_names(filenames)
+
+    async def members():
+        yield names[first[0]], first[1]
+        async for i, csv_path in results:
+            yield names[i], csv_path
+
+    async def body():
+        # 提取与打包流水线并行：每完成一个文件就压缩发出
+        try:
+            async for chunk in stream_zip(members(), compresslevel):
+                yield chunk
+        except Exception:
+            traceback.print_exc()
+            raise
+        finally:
+            await results.aclose()
+            await run_io(cleanup)
+
+    return StreamingResponse(body(), media_type="application/zip", headers=ZIP_HEADERS)
+
+@app.post("/jobs/")
+async def submit_job(files: List[UploadFile] = File(...), top_cm: CropCm = Form(...), bottom_cm: CropCm = Form(...)):
+    if job_manager.full():
+        # 排队的任务已达上限时不再接收上传，避免积压的上传文件占满磁盘与内存
+        HTTP_REJECTED.inc(route="/jobs/", reason="queue_full")
+        return reject(429, "待执行的批处理任务过多")
+    spooled = await spool_uploads(files)
+    if len(files) == 1:
+        set_lane(INTERACTIVE)
+    paths = [path for path, _ in spooled]
+    # 排队期间上传文件不参与存储清理，任务结束后删除
+    storage.pin(*paths)
+
+    def cleanup():
+        storage.unpin(*paths)
+        for path in paths:
+            remove_quietly(path)
+
+    job = job_manager.submit(
+        paths, [file.filename for file in files], top_cm, bottom_cm,
+        digests=[digest for _, digest in spooled], cleanup=cleanup)
+    return {"job_id": job.id}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "任务不存在或已过期"})
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "任务不存在或已过期"})
+    return StreamingResponse(
+        job_manager.events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/{job_id}/download")
+async def job_download(job_id: str, compresslevel: int = Query(ZIP_COMPRESSLEVEL, ge=0, le=9)):
+    """多文件任务的结果：把各 CSV 现场打包成 ZIP 流式下载，不在磁盘上保留压缩包"""
+    job = job_manager.get(job_id)
+    if job is None or job.state != "done":
+        return JSONResponse(status_code=404, content={"error": "任务不存在、已过期或未完成"})
+    if not job.result["is_zip"]:
+        return FileResponse(job.result["path"], filename=result_names(job.filenames)[0])
+    return StreamingResponse(
+        stream_zip(iter_members(job.result["paths"], result_names(job.filenames)), compresslevel),
+        media_type="application/zip", headers=ZIP_HEADERS)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return get_cache().stats()
+
+@app.get("/storage/usage")
+async def storage_usage():
+    return await run_io(storage.usage)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标（本 uvicorn worker 进程内的统计）"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request, profile: str = Query("")):
+    """下载按请求生成的性能分析结果（见 request_profile），需要与开启分析时相同的口令"""
+    if not authorized(request.headers.get(PROFILE_HEADER, profile)):
+        raise HTTPException(status_code=403, detail="口令错误或未开启性能分析")
+    path = artifact_path(os.path.basename(profile_id))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="分析结果不存在、已过期或请求尚未结束")
+    return FileResponse(path, filename=f"profile_{os.path.basename(profile_id)}.zip")
 
 @app.get("/download/")
 async def download(path: str):
-    return FileResponse(path, filename=os.path.basename(path))
+    return FileResponse(path, filename=download_name(path))
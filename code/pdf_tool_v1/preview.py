@@ -1,17 +1,33 @@
 import fitz
-from uuid import uuid4
-import os
 
-def generate_preview_image(file, top_cm, bottom_cm):
-    os.makedirs("outputs", exist_ok=True)
-    pdf = fitz.open(stream=file.file.read(), filetype="pdf")
+from common.auto_crop import detect_margins
+from common.metrics import stage
+from process import page_crop
+
+# 预览渲染逻辑（页码、dpi 等）有改动时递增，使缓存中的旧预览失效
+PREVIEW_VERSION = "1"
+
+def generate_preview_image(file, top_cm, bottom_cm) -> bytes:
+    """
+    渲染第 3 页的裁剪区域，直接返回 PNG 内容，不写入 outputs/。
+    top_cm/bottom_cm 为 "auto" 时按检测出的该页尺寸的页眉页脚高度裁剪。
+    """
+    with stage("preview"):
+        return _generate_preview_image(file, top_cm, bottom_cm)
+
+
+def _generate_preview_image(file, top_cm, bottom_cm):
+    # file 为已落盘的 PDF 路径时直接按路径打开，避免整份读入内存
+    if isinstance(file, str):
+        pdf = fitz.open(file)
+    else:
+        pdf = fitz.open(stream=file.file.read(), filetype="pdf")
     page = pdf.load_page(2)
     rect = page.rect
-    top = top_cm * 28.35
-    bottom = bottom_cm * 28.35
+    margins = detect_margins(pdf) if "auto" in (top_cm, bottom_cm) else None
+    top, bottom = page_crop(rect, top_cm, bottom_cm, margins)
     clip = fitz.Rect(rect.x0, rect.y0 + top, rect.x1, rect.y1 - bottom)
 
-    pix = page.get_pixmap(dpi=150, clip=clip)
-    path = f"outputs/{uuid4().hex}_preview.png"
-    pix.save(path)
-    return path
\ No newline at end of file
+    png = page.get_pixmap(dpi=150, clip=clip).tobytes("png")
+    pdf.close()
+    return png
\ No newline at end of file
@@ -1,27 +1,55 @@
 import os
 import fitz  # PyMuPDF
-import csv
 import re
-from uuid import uuid4
+import time
+
+from common.auto_crop import detect_margins
+from common.metrics import call_collecting, observe_stage, record_collected
+from common.request_profile import record_page
+from common.sections import count_pages, merge_sections, open_pdf, page_ranges, write_csv
 
 os.makedirs("outputs", exist_ok=True)
 
-def process_pdf_and_extract(file, top_cm, bottom_cm):
-    pdf = fitz.open(stream=file.file.read(), filetype="pdf")
-    filename = file.filename.rsplit('.', 1)[0]
-    csv_path = f"outputs/{uuid4().hex}_{filename}.csv"
+# 提取逻辑有改动时递增，使结果缓存中的旧结果失效
+EXTRACTOR_VERSION = "2"
+
+heading_pattern = re.compile(r'^(\d+(\.\d+)*)(\s+)(.+)')  # 1 总则、1.1 标题
+
+
+def page_crop(rect, top_cm, bottom_cm, margins=None):
+    """单页的 (上, 下) 裁剪距离（pt）；取值为 "auto" 的一侧按 margins 中该页尺寸的检测结果"""
+    if margins is not None:
+        auto_top, auto_bottom = margins.lookup(rect.width, rect.height)
+        top_cm = auto_top if top_cm == "auto" else top_cm
+        bottom_cm = auto_bottom if bottom_cm == "auto" else bottom_cm
+    return top_cm * 28.35, bottom_cm * 28.35
 
-    heading_pattern = re.compile(r'^(\d+(\.\d+)*)(\s+)(.+)')  # 1 总则、1.1 标题
-    current_heading = None
-    content_dict = {}
 
-    for page in pdf:
+def extract_page_range(file, start, stop, top_cm, bottom_cm, margins=None):
+    """
+    提取 [start, stop) 页的标题与内容。
+    返回 (prefix, sections)：
+      - prefix   本分片第一个标题之前的文本，属于上一个分片最后一节的延续
+      - sections [[标题, 内容], ...]，按出现顺序排列
+    file 为路径时，每个分片在各自的 worker 中独立打开文档。
+    top_cm/bottom_cm 为 "auto" 时需要传入 auto_crop.detect_margins 的结果 margins，逐页按页面尺寸裁剪。
+    """
+    pdf = open_pdf(file) if not isinstance(file, fitz.Document) else file
+    prefix = ""
+    sections = []
+    # 逐页解析与标题识别交替进行，分别累计 get_text 与其余（标题识别）的耗时
+    started = time.perf_counter()
+    get_text = 0.0
+
+    for page_no in range(start, stop):
+        page = pdf[page_no]
         rect = page.rect
-        top = top_cm * 28.35
-        bottom = bottom_cm * 28.35
+        top, bottom = page_crop(rect, top_cm, bottom_cm, margins)
         clip = fitz.Rect(rect.x0, rect.y0 + top, rect.x1, rect.y1 - bottom)
+        page_started = time.perf_counter()
         blocks = page.get_text("blocks", clip=clip)
-
+        get_text += time.perf_counter() - page_started
+        record_page(page_no, time.perf_counter() - page_started)
         sorted_blocks = sorted(blocks, key=lambda b: (b[1], b[0]))  # 从上到下排序
 
         for block in sorted_blocks:
@@ -31,17 +59,40 @@ def process_pdf_and_extract(file, top_cm, bottom_cm):
 
             match = heading_pattern.match(text)
             if match:
-                current_heading = f"{match.group(1)} {match.group(4).strip()}"
-                content_dict[current_heading] = ""
-            elif current_heading:
-                content_dict[current_heading] += text + " "
+                sections.append([f"{match.group(1)} {match.group(4).strip()}", ""])
+            elif sections:
+                sections[-1][1] += text + " "
+            else:
+                prefix += text + " "
+
+    observe_stage("get_text", get_text)
+    observe_stage("headings", time.perf_counter() - started - get_text)
+    if pdf is not file:
+        pdf.close()
+    return prefix, sections
 
-    # ✅ 写入 CSV：使用 utf-8-sig 编码防止乱码
-    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        # writer.writerow(["标题", "内容"])
-        for heading, content in content_dict.items():
-            writer.writerow([heading, content.strip()])
 
-    return csv_path
+def process_pdf_and_extract(file, top_cm, bottom_cm, filename=None, executor=None):
+    """
+    executor 不为空且 file 为路径时，按 SHARD_PAGES 切分页范围并行提取，
+    输出与串行路径完全一致。
+    """
+    if executor is not None and isinstance(file, str):
+        margins = detect_margins(file) if "auto" in (top_cm, bottom_cm) else None
+        ranges = page_ranges(count_pages(file))
+        # 与 run_in_pool 相同，子进程里记录的阶段耗时随结果带回，由本进程记录
+        results = list(executor.map(
+            call_collecting, [extract_page_range] * len(ranges),
+            [file] * len(ranges), [s for s, _ in ranges], [e for _, e in ranges],
+            [top_cm] * len(ranges), [bottom_cm] * len(ranges), [margins] * len(ranges),
+        ))
+        for _, stages in results:
+            record_collected(stages)
+        parts = [part for part, _ in results]
+    else:
+        pdf = open_pdf(file)
+        margins = detect_margins(pdf) if "auto" in (top_cm, bottom_cm) else None
+        parts = [extract_page_range(pdf, 0, pdf.page_count, top_cm, bottom_cm, margins)]
+        pdf.close()
 
+    return write_csv(merge_sections(parts), filename)
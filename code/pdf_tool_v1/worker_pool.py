@@ -0,0 +1,80 @@
+import asyncio
+
+from common.admission import check_pages
+from common.auto_crop import crop_key, detect_margins
+from process import EXTRACTOR_VERSION, extract_page_range
+from common.executors import run_io, run_render
+from common.metrics import PAGES_PROCESSED, file_type, set_file
+from common.pipeline import run_pipeline
+from common.process_pool import collect_results, extract_stage, lookup_results, no_progress, preload, run_in_pool
+from common.result_cache import get_cache, file_sha256
+from common.scheduler import demote_if_large
+from common.sections import count_pages, merge_sections, page_ranges, write_csv
+
+# 提取分片在子进程中执行 process.extract_page_range
+preload("process")
+
+
+async def extract_in_pool(pdf_path, top_cm, bottom_cm, filename, on_pages=None):
+    """
+    大文档按页范围切片，每个分片在各自的子进程中打开并提取，
+    结果按分片顺序拼接，输出与串行提取一致。
+    on_pages(pages_done, pages_total) 在得知总页数及每个分片完成时回调。
+    top_cm/bottom_cm 为 "auto" 时先检测一次页眉页脚高度，各分片按页面尺寸查表裁剪。
+    """
+    page_count = await run_render(count_pages, pdf_path)
+    check_pages(page_count)
+    demote_if_large(page_count)
+    margins = None
+    if "auto" in (top_cm, bottom_cm):
+        margins = await run_render(detect_margins, pdf_path)
+    set_file(pages=page_count)
+    pages_done = 0
+    if on_pages:
+        on_pages(pages_done, page_count)
+
+    async def run_shard(start, stop):
+        nonlocal pages_done
+        part = await run_in_pool(extract_page_range, pdf_path, start, stop, top_cm, bottom_cm, margins)
+        pages_done += stop - start
+        if on_pages:
+            on_pages(pages_done, page_count)
+        return part
+
+    parts = await asyncio.gather(*[
+        run_shard(start, stop) for start, stop in page_ranges(page_count)
+    ])
+    csv_path = await run_io(write_csv, merge_sections(parts), filename)
+    PAGES_PROCESSED.inc(page_count, file_type=file_type(filename or pdf_path))
+    return csv_path
+
+
+async def iter_saved_files(paths, top_cm, bottom_cm, filenames, progress=no_progress, digests=None):
+    """
+    批量处理已落盘的上传文件：先查结果缓存，未命中的由 EXTRACT_WORKERS 个提取任务并行处理。
+    按完成先后产出 (上传序号, CSV 路径)，缓存命中的最先产出，调用方可以边收边打包。
+    progress(index, **fields) 用于上报单个文件的状态与页数进度。
+    digests 为落盘时已算好的 SHA-256，缺省时再读一遍文件计算。
+    """
+    cache = get_cache()
+    if digests is None:
+        digests = await asyncio.gather(*[run_io(file_sha256, path) for path in paths])
+    keys = [cache.make_key(digest, "csv", EXTRACTOR_VERSION, *crop_key(top_cm, bottom_cm)) for digest in digests]
+    hits, todo = await lookup_results(keys, filenames, progress)
+    for result in hits:
+        yield result
+
+    async def extract(i):
+        return await extract_in_pool(
+            paths[i], top_cm, bottom_cm, filenames[i],
+            on_pages=lambda done, total: progress(i, pages_done=done, pages_total=total))
+
+    # 出错或调用方提前停止迭代时取消其余文件
+    async for result in run_pipeline(todo, [extract_stage(extract, keys, filenames, progress)]):
+        yield result
+
+
+async def process_saved_files(paths, top_cm, bottom_cm, filenames, progress=no_progress, digests=None):
+    """同 iter_saved_files，全部完成后返回与上传顺序一致的 CSV 路径列表"""
+    return await collect_results(
+        iter_saved_files(paths, top_cm, bottom_cm, filenames, progress, digests), len(paths))
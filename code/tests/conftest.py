@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+
+import fitz
+import pytest
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORD_DIR = os.path.join(CODE_DIR, "word_tool_v1")
+# common 包在 code/ 下；word_tool_v1 的模块和应用自己运行时一样平铺导入
+sys.path[:0] = [CODE_DIR, WORD_DIR]
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """应用模块把 outputs/、uploads/、cache/ 写在当前目录下，每个用例在自己的临时目录里运行"""
+    from common import process_pool, result_cache
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("outputs")
+    # 结果缓存按相对路径建在第一次使用时的工作目录下，每个用例重新创建
+    monkeypatch.setattr(result_cache, "_cache", None)
+    yield tmp_path
+    # 进程池的子进程停留在创建时的工作目录，不能带到下一个用例
+    process_pool.shutdown_pool()
+
+
+def make_pdf(path, pages):
+    """
+    生成测试用 PDF：每页带页眉、页脚，pages 为每页的正文行列表，
+    行与行间隔 20pt，从 y=120 开始排版。
+    """
+    doc = fitz.open()
+    for page_no, lines in enumerate(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 40), "ACME Standard Header", fontsize=9)
+        page.insert_text((72, 815), f"Page {page_no + 1}", fontsize=9)
+        for i, line in enumerate(lines):
+            page.insert_text((72, 120 + 20 * i), line, fontsize=11)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """标题跨页、正文跨分片的 4 页文档"""
+    pages = [
+        ["1 General", "This standard applies to tests.", "1.1 Scope", "Scope text on page one."],
+        ["continued scope text.", "1.2 Terms", "Terms text."],
+        ["more terms text.", "2 Requirements", "2.1 Design", "Design text."],
+        ["design continues.", "2.2 Testing", "Testing text.", "1.1 Scope", "Scope is redefined."],
+    ]
+    return make_pdf(str(tmp_path / "sample.pdf"), pages)
+
+
+@pytest.fixture
+def word_app():
+    """word_tool_v1 的 app 模块；app.py 按相对路径读取 static/，先复制到工作目录"""
+    shutil.copytree(os.path.join(WORD_DIR, "static"), "static")
+    import app
+    return app
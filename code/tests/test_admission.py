@@ -0,0 +1,91 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from common import admission
+
+
+async def call(middleware, path, headers=()):
+    """以 POST 调用 ASGI 应用，返回 (状态码, 响应头)"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers)}
+    await middleware(scope, receive, send)
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}
+
+
+def blocking_app(release):
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+def test_request_body_over_limit_is_413(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_REQUEST_MB", 1)
+    release = asyncio.Event()
+    release.set()
+    middleware = admission.AdmissionMiddleware(blocking_app(release))
+    length = str(2 * 1024 * 1024).encode()
+    status, _ = asyncio.run(call(middleware, "/process_batch/", [(b"content-length", length)]))
+    assert status == 413
+    status, _ = asyncio.run(call(middleware, "/process_batch/", [(b"content-length", b"1024")]))
+    assert status == 200
+
+
+def test_queue_full_is_429_and_wait_timeout_is_503(monkeypatch):
+    monkeypatch.setattr(admission, "ADMIT_LIMITS", {"/process_batch/": 1})
+    monkeypatch.setattr(admission, "ADMIT_QUEUE", 1)
+    monkeypatch.setattr(admission, "ADMIT_WAIT", 0.1)
+
+    async def main():
+        release = asyncio.Event()
+        middleware = admission.AdmissionMiddleware(blocking_app(release))
+        running = asyncio.create_task(call(middleware, "/process_batch/"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(call(middleware, "/process_batch/"))
+        await asyncio.sleep(0)
+        # 名额和排队位置都已占满，第三个请求立即被拒
+        status, headers = await call(middleware, "/process_batch/")
+        assert status == 429 and headers["retry-after"] == str(admission.RETRY_AFTER)
+        # 排队的请求等待超过 ADMIT_WAIT 后返回 503
+        assert (await queued)[0] == 503
+        release.set()
+        assert (await running)[0] == 200
+        # 不参与准入控制的接口不受影响
+        assert (await call(middleware, "/jobs/abc"))[0] == 200
+
+    asyncio.run(main())
+
+
+def test_file_over_per_file_limit_is_413_and_spooled_files_removed(monkeypatch):
+    from common.upload_util import spool_uploads
+
+    monkeypatch.setattr(admission, "MAX_UPLOAD_MB", 1)
+    small = UploadFile(io.BytesIO(b"%PDF small"), filename="small.pdf")
+    large = UploadFile(io.BytesIO(b"x" * (1024 * 1024 + 1)), filename="large.pdf")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_uploads([small, large]))
+    assert error.value.status_code == 413
+    assert os.listdir("uploads") == []
+
+
+def test_process_batch_without_input_is_422(word_app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(word_app.app)
+    for path in ("/process_batch/", "/jobs/"):
+        response = client.post(path, data={"top_cm": "1", "bottom_cm": "1"})
+        assert response.status_code == 422
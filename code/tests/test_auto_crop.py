@@ -0,0 +1,74 @@
+import fitz
+import numpy as np
+
+from common.auto_crop import crop_key, detect_margins, sample_pages
+from conftest import make_pdf
+
+CM = 28.35
+
+
+def test_detects_repeated_header_and_numbered_footer(tmp_path):
+    pages = [[f"{i + 1} Clause", f"Body text on page {i + 1}."] for i in range(10)]
+    path = make_pdf(str(tmp_path / "doc.pdf"), pages)
+    margins = detect_margins(path)
+    top, bottom = margins.lookup(595, 842)
+
+    with fitz.open(path) as pdf:
+        page = pdf[0]
+        header = page.search_for("ACME Standard Header")[0]
+        footer = page.search_for("Page 1")[0]
+        body = page.search_for("Clause")[0]
+        height = page.rect.height
+    # 裁剪线落在页眉与正文之间、页脚与正文之间，不切到正文
+    assert header.y1 <= top * CM < body.y0
+    assert height - footer.y0 <= bottom * CM < height - body.y1
+    # 抽样中没出现过的页面尺寸不裁剪
+    assert margins.lookup(842, 595) == (0.0, 0.0)
+
+
+def test_repeated_text_that_also_appears_mid_page_is_not_a_header(tmp_path):
+    path = str(tmp_path / "doc.pdf")
+    doc = fitz.open()
+    for i in range(8):
+        page = doc.new_page(width=595, height=842)
+        # 续表标题有时在页面顶部（位置各不相同），有时在页面中间
+        y = 30 + 10 * i if i % 2 == 0 else 400
+        page.insert_text((72, y), "Table 3 (continued)", fontsize=11)
+        page.insert_text((72, 200), f"{i + 1} Section", fontsize=11)
+    doc.save(path)
+    doc.close()
+    assert detect_margins(path).lookup(595, 842) == (0.0, 0.0)
+
+
+def test_page_sizes_are_detected_separately_and_resolved_per_page(tmp_path):
+    path = str(tmp_path / "mixed.pdf")
+    doc = fitz.open()
+    for i in range(6):
+        width, height = (595, 842) if i % 2 == 0 else (842, 595)
+        page = doc.new_page(width=width, height=height)
+        if i % 2 == 0:
+            page.insert_text((72, 40), "Portrait Header", fontsize=9)
+        page.insert_text((72, height - 27), f"- {i + 1} -", fontsize=9)
+        page.insert_text((72, 200), f"{i + 1} Section", fontsize=11)
+    doc.save(path)
+    doc.close()
+
+    margins = detect_margins(path)
+    portrait, landscape = margins.lookup(595, 842), margins.lookup(842, 595)
+    assert portrait[0] > 0 and landscape[0] == 0.0
+    assert portrait[1] > 0 and landscape[1] > 0
+
+    top, bottom = margins.resolve("auto", 1.5, [595, 842, 595], [842, 595, 842])
+    assert np.allclose(top, [portrait[0], 0.0, portrait[0]])
+    assert bottom == 1.5
+
+
+def test_sampling_covers_start_and_end():
+    assert list(sample_pages(5, 48)) == [0, 1, 2, 3, 4]
+    sampled = sample_pages(1000, 10)
+    assert sampled[0] == 0 and sampled[-1] == 999 and len(sampled) == 10
+
+
+def test_crop_key_versions_auto_only():
+    assert crop_key(1, 2) == (1, 2)
+    assert crop_key("auto", 2)[-1].startswith("auto")
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize("top_cm, bottom_cm", [
+    (0, 0),      # 不裁剪，页眉页脚都算正文
+    (1, 1),      # 裁剪线穿过页眉页脚所在的行，需要回退为实时 get_text
+    (2, 1.5),    # 页眉页脚整行裁掉
+    (4.5, 0.5),  # 裁剪线穿过正文行
+])
+def test_block_index_matches_extract_page_range(sample_pdf, top_cm, bottom_cm):
+    from block_index import build_index
+    from process import extract_page_range
+
+    index = build_index(sample_pdf)
+    for start, stop in [(0, 4), (1, 3), (3, 4)]:
+        assert (index.extract(start, stop, top_cm, bottom_cm, pdf=sample_pdf)
+                == extract_page_range(sample_pdf, start, stop, top_cm, bottom_cm))
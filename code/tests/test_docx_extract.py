@@ -0,0 +1,79 @@
+import zipfile
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+STYLES = f"""<w:styles {NS}>
+  <w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+    <w:pPr><w:numPr><w:numId w:val="1"/><w:ilvl w:val="0"/></w:numPr></w:pPr></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="标题 2"/><w:basedOn w:val="Normal"/>
+    <w:pPr><w:numPr><w:numId w:val="1"/><w:ilvl w:val="1"/></w:numPr></w:pPr></w:style>
+  <w:style w:type="paragraph" w:styleId="TOC1"><w:name w:val="toc 1"/></w:style>
+</w:styles>"""
+
+NUMBERING = f"""<w:numbering {NS}>
+  <w:abstractNum w:abstractNumId="0">
+    <w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="decimal"/><w:lvlText w:val="%1"/></w:lvl>
+    <w:lvl w:ilvl="1"><w:start w:val="1"/><w:numFmt w:val="decimal"/><w:lvlText w:val="%1.%2"/></w:lvl>
+  </w:abstractNum>
+  <w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>
+</w:numbering>"""
+
+
+def paragraph(text, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{ppr}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def make_docx(path, body, styles=STYLES, numbering=NUMBERING):
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("word/document.xml", f"<w:document {NS}><w:body>{body}</w:body></w:document>")
+        docx.writestr("word/styles.xml", styles)
+        docx.writestr("word/numbering.xml", numbering)
+    return path
+
+
+def test_docx_sections_uses_styles_numbering_and_skips_toc(tmp_path):
+    from docx_extract import docx_sections
+
+    body = "".join([
+        paragraph("General", "TOC1"),
+        paragraph("Preamble before any heading."),
+        paragraph("General", "Heading1"),
+        paragraph("Applies to tests."),
+        paragraph("Scope", "Heading2"),
+        paragraph("Scope text."),
+        # 表格里的段落同样按文档顺序计入
+        f"<w:tbl><w:tr><w:tc>{paragraph('Cell text.')}</w:tc></w:tr></w:tbl>",
+        paragraph("Requirements", "Heading1"),
+        # 没有标题样式但文字本身带编号，与 PDF 一样按编号正则判断
+        paragraph("2.1 Design"),
+        paragraph("Design text."),
+    ])
+    path = make_docx(str(tmp_path / "spec.docx"), body)
+    assert docx_sections(path) == {
+        "1 General": "Applies to tests.",
+        "1.1 Scope": "Scope text. Cell text.",
+        "2 Requirements": "",
+        "2.1 Design": "Design text.",
+    }
+
+
+def test_outline_level_on_paragraph_marks_heading(tmp_path):
+    from docx_extract import docx_sections
+
+    body = ('<w:p><w:pPr><w:outlineLvl w:val="0"/></w:pPr><w:r><w:t>Annex</w:t></w:r></w:p>'
+            + paragraph("Annex text."))
+    path = make_docx(str(tmp_path / "annex.docx"), body)
+    assert docx_sections(path) == {"Annex": "Annex text."}
+
+
+def test_use_native_only_for_ooxml_packages(tmp_path):
+    from docx_extract import use_native
+
+    docx = make_docx(str(tmp_path / "a.docx"), paragraph("x"))
+    renamed_doc = tmp_path / "b.docx"
+    renamed_doc.write_bytes(b"\xd0\xcf\x11\xe0 not a zip")
+    assert use_native(docx)
+    assert not use_native(str(renamed_doc))
+    assert not use_native(docx, engine="office")
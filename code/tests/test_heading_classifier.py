@@ -0,0 +1,73 @@
+import fitz
+
+from common.heading_classifier import BOLD, FontClassifier, heading_key, make_classifier, numbering_level, page_blocks
+
+BODY = "Body text of a paragraph that runs long enough to dominate the character count."
+
+
+def body(x0=72):
+    return (BODY, 10, 0, x0, 2)
+
+
+def test_levels_from_size_bold_and_numbering():
+    classifier = FontClassifier()
+    blocks = [
+        ("Introduction", 16, 0, 72, 1),     # 无编号，字号 1.6 倍
+        body(),
+        ("Background", 13, 0, 72, 1),       # 1.3 倍
+        body(),
+        ("Notes", 10, BOLD, 72, 1),         # 正文字号但为粗体
+        body(),
+        ("2.3 Materials", 10, 0, 72, 1),    # 编号与正文对齐，按编号层级
+        body(),
+        ("3 Results", 14, 0, 72, 1),        # 放大的编号标题仍取编号层级
+        body(),
+    ]
+    assert classifier.classify(blocks) == [1, 0, 2, 0, 3, 0, 2, 0, 1, 0]
+
+
+def test_numbered_list_items_are_body():
+    classifier = FontClassifier()
+    blocks = [
+        body(),
+        ("1 Indented list item", 10, 0, 100, 1),    # 比正文多缩进
+        ("2 The item ends with a period.", 10, 0, 72, 1),
+        ("3 Small print", 8, 0, 72, 1),             # 小于正文字号
+        ("4 " + "long " * 20, 16, 0, 72, 1),        # 超过 MAX_CHARS
+        ("Big\nbut\nfour\nlines", 16, 0, 72, 4),    # 超过 MAX_LINES
+        body(),
+    ]
+    assert classifier.classify(blocks) == [0, 0, 0, 0, 0, 0, 0]
+
+
+def test_bold_body_text_is_not_a_heading_signal():
+    classifier = FontClassifier()
+    bold_body = (BODY, 10, BOLD, 72, 2)
+    assert classifier.classify([bold_body, ("Emphasis", 10, BOLD, 72, 1), bold_body]) == [0, 0, 0]
+
+
+def test_statistics_accumulate_across_pages():
+    classifier = FontClassifier()
+    # 统计随页累加，之后的页沿用前面各页得出的正文字号
+    classifier.classify_pages([body(), body(), ("Chapter", 16, 0, 72, 1), body()], [0, 0, 1, 1])
+    assert classifier.stats.body_size == 10
+    assert classifier.classify([("Chapter Two", 16, 0, 72, 1), body()]) == [1, 0]
+
+
+def test_page_blocks_reads_size_and_flags(tmp_path):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 100), "Title", fontsize=18, fontname="hebo")
+    page.insert_text((90, 200), "Plain body", fontsize=10)
+    blocks = page_blocks(page)
+    doc.close()
+
+    (title, title_size, title_flags, _, _), (text, size, flags, x0, lines) = blocks
+    assert (title, round(title_size)) == ("Title", 18) and title_flags & BOLD
+    assert (text, round(size), x0 >= 89, lines) == ("Plain body", 10, True, 1) and not flags & BOLD
+
+
+def test_mode_selection():
+    assert make_classifier("regex") is None and heading_key("regex") == ()
+    assert isinstance(make_classifier("font"), FontClassifier) and heading_key("font")
+    assert numbering_level("1.2.3 Scope") == 3 and numbering_level("Scope") == 0
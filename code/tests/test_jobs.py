@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+from common.jobs import JobManager
+
+
+def parse(events):
+    return [json.loads(event[len("data: "):]) for event in events if event.startswith("data: ")]
+
+
+def test_job_runs_to_done_and_events_end_with_terminal_state():
+    async def main():
+        release = asyncio.Event()
+        cleaned = []
+
+        async def process(paths, top_cm, bottom_cm, filenames, progress, digests):
+            progress(0, state="extracting", pages_done=0, pages_total=4)
+            await release.wait()
+            progress(0, pages_done=4)
+            progress(0, state="done", path="outputs/a.csv")
+            progress(1, state="done", path="outputs/b.csv")
+            return ["outputs/a.csv", "outputs/b.csv"]
+
+        manager = JobManager(process, workers=1)
+        manager.start()
+        job = manager.submit(["a", "b"], ["a.pdf", "b.pdf"], 1, 1, cleanup=lambda: cleaned.append(True))
+        assert job.state == "queued"
+
+        events = []
+
+        async def subscribe():
+            async for event in manager.events(job):
+                events.append(event)
+                if len(events) == 1:
+                    release.set()
+
+        await asyncio.wait_for(subscribe(), 5)
+        await manager.stop()
+
+        states = parse(events)
+        # 流以终态结束，之后不再推送
+        assert states[-1]["state"] == "done"
+        assert all(s["state"] != "done" for s in states[:-1])
+        assert states[-1]["files_done"] == 2 and states[-1]["pages_done"] == 4
+        assert job.result == {"path": None, "paths": ["outputs/a.csv", "outputs/b.csv"], "is_zip": True}
+        assert cleaned == [True] and job.finished is not None
+
+    asyncio.run(main())
+
+
+def test_failed_job_reports_error_and_still_cleans_up():
+    async def main():
+        cleaned = []
+
+        async def process(paths, top_cm, bottom_cm, filenames, progress, digests):
+            raise RuntimeError("broken pdf")
+
+        manager = JobManager(process, workers=1)
+        manager.start()
+        job = manager.submit(["a"], ["a.pdf"], 1, 1, cleanup=lambda: cleaned.append(True))
+        states = parse([event async for event in manager.events(job)])
+        await manager.stop()
+
+        assert states[-1]["state"] == "failed" and states[-1]["error"] == "broken pdf"
+        assert job.result is None and cleaned == [True]
+        # 已结束的任务再订阅时立即收到终态并结束
+        assert parse([event async for event in manager.events(job)])[0]["state"] == "failed"
+
+    asyncio.run(main())
+
+
+def test_single_file_result_is_not_zip_and_keepalive_while_idle(monkeypatch):
+    from common import jobs
+
+    monkeypatch.setattr(jobs, "SSE_KEEPALIVE", 0.01)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def process(paths, top_cm, bottom_cm, filenames, progress, digests):
+            await release.wait()
+            return ["outputs/a.csv"]
+
+        manager = JobManager(process, workers=1)
+        manager.start()
+        job = manager.submit(["a"], ["a.pdf"], 1, 1)
+        events = []
+        async for event in manager.events(job):
+            events.append(event)
+            if event.startswith(":"):
+                release.set()
+        await manager.stop()
+
+        # 长时间无进度时发送注释行保持连接
+        assert ": keep-alive\n\n" in events
+        assert job.result == {"path": "outputs/a.csv", "is_zip": False}
+
+    asyncio.run(main())
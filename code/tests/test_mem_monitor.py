@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from common import mem_monitor
+from common.mem_monitor import MemoryPeakMiddleware
+
+
+def make_app(release):
+    async def app(scope, receive, send):
+        await release.wait()
+    return app
+
+
+async def post(middleware, path="/process_batch/"):
+    await middleware({"type": "http", "method": "POST", "path": path}, None, None)
+
+
+def test_disabled_does_not_sample(monkeypatch):
+    calls = []
+    monkeypatch.setattr(mem_monitor, "MEM_MONITOR", "off")
+    monkeypatch.setattr(mem_monitor, "tree_rss", lambda: calls.append(1) or 0)
+
+    async def main():
+        release = asyncio.Event()
+        release.set()
+        await post(MemoryPeakMiddleware(make_app(release)))
+
+    asyncio.run(main())
+    assert calls == []
+
+
+def test_concurrent_requests_share_one_sampler(monkeypatch, caplog):
+    monkeypatch.setattr(mem_monitor, "SAMPLE_INTERVAL", 0.01)
+    rss = iter(range(1, 10**6))
+    monkeypatch.setattr(mem_monitor, "tree_rss", lambda: next(rss) * 2**20)
+
+    async def main():
+        release = asyncio.Event()
+        middleware = MemoryPeakMiddleware(make_app(release), enabled=True)
+        requests = [asyncio.create_task(post(middleware)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # 三个请求只有一个采样任务
+        assert len(mem_monitor._sampler.peaks) == 3
+        sampler = mem_monitor._sampler._task
+        assert [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_run"] == [sampler]
+        release.set()
+        await asyncio.gather(*requests)
+        await asyncio.sleep(0.03)
+        # 没有进行中的请求后采样任务退出
+        assert sampler.done() and not mem_monitor._sampler.peaks
+
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        asyncio.run(main())
+    lines = [r.getMessage() for r in caplog.records if "POST /process_batch/" in r.getMessage()]
+    assert len(lines) == 3 and all("peak" in line for line in lines)
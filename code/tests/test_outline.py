@@ -0,0 +1,92 @@
+import fitz
+
+from common.outline import read_outline, slice_outline
+
+
+def blocks(*rows):
+    """rows 为 (页号, y, 文字)，返回 slice_outline 需要的三个等长列表"""
+    pages, ys, texts = zip(*rows)
+    return list(pages), list(ys), list(texts)
+
+
+def test_sections_split_at_bookmarks_and_drop_preamble():
+    entries = [(1, "1 General", 0, 100), (1, "2 Scope", 1, 0)]
+    contents = slice_outline(entries, *blocks(
+        (0, 50, "Cover text"),
+        (0, 100, "1 General"),
+        (0, 120, "general text"),
+        (1, 40, "continues on page two"),
+        (1, 300, "2 Scope"),
+        (1, 320, "scope text"),
+    ))
+    # 第一个书签之前的文本丢弃；目标页上以标题开头的块决定章节起点，上方的文字仍属上一节
+    assert contents == ["general text continues on page two", "scope text"]
+
+
+def test_target_within_tolerance_and_title_sharing_block():
+    entries = [(1, "1 General", 0, 102), (2, "1.1 Terms", 0, 200)]
+    contents = slice_outline(entries, *blocks(
+        (0, 100, "1 General  This standard applies."),
+        (0, 150, "more text"),
+        (0, 200, "1.1 Terms"),
+        (0, 220, "terms text"),
+    ))
+    # 目标点略低于块顶部仍归入该书签；与正文同块的标题只去掉标题部分
+    assert contents == ["This standard applies. more text", "terms text"]
+
+
+def test_target_below_title_does_not_leak_title_into_previous_section():
+    entries = [(1, "1 General", 0, 100), (1, "Annex A", 1, 520)]
+    contents = slice_outline(entries, *blocks(
+        (0, 100, "1 General"),
+        (0, 120, "general text"),
+        (1, 480, "Annex A"),
+        (1, 500, "annex text"),
+    ))
+    # 目标点在标题下方时，以目标页上的标题块位置为章节起点
+    assert contents == ["general text", "annex text"]
+
+    # 标题排在上一页页底而书签指向下一页时，标题块落在上一节末尾，不计入上一节内容
+    entries = [(1, "1 General", 0, 100), (1, "Annex", 2, 0)]
+    contents = slice_outline(entries, *blocks(
+        (0, 100, "1 General"),
+        (0, 120, "general text"),
+        (1, 800, "Annex"),
+        (2, 60, "annex text"),
+    ))
+    assert contents == ["general text", "annex text"]
+
+
+def test_out_of_order_and_duplicate_bookmarks():
+    entries = [(1, "Part B", 1, 0), (1, "Part A", 0, 0), (1, "Notes", 2, 0), (1, "Notes", 3, 0)]
+    contents = slice_outline(entries, *blocks(
+        (0, 100, "Part A"),
+        (0, 120, "a text"),
+        (1, 100, "Part B"),
+        (1, 120, "b text"),
+        (2, 100, "Notes"),
+        (2, 120, "first notes"),
+        (3, 100, "Notes"),
+        (3, 120, "second notes"),
+    ))
+    # 结果与书签顺序一一对应；同名书签各自成节
+    assert contents == ["b text", "a text", "first notes", "second notes"]
+
+
+def test_read_outline_filters_entries(tmp_path):
+    path = str(tmp_path / "toc.pdf")
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    doc.set_toc([[1, "Cover", 1], [1, "  1   General ", 2], [2, "1.1 Scope", 3]])
+    doc.save(path)
+    doc.close()
+
+    with fitz.open(path) as pdf:
+        entries = read_outline(pdf)
+        assert [(level, title, page) for level, title, page, _ in entries] == [
+            (1, "Cover", 0), (1, "1 General", 1), (2, "1.1 Scope", 2)]
+        assert read_outline(pdf, mode="off") == []
+        pdf.set_toc([[1, "Cover", 1], [1, "Contents", 2]])
+        # 条目太少（如只有封面、目录）时不采用
+        assert read_outline(pdf) == []
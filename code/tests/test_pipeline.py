@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from common.pipeline import Stage, run_pipeline
+
+
+async def collect(items, stages, **kwargs):
+    return [item async for item in run_pipeline(items, stages, **kwargs)]
+
+
+def test_items_flow_through_all_stages():
+    async def double(x):
+        return x * 2
+
+    async def inc_batch(xs):
+        return [x + 1 for x in xs]
+
+    stages = [Stage("double", double, workers=2), Stage("inc", inc_batch, batch=3)]
+    assert sorted(asyncio.run(collect(range(10), stages))) == [x * 2 + 1 for x in range(10)]
+
+
+def test_accepts_skips_stage():
+    async def negate(x):
+        return -x
+
+    stages = [Stage("negate", negate, accepts=lambda x: x % 2 == 0)]
+    assert sorted(asyncio.run(collect(range(5), stages))) == [-4, -2, 0, 1, 3]
+
+
+def test_stage_error_is_raised_and_other_workers_cancelled():
+    cancelled = []
+
+    async def slow(x):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+        return x
+
+    async def fail(x):
+        if x == 0:
+            raise ValueError("bad file")
+        return await slow(x)
+
+    async def main():
+        with pytest.raises(ValueError, match="bad file"):
+            await collect(range(4), [Stage("work", fail, workers=4)])
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+    assert sorted(cancelled) == [1, 2, 3]
+
+
+def test_early_stop_cancels_remaining_work():
+    started = []
+    cancelled = []
+
+    async def work(x):
+        started.append(x)
+        try:
+            await asyncio.sleep(0 if x == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+        return x
+
+    async def first_only():
+        results = run_pipeline(range(20), [Stage("work", work, workers=2)], queue_size=1)
+        try:
+            return await results.__anext__()
+        finally:
+            await results.aclose()
+
+    assert asyncio.run(asyncio.wait_for(first_only(), 5)) == 0
+    # 调用方提前停止迭代后，正在执行的工作被取消，也不再继续取新的 item
+    assert cancelled and sorted(cancelled) == sorted(set(started) - {0})
+    assert len(started) < 20
@@ -0,0 +1,26 @@
+def test_sharded_extraction_matches_serial(sample_pdf):
+    from common.sections import merge_sections, page_ranges
+    from process import extract_page_range
+
+    serial = merge_sections([extract_page_range(sample_pdf, 0, 4, 2, 2)])
+    sharded = merge_sections([extract_page_range(sample_pdf, start, stop, 2, 2)
+                              for start, stop in page_ranges(4, shard_pages=1)])
+    assert sharded == serial
+    assert serial["1.1 Scope"].strip() == "Scope is redefined."
+    assert "continued scope text." not in serial["1.2 Terms"]
+    assert "more terms text." in serial["1.2 Terms"]
+
+
+def test_sharded_extraction_records_stages_from_workers(sample_pdf, monkeypatch):
+    from concurrent.futures import ProcessPoolExecutor
+
+    import process
+    from common.sections import page_ranges
+
+    recorded = []
+    monkeypatch.setattr(process, "record_collected", recorded.extend)
+    monkeypatch.setattr(process, "page_ranges", lambda page_count: page_ranges(page_count, shard_pages=1))
+    with ProcessPoolExecutor(2) as executor:
+        process.process_pdf_and_extract(sample_pdf, 2, 2, executor=executor, heading_mode="regex")
+    # 每个分片在子进程里记录的阶段耗时都带回了主进程
+    assert [name for name, _ in recorded].count("get_text") == 4
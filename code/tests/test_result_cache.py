@@ -0,0 +1,51 @@
+import os
+
+from common.result_cache import ResultCache
+
+
+def test_evicts_least_recently_used_over_quota(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10)
+    cache.write("a", b"aaaa", ".csv")
+    cache.write("b", b"bbbb", ".csv")
+    # 读取 a 后 b 成为最久未使用的条目
+    assert cache.read("a") == b"aaaa"
+    cache.write("c", b"cccc", ".csv")
+
+    assert cache.read("b") is None
+    assert cache.read("a") == b"aaaa"
+    assert cache.read("c") == b"cccc"
+    assert not os.path.exists(tmp_path / "cache" / "b.csv")
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 8, 1)
+
+
+def test_oversized_entry_is_kept_alone(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10)
+    cache.write("a", b"aaaa", ".csv")
+    cache.write("big", b"x" * 32, ".csv")
+    assert cache.read("a") is None
+    assert cache.read("big") == b"x" * 32
+
+
+def test_get_copies_instead_of_sharing_inode(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024)
+    src = tmp_path / "result.csv"
+    src.write_bytes(b"1 General,text\r\n")
+    cache.put("k", str(src))
+
+    dest = str(tmp_path / "outputs_copy.csv")
+    assert cache.get("k", dest) == dest
+    assert os.stat(dest).st_ino != os.stat(tmp_path / "cache" / "k.csv").st_ino
+    assert cache.get("missing", str(tmp_path / "none.csv")) is None
+
+
+def test_reload_restores_entries_and_drops_partial_writes(tmp_path):
+    directory = tmp_path / "cache"
+    cache = ResultCache(str(directory), max_bytes=1024)
+    cache.write("a", b"aaaa", ".png")
+    (directory / "b.png.0123.tmp").write_bytes(b"half")
+
+    reloaded = ResultCache(str(directory), max_bytes=1024)
+    assert reloaded.read("a") == b"aaaa"
+    assert not os.path.exists(directory / "b.png.0123.tmp")
+    assert reloaded.stats()["bytes"] == 4
@@ -0,0 +1,90 @@
+import asyncio
+
+from common.scheduler import BULK, INTERACTIVE, FairScheduler, bind
+
+
+async def submit(scheduler, order, client, lane, name, hold):
+    bind(client, lane)
+    async with scheduler.slot():
+        order.append(name)
+        await hold.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_bulk_cannot_take_reserved_slots():
+    async def main():
+        scheduler = FairScheduler("test", slots=3, reserved=1)
+        order, hold = [], asyncio.Event()
+        tasks = [asyncio.create_task(submit(scheduler, order, "a", BULK, f"bulk{i}", hold)) for i in range(3)]
+        await settle()
+        # 3 个名额里 1 个只给交互通道，批量任务最多同时跑 2 个
+        assert order == ["bulk0", "bulk1"]
+        tasks.append(asyncio.create_task(submit(scheduler, order, "b", INTERACTIVE, "preview", hold)))
+        await settle()
+        assert order == ["bulk0", "bulk1", "preview"]
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert order[-1] == "bulk2"
+
+    asyncio.run(main())
+
+
+def test_interactive_lane_served_before_bulk():
+    async def main():
+        scheduler = FairScheduler("test", slots=1, reserved=0)
+        order, holds = [], [asyncio.Event() for _ in range(4)]
+        first = asyncio.create_task(submit(scheduler, order, "a", BULK, "running", holds[0]))
+        await settle()
+        waiting = [
+            asyncio.create_task(submit(scheduler, order, "a", BULK, "bulk", holds[1])),
+            asyncio.create_task(submit(scheduler, order, "b", INTERACTIVE, "preview", holds[2])),
+        ]
+        await settle()
+        holds[0].set()
+        await settle()
+        assert order == ["running", "preview"]
+        for hold in holds:
+            hold.set()
+        await asyncio.gather(first, *waiting)
+        assert order == ["running", "preview", "bulk"]
+
+    asyncio.run(main())
+
+
+def test_clients_take_turns_within_a_lane():
+    async def main():
+        scheduler = FairScheduler("test", slots=1, reserved=0)
+        order, hold = [], asyncio.Event()
+        tasks = [asyncio.create_task(submit(scheduler, order, "a", BULK, "a0", hold))]
+        await settle()
+        # 客户端 a 先排了 3 个文件，b 后到的 1 个文件不用等 a 全部做完
+        tasks += [asyncio.create_task(submit(scheduler, order, "a", BULK, f"a{i}", hold)) for i in (1, 2, 3)]
+        await settle()
+        tasks.append(asyncio.create_task(submit(scheduler, order, "b", BULK, "b0", hold)))
+        await settle()
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert order == ["a0", "a1", "b0", "a2", "a3"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def main():
+        scheduler = FairScheduler("test", slots=1, reserved=0)
+        order, hold = [], asyncio.Event()
+        running = asyncio.create_task(submit(scheduler, order, "a", BULK, "running", hold))
+        await settle()
+        waiter = asyncio.create_task(submit(scheduler, order, "b", BULK, "cancelled", hold))
+        await settle()
+        waiter.cancel()
+        hold.set()
+        await asyncio.gather(running, waiter, return_exceptions=True)
+        assert order == ["running"]
+        assert scheduler.running == {INTERACTIVE: 0, BULK: 0}
+
+    asyncio.run(main())
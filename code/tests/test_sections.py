@@ -0,0 +1,56 @@
+import os
+
+from common.sections import download_name, merge_sections, output_csv_path, page_ranges, result_names
+
+
+def test_merge_sections_continues_prefix_and_resets_repeated_headings():
+    parts = [
+        ("orphan ", [["1 General", "a "]]),
+        ("b ", [["1.1 Scope", "c "]]),
+        ("d ", []),
+        ("", [["1 General", "e "]]),
+    ]
+    # 第一个标题之前的文本丢弃；分片开头的 prefix 续接上一节；重复出现的标题以后一次为准
+    assert merge_sections(parts) == {"1 General": "e ", "1.1 Scope": "c d "}
+
+
+def test_page_ranges_cover_all_pages():
+    assert page_ranges(5, shard_pages=2) == [(0, 2), (2, 4), (4, 5)]
+    # 空文档也给出一个分片，调用方不必单独处理
+    assert page_ranges(0, shard_pages=2) == [(0, 0)]
+
+
+def test_output_csv_path_keeps_stem():
+    path = output_csv_path("dir/报告.v2.pdf")
+    assert path.startswith("outputs/") and path.endswith("_报告.v2.csv")
+    assert path != output_csv_path("dir/报告.v2.pdf")
+
+
+def test_result_names_use_upload_stem_and_number_duplicates():
+    names = result_names(["a.pdf", "dir/a.docx", "b.pdf", "a (2).pdf", "a.doc"])
+    assert names == ["a.csv", "a (2).csv", "b.csv", "a (2) (2).csv", "a (3).csv"]
+    assert download_name(output_csv_path("报告.pdf")) == "报告.csv"
+
+
+def test_batch_zip_members_and_download_are_named_after_uploads(word_app, sample_pdf):
+    import io
+    import zipfile
+
+    from fastapi.testclient import TestClient
+
+    client = TestClient(word_app.app)
+    with open(sample_pdf, "rb") as f:
+        data = f.read()
+    files = [("files", ("spec.pdf", data, "application/pdf")),
+             ("files", ("spec.pdf", data + b"\n", "application/pdf"))]
+    response = client.post("/process_batch/", files=files, data={"top_cm": "1", "bottom_cm": "1"})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        # 磁盘上的 uuid 前缀不出现在压缩包里，同名上传按上传顺序编号
+        assert sorted(zf.namelist()) == ["spec (2).csv", "spec.csv"]
+
+    response = client.post("/process_batch/", files=files[:1], data={"top_cm": "1", "bottom_cm": "1"})
+    path = response.json()["path"]
+    response = client.get("/download/", params={"path": path})
+    assert os.path.basename(path) != "spec.csv"
+    assert 'filename="spec.csv"' in response.headers["content-disposition"]
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import shutil
+import time
+
+
+def open_session(store, sample_pdf):
+    from sessions import DocumentSession
+
+    os.makedirs("uploads", exist_ok=True)
+    upload = shutil.copy(sample_pdf, os.path.join("uploads", "doc.pdf"))
+    session = DocumentSession(upload, "digest", "doc.pdf", upload)
+    store.sessions[session.id] = session
+    return session
+
+
+def wait_removed(path, timeout=5):
+    # 最后一个 release 把删除交给 I/O 线程池，不在调用方线程里执行
+    deadline = time.time() + timeout
+    while os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    return not os.path.exists(path)
+
+
+def test_close_idle_session_removes_files(sample_pdf):
+    from sessions import SessionStore
+
+    async def main():
+        store = SessionStore()
+        session = open_session(store, sample_pdf)
+        assert await store.close(session.id) is True
+        assert not os.path.exists(session.upload_path)
+        assert store.get(session.id) is None
+        assert await store.close(session.id) is False
+
+    asyncio.run(main())
+
+
+def test_close_busy_session_defers_to_last_release(sample_pdf):
+    from sessions import SessionStore
+
+    async def main():
+        store = SessionStore()
+        session = open_session(store, sample_pdf)
+        store.acquire(session)
+        store.acquire(session)
+
+        assert await store.close(session.id) is True
+        # 删除后新请求拿不到会话，但正在使用的任务仍能读它的文件
+        assert store.get(session.id) is None
+        assert session.closed and os.path.exists(session.upload_path)
+        assert session.pdf.page_count == 4
+
+        store.release(session)
+        assert os.path.exists(session.upload_path)
+        store.release(session)
+        assert wait_removed(session.upload_path)
+
+    asyncio.run(main())
+
+
+def test_reap_skips_busy_sessions(sample_pdf):
+    from sessions import SessionStore
+
+    async def main():
+        store = SessionStore(ttl=0)
+        busy = open_session(store, sample_pdf)
+        store.acquire(busy)
+        await store.reap()
+        assert store.get(busy.id) is busy and not busy.closed
+
+        store.release(busy)
+        busy.last_used = 0
+        await store.reap()
+        assert store.get(busy.id) is None
+        assert not os.path.exists(busy.upload_path)
+
+    asyncio.run(main())
+
+
+def test_close_during_preview_waits_for_render(word_app, sample_pdf, monkeypatch):
+    import threading
+
+    import httpx
+
+    rendering, finish = threading.Event(), threading.Event()
+
+    def slow_render(pdf, top_cm, bottom_cm):
+        rendering.set()
+        finish.wait(5)
+        # 渲染期间文档不能被关闭
+        return pdf.load_page(0).get_pixmap(dpi=10).tobytes("png")
+
+    monkeypatch.setattr(word_app, "render_preview", slow_render)
+
+    async def main():
+        store = word_app.session_store
+        session = open_session(store, sample_pdf)
+        transport = httpx.ASGITransport(app=word_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            request = asyncio.create_task(client.post(
+                "/preview/", data={"doc_id": session.id, "top_cm": "1", "bottom_cm": "1"}))
+            while not rendering.is_set():
+                await asyncio.sleep(0.01)
+            assert await store.close(session.id) is True
+            assert session.busy == 1 and os.path.exists(session.upload_path)
+            finish.set()
+            response = await request
+        assert response.status_code == 200
+        assert response.content.startswith(b"\x89PNG")
+        assert wait_removed(session.upload_path)
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import os
+import time
+
+from common import storage
+from common.storage import StorageManager
+
+
+def make(path, size, age):
+    """写出 size 字节的文件，修改时间设为 age 秒之前"""
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return os.path.abspath(path)
+
+
+def test_expired_entries_are_removed_unless_pinned():
+    manager = StorageManager(["outputs"], ttl=60, quota_bytes=1 << 20)
+    old = make("outputs/old.csv", 10, 120)
+    pinned = make("outputs/pinned.csv", 10, 120)
+    fresh = make("outputs/fresh.csv", 10, 0)
+    make("outputs/_placeholder", 10, 120)
+
+    manager.pin(pinned)
+    assert manager.sweep() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(pinned) and os.path.exists(fresh)
+    assert os.path.exists("outputs/_placeholder")
+
+    # 每次 pin 都要对应一次 unpin，最后一次 unpin 后才会被清理
+    manager.pin(pinned)
+    manager.unpin(pinned)
+    assert manager.sweep() == 0
+    manager.unpin(pinned)
+    assert manager.sweep() == 1 and not os.path.exists(pinned)
+
+
+def test_quota_evicts_oldest_first_but_spares_recent(monkeypatch):
+    monkeypatch.setattr(storage, "MIN_AGE", 30)
+    manager = StorageManager(["outputs"], ttl=3600, quota_bytes=25)
+    oldest = make("outputs/a.csv", 10, 300)
+    older = make("outputs/b.csv", 10, 200)
+    recent = make("outputs/c.csv", 10, 0)
+
+    # 超出配额 5 字节，淘汰最旧的一个即可
+    assert manager.sweep() == 1
+    assert not os.path.exists(oldest) and os.path.exists(older)
+
+    # 仍超出配额时，生成不到 MIN_AGE 的产物不淘汰
+    make("outputs/d.csv", 20, 0)
+    manager.sweep()
+    assert not os.path.exists(older) and os.path.exists(recent)
+    usage = manager.usage()
+    assert usage["evicted_files"] == 2 and usage["bytes"] == 30
+
+
+def test_nested_paths_pin_their_top_level_entry():
+    manager = StorageManager(["outputs"], ttl=60, quota_bytes=1 << 20, temp_root="tmp")
+    work = manager.temp_dir()
+    inner = make(os.path.join(work, "a.pdf"), 10, 120)
+    os.utime(work, (time.time() - 120,) * 2)
+
+    # 转换目录里的文件被占用时，整个工作目录都不会被清理
+    manager.pin(inner)
+    assert manager.sweep() == 0
+    manager.unpin(inner)
+    assert manager.sweep() == 1 and not os.path.exists(work)
@@ -0,0 +1,80 @@
+import asyncio
+import csv
+import io
+import os
+
+import fitz
+from starlette.datastructures import UploadFile
+
+
+def read_text(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def batch_csv(pdf_path, top_cm, bottom_cm):
+    from process import process_pdf_and_extract
+
+    return read_text(process_pdf_and_extract(pdf_path, top_cm, bottom_cm))
+
+
+def stream_csv(client, pdf_path, top_cm, bottom_cm):
+    with open(pdf_path, "rb") as f:
+        response = client.post("/extract/stream", files={"file": ("doc.pdf", f, "application/pdf")},
+                               data={"top_cm": top_cm, "bottom_cm": bottom_cm})
+    assert response.status_code == 200
+    return response.content.decode("utf-8")
+
+
+def test_format_sections_matches_write_csv(sample_pdf):
+    from process import format_sections, stream_sections
+
+    streamed = "".join(format_sections(stream_sections(sample_pdf, 2, 2)))
+    rows = list(csv.reader(io.StringIO(streamed.lstrip("\ufeff"))))
+    assert rows[1] == ["1.1 Scope", "Scope text on page one. continued scope text."]
+    # 流式结果中重复的标题各自成节；按 merge_sections 的规则（后一次覆盖前一次）合并后与 write_csv 逐字节一致
+    assert "".join(format_sections(dict(rows).items())) == batch_csv(sample_pdf, 2, 2)
+
+
+def test_ndjson_rows(sample_pdf):
+    import json
+
+    from process import format_sections, stream_sections
+
+    rows = [json.loads(line) for line in format_sections(stream_sections(sample_pdf, 2, 2), "ndjson")]
+    assert [row["heading"] for row in rows] == [
+        "1 General", "1.1 Scope", "1.2 Terms", "2 Requirements", "2.1 Design", "2.2 Testing", "1.1 Scope"]
+    assert rows[-1]["content"] == "Scope is redefined."
+
+
+def test_stream_uses_outline_and_auto_crop(word_app, sample_pdf):
+    from fastapi.testclient import TestClient
+
+    with fitz.open(sample_pdf) as pdf:
+        pdf.set_toc([[1, "1 General", 1], [2, "1.2 Terms", 2], [1, "2 Requirements", 3]])
+        pdf.saveIncr()
+
+    client = TestClient(word_app.app)
+    streamed = stream_csv(client, sample_pdf, "auto", "auto")
+    with open(sample_pdf, "rb") as f:
+        response = client.post("/process_batch/", files={"files": ("doc.pdf", f, "application/pdf")},
+                               data={"top_cm": "auto", "bottom_cm": "auto"})
+    # 与 /process_batch/ 相同：按书签切分，自动裁掉页眉页脚
+    assert streamed == read_text(response.json()["path"])
+    rows = list(csv.reader(io.StringIO(streamed.lstrip("\ufeff"))))
+    assert [heading for heading, _ in rows] == ["1 General", "1.2 Terms", "2 Requirements"]
+    assert "ACME" not in streamed and "Page 1" not in streamed
+
+
+def test_cleanup_runs_when_body_is_never_sent(word_app, sample_pdf):
+    with open(sample_pdf, "rb") as f:
+        upload = UploadFile(io.BytesIO(f.read()), filename="doc.pdf")
+
+    async def main():
+        response = await word_app.extract_stream(file=upload, doc_id=None, top_cm=2, bottom_cm=2, fmt="csv")
+        assert os.listdir("uploads")
+        # 客户端在响应开始前断开时生成器不会启动，响应结束后的 background 任务仍会清理
+        await response.background()
+        assert os.listdir("uploads") == []
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+
+from common import zip_util
+from common.zip_util import iter_members, stream_zip
+
+
+class Unseekable(io.RawIOBase):
+    """只能顺序写入的输出端，模拟把字节直接发给客户端"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+async def collect(members, compresslevel):
+    sink = Unseekable()
+    chunks = 0
+    async for chunk in stream_zip(members, compresslevel):
+        sink.write(chunk)
+        chunks += 1
+    assert not sink.seekable()
+    return bytes(sink.data), chunks
+
+
+@pytest.mark.parametrize("compresslevel", [0, 6])
+def test_stream_zip_produces_valid_archive(compresslevel, monkeypatch):
+    monkeypatch.setattr(zip_util, "ZIP_CHUNK", 1000)
+    contents = {"a.csv": os.urandom(4500), "b (2).csv": "标题,内容\r\n".encode() * 500, "empty.csv": b""}
+    paths = []
+    for i, data in enumerate(contents.values()):
+        path = f"outputs/{i}.csv"
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+
+    data, chunks = asyncio.run(collect(iter_members(paths, list(contents)), compresslevel))
+    # 按块产出，而不是最后一次性产出整个归档
+    assert chunks > 3
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(contents)
+        for name, expected in contents.items():
+            assert zf.read(name) == expected
+            info = zf.getinfo(name)
+            assert info.compress_type == (zipfile.ZIP_DEFLATED if compresslevel else zipfile.ZIP_STORED)
+            # 输出端不能 seek，CRC 与大小写在成员数据之后的数据描述符里
+            assert info.flag_bits & 0x08
@@ -1,30 +1,37 @@
 import fitz  # PyMuPDF
 import re
 import csv
-from collections import Counter
+import os
+import sys
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.auto_crop import SAMPLE_PAGES, detect_margins
+from common.heading_classifier import make_classifier, page_blocks
+from common.outline import read_outline, slice_outline
 
-def detect_header_footer_heights(doc, sample_pages=5):
-    header_y_vals, footer_y_vals = [], []
-    for page in doc[:sample_pages]:
-        blocks = page.get_text("dict")["blocks"]
-        for b in blocks:
-            if b['type'] != 0 or not b.get("lines"): continue
-            y0, y1 = b['bbox'][1], b['bbox'][3]
-            if y0 < 150: header_y_vals.append(y1)
-            elif y1 > page.rect.height - 150: footer_y_vals.append(y0)
-    top_crop = int(max(Counter(header_y_vals), key=Counter(header_y_vals).get)) if header_y_vals else 50
-    bottom_crop = int(page.rect.height - min(Counter(footer_y_vals), key=Counter(footer_y_vals).get)) if footer_y_vals else 50
-    return top_crop, bottom_crop
+def detect_header_footer_heights(doc, sample_pages=SAMPLE_PAGES):
+    """
+    在整份文档中分层抽样检测页眉/页脚，按页面尺寸返回 {(宽, 高): (上裁剪高度, 下裁剪高度)}（pt），
+    每页按自己的尺寸取值，横版页、不同纸张大小的页分别计算。
+    """
+    margins = detect_margins(doc, sample_pages)
+    return {size: (top * 28.35, bottom * 28.35) for size, (top, bottom) in margins.margins.items()}
 
-def crop_pdf(input_path, output_path, top_crop, bottom_crop):
+def page_crop(page, crops):
+    # 抽样中没出现过的页面尺寸不裁剪
+    return crops.get((round(page.rect.width), round(page.rect.height)), (0, 0))
+
+def crop_pdf(input_path, output_path, crops):
     doc = fitz.open(input_path)
     for page in doc:
         rect = page.rect
+        top_crop, bottom_crop = page_crop(page, crops)
         page.set_cropbox(fitz.Rect(rect.x0, rect.y0 + top_crop, rect.x1, rect.y1 - bottom_crop))
     doc.save(output_path)
     doc.close()
 
-def extract_multilevel_to_csv(input_pdf, output_csv, top_crop, bottom_crop):
+def extract_multilevel_to_csv(input_pdf, output_csv, crops, classifier=None):
+    """classifier 为 heading_classifier.FontClassifier 时按字号、粗细、缩进判断标题层级"""
     doc = fitz.open(input_pdf)
     with open(output_csv, 'w', newline='', encoding='utf-8-sig') as f:
         writer = csv.writer(f)
@@ -41,12 +48,24 @@ def extract_multilevel_to_csv(input_pdf, output_csv, top_crop, bottom_crop):
 
         for page in doc:
             rect = page.rect
+            top_crop, bottom_crop = page_crop(page, crops)
             crop_rect = fitz.Rect(rect.x0, rect.y0 + top_crop, rect.x1, rect.y1 - bottom_crop)
-            text = page.get_text(clip=crop_rect)
-            for line in text.split('\n'):
+            if classifier is None:
+                lines = [(line, None) for line in page.get_text(clip=crop_rect).split('\n')]
+            else:
+                # 一次 get_text("dict")，标题块整体作为一行，层级超过 3 的按三级处理
+                blocks = page_blocks(page, crop_rect)
+                lines = []
+                for block, level in zip(blocks, classifier.classify(blocks)):
+                    if level:
+                        lines.append((" ".join(block[0].split()), min(level, 3)))
+                    else:
+                        lines.extend((line, 0) for line in block[0].split('\n'))
+            for line, level in lines:
                 line = line.strip()
                 if not line: continue
-                level = get_header_level(line)
+                if level is None:
+                    level = get_header_level(line)
                 if level == 1:
                     flush(); level1, level2, level3 = clean_header_text(line), None, None; current_content = []
                 elif level == 2:
@@ -58,6 +77,34 @@ def extract_multilevel_to_csv(input_pdf, output_csv, top_crop, bottom_crop):
         flush()
     doc.close()
 
+def extract_outline_to_csv(input_pdf, output_csv, crops, entries):
+    """
+    文档带书签时按书签切分章节：书签层级直接对应一级/二级/三级标题（更深的层级并入三级），
+    不再逐行识别标题。entries 为 outline.read_outline 的结果。
+    """
+    doc = fitz.open(input_pdf)
+    pages, ys, texts = [], [], []
+    for page in doc:
+        rect = page.rect
+        top_crop, bottom_crop = page_crop(page, crops)
+        crop_rect = fitz.Rect(rect.x0, rect.y0 + top_crop, rect.x1, rect.y1 - bottom_crop)
+        for block in sorted(page.get_text("blocks", clip=crop_rect), key=lambda b: (b[1], b[0])):
+            pages.append(page.number)
+            ys.append(block[1] - rect.y0)
+            texts.append(block[4])
+    doc.close()
+
+    contents = slice_outline(entries, pages, ys, texts)
+    with open(output_csv, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['一级标题', '二级标题', '三级标题', '内容'])
+        headers = ['', '', '']
+        for (level, title, _, _), content in zip(entries, contents):
+            level = min(level, 3)
+            headers[level - 1] = clean_header_text(title)
+            headers[level:] = [''] * (3 - level)
+            writer.writerow(headers + ['\n'.join(clean_content(content.split('\n')))])
+
 def get_header_level(line):
     if len(line) > 50: return None
     if re.match(r'^\d+\s', line): return 1
@@ -78,17 +125,23 @@ def clean_content(lines):
             result.append(line)
     return result
 
-# ========= 路径设置 =========
-input_pdf = r"F:\Fusion\.py\input.pdf"
-cropped_pdf = r"F:\Fusion\.py\input_cropped.pdf"
-output_csv = r"F:\Fusion\.py\input_output.csv"
+if __name__ == "__main__":
+    # ========= 路径设置 =========
+    input_pdf = r"F:\Fusion\.py\input.pdf"
+    cropped_pdf = r"F:\Fusion\.py\input_cropped.pdf"
+    output_csv = r"F:\Fusion\.py\input_output.csv"
 
-doc = fitz.open(input_pdf)
-top_crop, bottom_crop = detect_header_footer_heights(doc)
-doc.close()
+    doc = fitz.open(input_pdf)
+    crops = detect_header_footer_heights(doc)
+    entries = read_outline(doc)
+    doc.close()
 
-crop_pdf(input_pdf, cropped_pdf, top_crop, bottom_crop)
-extract_multilevel_to_csv(cropped_pdf, output_csv, top_crop, bottom_crop)
+    crop_pdf(input_pdf, cropped_pdf, crops)
+    # 在原文件上按同样的高度裁剪提取（已剪裁的 PDF 页面尺寸变了，再裁一次会重复扣掉页眉页脚）
+    if entries:
+        extract_outline_to_csv(input_pdf, output_csv, crops, entries)
+    else:
+        extract_multilevel_to_csv(input_pdf, output_csv, crops, make_classifier())
 
-print("✅ 剪裁完成: ", cropped_pdf)
-print("✅ CSV生成: ", output_csv)
+    print("✅ 剪裁完成: ", cropped_pdf)
+    print("✅ CSV生成: ", output_csv)
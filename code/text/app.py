@@ -2,40 +2,66 @@ import fitz  # PyMuPDF
 import re
 import csv
 import os
-import tempfile
+import sys
 import gradio as gr
-
-def extract_pdf(input_pdf, top_cm, bottom_cm):
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.storage import discard, get_storage
+
+# 每次处理的工作目录放在受管的 tmp/ 下：结果文件需要保留到 Gradio 提供下载，之后由 TTL + 容量清理
+storage = get_storage(())
+storage.start()
+
+# 同时处理的任务数；其余请求在 Gradio 队列中等待，排队数超过 GRADIO_QUEUE 时新请求直接提示队列已满
+GRADIO_CONCURRENCY = int(os.environ.get("GRADIO_CONCURRENCY", "5"))
+GRADIO_QUEUE = int(os.environ.get("GRADIO_QUEUE", "20"))
+# 单个上传文件的大小上限（MB，Gradio 按文件检查）与页数上限
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "200"))
+MAX_PAGES = int(os.environ.get("MAX_PAGES", "5000"))
+
+def crop_rects(page, top_px, bottom_px):
+    """
+    返回 (提取文字用的 clip, 写入 PDF 的 cropbox)，都按未旋转的页面计算，
+    CSV 里的文字与裁剪后 PDF 上看到的内容一致。
+    """
+    box = page.cropbox
+    clip = fitz.Rect(0, top_px, box.width, box.height - bottom_px)
+    return clip, clip + (box.x0, box.y0, box.x0, box.y0)
+
+
+def crop_pdf(pdf_path, cropped_pdf_path, top_px, bottom_px):
+    """只改写每页的 cropbox，不复制页面内容；保存时回收未引用对象并压缩流"""
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            _, box = crop_rects(page, top_px, bottom_px)
+            page.set_cropbox(box)
+        doc.save(cropped_pdf_path, garbage=1, deflate=True)
+
+
+def extract_pdf(input_pdf, top_cm, bottom_cm, make_pdf=False):
+    # 创建临时工作目录
+    temp_dir = storage.temp_dir(prefix="extract_")
+    pdf_path = os.path.join(temp_dir, "input.pdf")
     try:
-        # 创建临时工作目录
-        temp_dir = tempfile.mkdtemp()
-        pdf_path = os.path.join(temp_dir, "input.pdf")
         input_pdf.save(pdf_path)
 
         output_csv = os.path.join(temp_dir, "output.csv")
-        cropped_pdf_path = os.path.join(temp_dir, "cropped.pdf")
+        top_px = top_cm * 28.35
+        bottom_px = bottom_cm * 28.35
 
-        doc = fitz.open(pdf_path)
-        cropped_doc = fitz.open()
-
-        with open(output_csv, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        # 按裁剪区域一次遍历提取文字，不生成裁剪后的页面
+        with open(output_csv, 'w', newline='', encoding='utf-8-sig') as csvfile, fitz.open(pdf_path) as doc:
+            if MAX_PAGES and doc.page_count > MAX_PAGES:
+                raise gr.Error(f"文档共 {doc.page_count} 页，超过上限 {MAX_PAGES} 页")
             writer = csv.writer(csvfile)
             writer.writerow(['标题', '内容'])
 
             current_title = None
             current_content = []
 
-            for i, page in enumerate(doc):
-                h = page.rect.height
-                top_px = top_cm * 28.35
-                bottom_px = bottom_cm * 28.35
-                crop_rect = fitz.Rect(page.rect.x0, page.rect.y0 + top_px, page.rect.x1, page.rect.y1 - bottom_px)
-
-                text = page.get_text(clip=crop_rect)
-
-                # 添加裁剪后的页到新PDF
-                new_page = cropped_doc.new_page(width=page.rect.width, height=crop_rect.height)
-                new_page.show_pdf_page(fitz.Rect(0, 0, page.rect.width, crop_rect.height), doc, i, clip=crop_rect)
+            for page in doc:
+                clip, _ = crop_rects(page, top_px, bottom_px)
+                text = page.get_text(clip=clip)
 
                 if not text:
                     continue
@@ -57,14 +83,23 @@ def extract_pdf(input_pdf, top_cm, bottom_cm):
             if current_title:
                 writer.writerow([current_title, '\n'.join(clean_content(current_content))])
 
-        doc.close()
-        cropped_doc.save(cropped_pdf_path)
-        cropped_doc.close()
-
+        # 裁剪后的 PDF 只在勾选时生成
+        if not make_pdf:
+            return output_csv, None
+        cropped_pdf_path = os.path.join(temp_dir, "cropped.pdf")
+        crop_pdf(pdf_path, cropped_pdf_path, top_px, bottom_px)
         return output_csv, cropped_pdf_path
 
+    except gr.Error:
+        # 出错时不会有结果交给 Gradio，整个工作目录一并删除
+        discard(temp_dir)
+        raise
     except Exception as e:
+        discard(temp_dir)
         return f"❌ 出错：{str(e)}", None
+    finally:
+        # 原始上传文件不再需要（页数超限等提前退出时也要删除）
+        discard(pdf_path)
 
 
 def get_smart_header(line):
@@ -93,6 +128,7 @@ with gr.Blocks() as demo:
         pdf_input = gr.File(label="上传 PDF 文件", file_types=[".pdf"])
         top_cm = gr.Number(value=2, label="页眉裁剪（cm）")
         bottom_cm = gr.Number(value=2, label="页脚裁剪（cm）")
+        make_pdf = gr.Checkbox(value=False, label="同时生成裁剪后 PDF")
 
     run_btn = gr.Button("🔍 开始处理")
 
@@ -100,9 +136,17 @@ with gr.Blocks() as demo:
     pdf_output = gr.File(label="裁剪后 PDF")
 
     run_btn.click(fn=extract_pdf,
-                  inputs=[pdf_input, top_cm, bottom_cm],
+                  inputs=[pdf_input, top_cm, bottom_cm, make_pdf],
                   outputs=[csv_output, pdf_output])
 
-# ✅ 支持最多5个用户同时处理任务
-demo.queue(concurrency_count=5).launch()
-# demo.queue(concurrency_count=5).launch(server_name="0.0.0.0", server_port=7860)
+    with gr.Accordion("存储占用", open=False):
+        usage_output = gr.JSON()
+        gr.Button("刷新").click(fn=storage.usage, outputs=usage_output)
+
+# ✅ 默认支持最多5个用户同时处理任务（Gradio 4 起 concurrency_count 改为 default_concurrency_limit）
+# 只在直接运行时启动服务，基准测试等脚本可以导入 extract_pdf 而不启动界面
+if __name__ == "__main__":
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE).launch(
+        max_file_size=f"{MAX_UPLOAD_MB}mb")
+# demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE).launch(
+#     server_name="0.0.0.0", server_port=7860, max_file_size=f"{MAX_UPLOAD_MB}mb")
@@ -1,48 +1,79 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.responses import StreamingResponse
 import fitz  # PyMuPDF
-import re, csv, io, zipfile
-from tempfile import NamedTemporaryFile
+import asyncio
+import re, csv, os, shutil, sys
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.storage import get_storage, discard
+from common.zip_util import stream_zip, ZIP_COMPRESSLEVEL
 
 app = FastAPI()
+# 每个请求的临时文件放在受管的 tmp/ 下，请求结束即删除，遗漏的由 TTL 兜底
+storage = get_storage(())
+
+@app.on_event("startup")
+async def on_startup():
+    storage.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    storage.stop()
+
+@app.get("/api/storage")
+def storage_usage():
+    return storage.usage()
 
 @app.post("/api/process-pdf")
-def process_pdf(
+async def process_pdf(
     file: UploadFile = File(...),
     top_cm: float = Form(...),
-    bottom_cm: float = Form(...)
+    bottom_cm: float = Form(...),
+    compresslevel: int = Form(ZIP_COMPRESSLEVEL, ge=0, le=9)
 ):
     # 将 cm 转换为 px（近似）
     top_px = int(float(top_cm) * 28.35)
     bottom_px = int(float(bottom_cm) * 28.35)
 
-    # 保存上传的 PDF
-    temp_input = NamedTemporaryFile(delete=False, suffix=".pdf")
-    temp_input.write(file.file.read())
-    temp_input.close()
+    # 保存上传的 PDF：分块写入磁盘，不把整个上传读进内存；文件操作放在线程中，不阻塞事件循环
+    temp_dir = await asyncio.to_thread(storage.temp_dir, "process_")
+    input_path = os.path.join(temp_dir, "input.pdf")
 
     # 创建输出 PDF 路径
-    cropped_path = temp_input.name.replace('.pdf', '_cropped.pdf')
-    csv_path = temp_input.name.replace('.pdf', '_output.csv')
-
-    # 剪裁 PDF
-    crop_pdf(temp_input.name, cropped_path, top_px, bottom_px)
-
-    # 提取结构化内容
-    extract_to_csv(cropped_path, csv_path, top_px, bottom_px)
-
-    # 打包为 zip
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zipf:
-        zipf.write(cropped_path, arcname="output_cropped.pdf")
-        zipf.write(csv_path, arcname="output.csv")
-    zip_buffer.seek(0)
-
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={
+    cropped_path = os.path.join(temp_dir, "input_cropped.pdf")
+    csv_path = os.path.join(temp_dir, "input_output.csv")
+
+    try:
+        await asyncio.to_thread(save_upload, file.file, input_path)
+        # 剪裁与提取在开始响应之前完成，出错时仍能返回错误状态码，而不是发出不完整的 ZIP
+        await asyncio.to_thread(crop_pdf, input_path, cropped_path, top_px, bottom_px)
+        await asyncio.to_thread(extract_to_csv, cropped_path, csv_path, top_px, bottom_px)
+    except Exception:
+        await asyncio.to_thread(discard, temp_dir)
+        raise
+
+    async def members():
+        yield "output_cropped.pdf", cropped_path
+        yield "output.csv", csv_path
+
+    async def body():
+        try:
+            async for chunk in stream_zip(members(), compresslevel):
+                yield chunk
+        finally:
+            # 打包发送完毕（或客户端断开）后删除临时文件
+            await asyncio.to_thread(discard, temp_dir)
+
+    return StreamingResponse(body(), media_type="application/zip", headers={
         "Content-Disposition": "attachment; filename=processed_output.zip"
     })
 
 
+def save_upload(src, path):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(src, f, 1024 * 1024)
+
+
 def crop_pdf(input_path, output_path, top_crop, bottom_crop):
     doc = fitz.open(input_path)
     for page in doc:
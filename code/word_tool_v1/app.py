@@ -1,17 +1,38 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import Query
-from typing import List
-from io import BytesIO
-from convert_doc import convert_doc_to_pdf
-from process import process_pdf_and_extract
-from preview import generate_preview_image
-from zip_util import zip_csvs
-from uuid import uuid4
-import shutil
+from starlette.background import BackgroundTask
+from fastapi import Query, HTTPException
+from typing import List, Literal, Union
 import os
+import sys
+import threading
+# 共用模块在上一级目录的 common/ 包里（Docker 镜像中 common/ 就在工作目录下）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from convert_doc import convert_doc_to_pdf
+from process import extract_outline, page_sizes, stream_sections, iter_sections, format_sections
+from common.sections import count_pages, download_name, result_names
+from docx_extract import iter_paragraphs, use_native
+from preview import (render_preview, render_page, crop_frame, render_thumbnails, preview_page_number,
+                     PREVIEW_VERSION, FRAME_WIDTH, THUMB_WIDTH, THUMB_COUNT, THUMB_MAX)
+from common.result_cache import get_cache
+from common.auto_crop import crop_key, detect_margins
+from common.zip_util import stream_zip, iter_members, ZIP_COMPRESSLEVEL
+from worker_pool import iter_saved_files, process_saved_files, is_word, convert_in_office, outline_entries
+from common.process_pool import shutdown_pool
+from office_pool import shutdown_office_pool
+from common.jobs import JobManager
+from sessions import SessionStore
+from common.upload_util import spool_uploads, remove_quietly
+from common.executors import run_io, run_office, run_render, shutdown_executors
+from common.mem_monitor import MemoryPeakMiddleware
+from common.admission import AdmissionMiddleware, check_pages, reject
+from common.scheduler import INTERACTIVE, SchedulingMiddleware, set_lane
+from common.metrics import HTTP_REJECTED, MetricsMiddleware, file_type, set_file, render as render_metrics
+from common.request_profile import PROFILE_DIR, PROFILE_HEADER, ProfileMiddleware, artifact_path, authorized
+from common.storage import get_storage, discard
+import base64
 from fastapi.responses import JSONResponse
 from fastapi import Request
 import traceback
@@ -25,64 +46,302 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
+app.add_middleware(MemoryPeakMiddleware)
+# 在指标中间件之内：被拒绝的请求同样计入请求耗时与状态码
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(SchedulingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfileMiddleware)
+
+# 首页在启动时读入内存，之后每次请求不再读盘
+with open("static/index.html", "r", encoding="utf-8") as f:
+    INDEX_HTML = f.read()
+
+job_manager = JobManager(process_saved_files)
+session_store = SessionStore()
+# outputs/、uploads/、性能分析结果及 Word 转换临时目录的 TTL + 容量管理
+storage = get_storage(("outputs", "uploads", PROFILE_DIR))
+
+@app.on_event("startup")
+async def on_startup():
+    job_manager.start()
+    session_store.start()
+    storage.start()
+    # 结果缓存首次创建时会扫描缓存目录，提前在 I/O 线程池中完成
+    await run_io(get_cache)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_manager.stop()
+    await session_store.stop()
+    storage.stop()
+    shutdown_pool()
+    shutdown_office_pool()
+    shutdown_executors()
 
 @app.get("/")
 async def root():
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+    return HTMLResponse(content=INDEX_HTML, status_code=200)
+
+@app.post("/documents/")
+async def create_document(file: UploadFile = File(...)):
+    """
+    上传一次，返回 doc_id；Word 在这里完成转换，之后的 /preview/、/process_batch/、/jobs/
+    只需传 doc_id，服务端在 SESSION_TTL 内保持转换好的 PDF 处于打开状态。
+    """
+    [(upload_path, digest)] = await spool_uploads([file])
+    try:
+        session = await session_store.create(upload_path, digest, file.filename)
+    except Exception:
+        await run_io(remove_quietly, upload_path)
+        raise
+    return {"doc_id": session.id, "filename": session.filename, "page_count": session.page_count}
+
+
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    return {"deleted": await session_store.close(doc_id)}
+
+
+def get_session(doc_id):
+    session = session_store.get(doc_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"文档会话 {doc_id} 不存在或已过期")
+    return session
+
+
+async def collect_inputs(files, doc_ids, native=True):
+    """
+    把上传文件和文档会话统一成 (路径, 文件名, 哈希) 列表，顺序为先 files 后 doc_ids；
+    返回的 cleanup 用于删除临时上传文件、释放会话，会删除文件，协程中需放到 I/O 线程池调用。
+    native 为 False 时 .docx 会话给出已转换的 PDF（需要页面版式的场景，如自动裁剪）。
+    """
+    sessions = [get_session(doc_id) for doc_id in doc_ids or []]
+    spooled = await spool_uploads(files or [])
+    storage.pin(*[path for path, _ in spooled])
+    for session in sessions:
+        session_store.acquire(session)
+
+    def cleanup():
+        for path, _ in spooled:
+            storage.unpin(path)
+            remove_quietly(path)
+        for session in sessions:
+            session_store.release(session)
+
+    # .docx 会话直接交给原生解析，转换出的 PDF 只用于预览
+    session_paths = await run_io(lambda: [
+        s.upload_path if native and use_native(s.upload_path) else s.pdf_path for s in sessions])
+    paths = [path for path, _ in spooled] + session_paths
+    filenames = [file.filename for file in files or []] + [s.filename for s in sessions]
+    digests = [digest for _, digest in spooled] + [s.digest for s in sessions]
+    if len(paths) == 1:
+        # 单文件请求走交互通道，得知页数后大文档再改回批量通道（见 worker_pool.load_index）
+        set_lane(INTERACTIVE)
+    return paths, filenames, digests, cleanup
+
+
+# 裁剪距离（cm）；"auto" 表示按自动检测的页眉页脚高度裁剪
+CropCm = Union[float, Literal["auto"]]
+
+
+@app.post("/auto_crop/")
+async def auto_crop(file: UploadFile = File(None), doc_id: str = Form(None)):
+    """返回自动检测出的各页面尺寸的页眉/页脚裁剪距离，供前端填入或展示"""
+    if file is None and not doc_id:
+        raise HTTPException(status_code=422, detail="需要上传 file 或提供 doc_id")
+    paths, _, _, cleanup = await collect_inputs([file] if file is not None else None, [doc_id] if doc_id else None,
+                                                native=False)
+    pdf_path = paths[0]
+    converted = None
+    try:
+        if is_word(pdf_path):
+            [converted] = await convert_in_office([pdf_path])
+            pdf_path = converted
+        margins = await run_render(detect_margins, pdf_path)
+        return {"margins": margins.to_list()}
+    finally:
+        await run_io(cleanup)
+        if converted is not None:
+            await run_io(discard, os.path.dirname(converted))
+
 
 @app.post("/preview/")
 async def preview(
-    file: UploadFile = File(...),
-    top_cm: float = Form(...),
-    bottom_cm: float = Form(...)
+    file: UploadFile = File(None),
+    doc_id: str = Form(None),
+    top_cm: CropCm = Form(...),
+    bottom_cm: CropCm = Form(...)
 ):
-    ext = file.filename.rsplit(".", 1)[-1].lower()
+    """返回预览页裁剪区域的 PNG（裁剪距离可为 "auto"）；交互拖动请使用 /ws/preview/{doc_id}"""
+    if doc_id:
+        session = get_session(doc_id)
+        set_file(file_type(session.filename))
+        # 渲染期间占用会话，DELETE 或过期清理不会在此时关闭文档
+        session_store.acquire(session)
+        try:
+            cache = get_cache()
+            key = cache.make_key(session.digest, "preview", PREVIEW_VERSION, *crop_key(top_cm, bottom_cm))
+            png = await run_io(cache.read, key)
+            if png is None:
+                # 会话中的文档已打开（Word 已转换），直接渲染
+                def render():
+                    with session.lock:
+                        return render_preview(session.pdf, top_cm, bottom_cm)
+                png = await run_render(render)
+                await run_io(cache.write, key, png, ".png")
+        finally:
+            session_store.release(session)
+        return Response(content=png, media_type="image/png")
 
-    if ext in ("doc", "docx"):
-        # Word 先转换为 PDF，得到文件路径
-        pdf_path = convert_doc_to_pdf(file)
-        # 直接传路径给 generate_preview_image
-        preview_path = generate_preview_image(pdf_path, top_cm, bottom_cm)
-    else:
-        # 对 PDF 上传文件
-        file_bytes = await file.read()
-        preview_path = generate_preview_image((file_bytes), top_cm, bottom_cm)
+    if file is None:
+        raise HTTPException(status_code=422, detail="需要上传 file 或提供 doc_id")
 
-    return {"preview_path": preview_path}
+    set_file(file_type(file.filename))
+    # 上传内容分块落盘并顺带计算哈希，之后一律按路径打开，不在内存里保留整份文件
+    [(upload_path, digest)] = await spool_uploads([file])
+    try:
+        cache = get_cache()
+        key = cache.make_key(digest, "preview", PREVIEW_VERSION, *crop_key(top_cm, bottom_cm))
+        png = await run_io(cache.read, key)
+        if png is not None:
+            return Response(content=png, media_type="image/png")
 
-from io import BytesIO
+        ext = file.filename.rsplit(".", 1)[-1].lower()
+
+        if ext in ("doc", "docx"):
+            # Word 先转换为 PDF，得到文件路径
+            pdf_path = await run_office(convert_doc_to_pdf, upload_path)
+            # 直接传路径给 render_preview，用完删除转换目录
+            try:
+                png = await run_render(render_preview, pdf_path, top_cm, bottom_cm)
+            finally:
+                await run_io(discard, os.path.dirname(pdf_path))
+        else:
+            png = await run_render(render_preview, upload_path, top_cm, bottom_cm)
+
+        await run_io(cache.write, key, png, ".png")
+        return Response(content=png, media_type="image/png")
+    finally:
+        await run_io(remove_quietly, upload_path)
+
+
+@app.websocket("/ws/preview/{doc_id}")
+async def preview_channel(websocket: WebSocket, doc_id: str):
+    """
+    交互预览通道，客户端发送 JSON 消息：
+      {"type": "crop", "top_cm": 2.5, "bottom_cm": 2.5, "width": 800}  回一帧 JPEG（二进制消息，"format": "webp" 可选）
+      {"type": "page", "page": 3}                                       切换预览页，回 {"type": "page", ...}
+      {"type": "thumbnails", "pages": [0, 1, 2], "width": 160}          逐页回 {"type": "thumbnail", ...}
+    预览页整页只渲染一次并缓存在连接上，拖动裁剪滑块时只做像素切片、缩放和编码。
+    """
+    await websocket.accept()
+    session = session_store.get(doc_id)
+    if session is None:
+        await websocket.close(code=4404, reason="文档会话不存在或已过期")
+        return
+
+    session_store.acquire(session)
+    page_no = None
+    raster = None
+
+    def render(width):
+        with session.lock:
+            return render_page(session.pdf, page_no, width)
+
+    def first_page():
+        with session.lock:
+            return preview_page_number(session.pdf)
 
-@app.post("/process_batch/")
-async def process_batch(
-    files: List[UploadFile] = File(...),
-    top_cm: float = Form(...),
-    bottom_cm: float = Form(...)
-):
     try:
-        csv_paths = []
+        page_no = await run_render(first_page)
+        await websocket.send_json({"type": "page", "page": page_no, "page_count": session.page_count})
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if not isinstance(message, dict):
+                    raise ValueError("消息应为 JSON 对象")
+                kind = message.get("type")
+                if kind == "crop":
+                    width = _message_width(message, FRAME_WIDTH)
+                    top_cm, bottom_cm = float(message.get("top_cm", 0)), float(message.get("bottom_cm", 0))
+                    if raster is None or raster[0] != width:
+                        raster = (width, await run_render(render, width))
+                    frame = await run_render(crop_frame, raster[1], top_cm, bottom_cm, message.get("format", "jpeg"))
+                    await websocket.send_bytes(frame)
+                elif kind == "page":
+                    page_no = min(max(int(message.get("page", 0)), 0), session.page_count - 1)
+                    raster = None
+                    await websocket.send_json({"type": "page", "page": page_no, "page_count": session.page_count})
+                elif kind == "thumbnails":
+                    pages = _thumbnail_pages(message.get("pages"), session.page_count)
+                    thumbs = await render_thumbnails(session.pdf_path, pages, _message_width(message, THUMB_WIDTH))
+                    for page, thumb in zip(pages, thumbs):
+                        await websocket.send_json({
+                            "type": "thumbnail", "page": page,
+                            "data": "data:image/jpeg;base64," + base64.b64encode(thumb).decode("ascii"),
+                        })
+                else:
+                    await websocket.send_json({"type": "error", "error": f"未知消息类型 {kind}"})
+            except (ValueError, TypeError) as e:
+                # 参数不合法时回一条错误消息，连接保持可用
+                await websocket.send_json({"type": "error", "error": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session_store.release(session)
 
-        for file in files:
-            ext = file.filename.rsplit(".", 1)[-1].lower()
 
-            if ext in ("doc", "docx"):
-                pdf_path = convert_doc_to_pdf(file)
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = f.read()
-                csv_path = process_pdf_and_extract(BytesIO(pdf_bytes), top_cm, bottom_cm, filename=file.filename)
-            else:
-                file_bytes = await file.read()
-                csv_path = process_pdf_and_extract(BytesIO(file_bytes), top_cm, bottom_cm, filename=file.filename)
+def _message_width(message, default):
+    # 宽度限制在 16 ~ 2 倍默认帧宽之间，避免按超大尺寸渲染
+    width = message.get("width", default)
+    if isinstance(width, bool) or not isinstance(width, (int, float)):
+        raise ValueError(f"width 应为数字，收到 {width!r}")
+    return min(max(int(width), 16), 2 * FRAME_WIDTH)
 
-            csv_paths.append(csv_path)
 
-        if len(csv_paths) == 1:
-            return JSONResponse(content={"path": csv_paths[0], "is_zip": False})
-        else:
-            zip_path = zip_csvs(csv_paths)
-            return JSONResponse(content={"path": zip_path, "is_zip": True})
+def _thumbnail_pages(pages, page_count):
+    """缩略图请求的页码：缺省为前 THUMB_COUNT 页；须为不超过 THUMB_MAX 个、在文档页数范围内的整数"""
+    if pages is None:
+        return list(range(min(page_count, THUMB_COUNT)))
+    if not isinstance(pages, list) or len(pages) > THUMB_MAX:
+        raise ValueError(f"pages 应为不超过 {THUMB_MAX} 个页码的列表")
+    for page in pages:
+        if isinstance(page, bool) or not isinstance(page, int) or not 0 <= page < page_count:
+            raise ValueError(f"页码 {page!r} 无效，应为 0 到 {page_count - 1} 的整数")
+    return pages
+
+
+ZIP_HEADERS = {"Content-Disposition": "attachment; filename=csvs.zip", "X-Accel-Buffering": "no"}
 
+
+@app.post("/process_batch/")
+async def process_batch(
+    files: List[UploadFile] = File(None),
+    doc_ids: List[str] = Form(None),
+    top_cm: CropCm = Form(...),
+    bottom_cm: CropCm = Form(...),
+    compresslevel: int = Form(ZIP_COMPRESSLEVEL, ge=0, le=9)
+):
+    """
+    单个文件返回 CSV 路径（JSON）；多个文件直接流式返回 ZIP，
+    每个文件提取完成即写入压缩包发出，不再先在 outputs/ 生成完整的 ZIP。
+    ZIP 开始发送后再出错只能中断连接，客户端会得到不完整的压缩包。
+    """
+    if not files and not doc_ids:
+        raise HTTPException(status_code=422, detail="需要上传 files 或提供 doc_ids")
+    paths, filenames, digests, cleanup = await collect_inputs(files, doc_ids)
+    # Word 批量交给 LibreOffice 实例池转换，提取交给进程池并行
+    results = iter_saved_files(paths, top_cm, bottom_cm, filenames, digests=digests)
+    try:
+        # 等第一个文件完成再开始响应，转换、打开文档等早期错误仍能返回 500
+        first = await results.__anext__()
     except Exception as e:
+        await results.aclose()
+        await run_io(cleanup)
+        if isinstance(e, HTTPException):
+            # 超出页数上限等，按原状态码返回
+            raise
         # 打印错误日志方便调试
         traceback.print_exc()
         return JSONResponse(
@@ -90,7 +349,183 @@ async def process_batch(
             content={"error": "文档处理失败", "detail": str(e)}
         )
 
+    if len(paths) == 1:
+        await results.aclose()
+        await run_io(cleanup)
+        return JSONResponse(content={"path": first[1], "is_zip": False})
+
+    # ZIP 成员名取自原上传文件名，磁盘上的 uuid 前缀不出现在压缩包里
+    names = result_names(filenames)
+
+    async def members():
+        yield names[first[0]], first[1]
+        async for i, csv_path in results:
+            yield names[i], csv_path
+
+    async def body():
+        try:
+            async for chunk in stream_zip(members(), compresslevel):
+                yield chunk
+        except Exception:
+            traceback.print_exc()
+            raise
+        finally:
+            await results.aclose()
+            await run_io(cleanup)
+
+    return StreamingResponse(body(), media_type="application/zip", headers=ZIP_HEADERS)
+
+
+STREAM_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@app.post("/extract/stream")
+async def extract_stream(
+    file: UploadFile = File(None),
+    doc_id: str = Form(None),
+    top_cm: CropCm = Form(...),
+    bottom_cm: CropCm = Form(...),
+    fmt: Literal["csv", "ndjson"] = Form("csv", alias="format")
+):
+    """
+    边解析边返回单个文档的标题与内容（CSV 或 NDJSON），每个标题结束上一节时即发出该节，
+    超大 PDF 也能很快收到第一条结果，服务端内存与文档大小无关。不经过结果缓存。
+    裁剪距离可为 "auto"；带书签的 PDF 与 /process_batch/ 一样按书签切分，整份切分完再逐节发出。
+    与 /process_batch/ 的区别：重复出现的标题各自成节，不会以后一次为准覆盖前一次。
+    """
+    if file is None and not doc_id:
+        raise HTTPException(status_code=422, detail="需要上传 file 或提供 doc_id")
+    paths, _, _, cleanup = await collect_inputs([file] if file is not None else None, [doc_id] if doc_id else None)
+    pdf_path = paths[0]
+    converted = None
+    done = threading.Lock()
+
+    def release():
+        # 生成器结束时和响应结束后（包括客户端提前断开、响应从未开始发送）都会调用，只执行一次
+        if not done.acquire(blocking=False):
+            return
+        cleanup()
+        if converted is not None:
+            discard(os.path.dirname(converted))
+
+    set_file(file_type(pdf_path))
+    try:
+        if await run_io(use_native, pdf_path):
+            # .docx 按段落样式直接流式解析，不转换，裁剪参数不起作用
+            sections = iter_sections(iter_paragraphs(pdf_path))
+        else:
+            if is_word(pdf_path):
+                [converted] = await convert_in_office([pdf_path])
+                pdf_path = converted
+            check_pages(await run_render(count_pages, pdf_path))
+            if "auto" in (top_cm, bottom_cm):
+                margins = await run_render(detect_margins, pdf_path)
+                top_cm, bottom_cm = margins.resolve(top_cm, bottom_cm, *await run_render(page_sizes, pdf_path))
+            entries = await run_render(outline_entries, pdf_path)
+            if entries:
+                sections = outline_sections(pdf_path, top_cm, bottom_cm, entries)
+            else:
+                sections = stream_sections(pdf_path, top_cm, bottom_cm)
+    except BaseException:
+        await run_io(release)
+        raise
+
+    def body():
+        # 同步生成器由 StreamingResponse 放到线程池中迭代，解析不阻塞事件循环
+        try:
+            yield from format_sections(sections, fmt)
+        finally:
+            release()
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[fmt],
+                             headers={"X-Accel-Buffering": "no"}, background=BackgroundTask(release))
+
+
+def outline_sections(pdf_path, top_cm, bottom_cm, entries):
+    """按书签切分的 (标题, 内容)；在迭代时（线程池中）才解析"""
+    for heading, content in extract_outline(pdf_path, top_cm, bottom_cm, entries):
+        yield heading, content
+
+
+@app.post("/jobs/")
+async def submit_job(
+    files: List[UploadFile] = File(None),
+    doc_ids: List[str] = Form(None),
+    top_cm: CropCm = Form(...),
+    bottom_cm: CropCm = Form(...)
+):
+    """提交批处理任务，立即返回 job_id；结果完成后仍通过 /download/ 下载"""
+    if not files and not doc_ids:
+        raise HTTPException(status_code=422, detail="需要上传 files 或提供 doc_ids")
+    if job_manager.full():
+        # 排队的任务已达上限时不再接收上传，避免积压的上传文件占满磁盘与内存
+        HTTP_REJECTED.inc(route="/jobs/", reason="queue_full")
+        return reject(429, "待执行的批处理任务过多")
+    paths, filenames, digests, cleanup = await collect_inputs(files, doc_ids)
+    job = job_manager.submit(paths, filenames, top_cm, bottom_cm, digests=digests, cleanup=cleanup)
+    return {"job_id": job.id}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "任务不存在或已过期"})
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "任务不存在或已过期"})
+    return StreamingResponse(
+        job_manager.events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}/download")
+async def job_download(job_id: str, compresslevel: int = Query(ZIP_COMPRESSLEVEL, ge=0, le=9)):
+    """多文件任务的结果：把各 CSV 现场打包成 ZIP 流式下载，不在磁盘上保留压缩包"""
+    job = job_manager.get(job_id)
+    if job is None or job.state != "done":
+        return JSONResponse(status_code=404, content={"error": "任务不存在、已过期或未完成"})
+    if not job.result["is_zip"]:
+        return FileResponse(job.result["path"], filename=result_names(job.filenames)[0])
+    return StreamingResponse(
+        stream_zip(iter_members(job.result["paths"], result_names(job.filenames)), compresslevel),
+        media_type="application/zip", headers=ZIP_HEADERS)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return get_cache().stats()
+
+
+@app.get("/storage/usage")
+async def storage_usage():
+    return await run_io(storage.usage)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标（本 uvicorn worker 进程内的统计）"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request, profile: str = Query("")):
+    """下载按请求生成的性能分析结果（见 request_profile），需要与开启分析时相同的口令"""
+    if not authorized(request.headers.get(PROFILE_HEADER, profile)):
+        raise HTTPException(status_code=403, detail="口令错误或未开启性能分析")
+    path = artifact_path(os.path.basename(profile_id))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="分析结果不存在、已过期或请求尚未结束")
+    return FileResponse(path, filename=f"profile_{os.path.basename(profile_id)}.zip")
+
 
 @app.get("/download/")
 async def download(path: str = Query(..., alias="path")):
-    return FileResponse(path, filename=os.path.basename(path))
+    return FileResponse(path, filename=download_name(path))
@@ -0,0 +1,230 @@
+import time
+
+import fitz
+import numpy as np
+
+from common.metrics import stage
+from common.outline import slice_outline
+from common.request_profile import record_page
+from common.sections import open_pdf
+from process import page_text_blocks, page_font_blocks, split_sections
+
+# 索引结构或取值方式有改动时递增，使缓存中的旧索引失效
+INDEX_VERSION = "1"
+
+# 每行文本的数值属性，按列存成等长数组（struct-of-arrays）
+LINE_FIELDS = {
+    "page": np.int32,     # 页号（从 0 开始）
+    "block": np.int32,    # 页内块号
+    "x0": np.float64,     # 行的排版框（与 get_text("blocks") 的坐标一致，用于排序）
+    "y0": np.float64,
+    "x1": np.float64,
+    "y1": np.float64,
+    "ink_y0": np.float64,  # 行内字形实际笔画的上下边界，MuPDF 按它判断字符是否落在 clip 内
+    "ink_y1": np.float64,
+    "size": np.float32,    # 行内最大字号
+    "flags": np.int32,     # 首个 span 的字体标志（粗体/斜体等）
+}
+PAGE_FIELDS = ("page_x0", "page_y0", "page_x1", "page_y1")
+
+
+class BlockIndex:
+    """
+    与裁剪参数无关的文本索引：一次解析保存 [start, stop) 页每一行文字及其坐标、字号、页号，
+    之后任意 top_cm/bottom_cm 都只是对 y 坐标做一次向量化过滤，不再重新解析 PDF。
+    被裁剪线从中间穿过的行（笔画与裁剪边界相交）无法从索引还原 MuPDF 的逐字符裁剪，
+    这些页会回退为对原 PDF 实时 get_text，保证结果与 extract_page_range 完全一致。
+    """
+
+    def __init__(self, start, arrays, texts):
+        self.start = start
+        self.arrays = arrays
+        self.texts = texts
+
+    @property
+    def stop(self):
+        return self.start + len(self.arrays["page_y0"])
+
+    def page_sizes(self):
+        """[start, stop) 各页的 (宽数组, 高数组)"""
+        a = self.arrays
+        return a["page_x1"] - a["page_x0"], a["page_y1"] - a["page_y0"]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values()) + sum(len(t) for t in self.texts)
+
+    @classmethod
+    def concat(cls, parts):
+        """按页序拼接各分片建立的索引"""
+        arrays = {name: np.concatenate([p.arrays[name] for p in parts]) for name in parts[0].arrays}
+        texts = [text for p in parts for text in p.texts]
+        return cls(parts[0].start, arrays, texts)
+
+    def save(self, path):
+        # 行文本本身不含换行符，用 "\n" 拼成一段 UTF-8 字节存储
+        text = np.frombuffer("\n".join(self.texts).encode("utf-8"), dtype=np.uint8)
+        np.savez(path, start=np.int32(self.start), text=text, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in (*LINE_FIELDS, *PAGE_FIELDS)}
+            texts = data["text"].tobytes().decode("utf-8").split("\n")
+            start = int(data["start"])
+        if not len(arrays["page"]):
+            texts = []
+        return cls(start, arrays, texts)
+
+    def _blocks(self, start, stop, top_cm, bottom_cm, pdf=None, features=False):
+        """
+        [start, stop) 页裁剪后按阅读顺序排列的文本块，返回 (blocks, 页号列表, 块顶部 y 列表)。
+        blocks 的元素为 (文字,)；features 为 True 时为 heading_classifier.page_blocks 的格式，
+        此时回退页不提供 y（为 None）。
+        """
+        a = self.arrays
+        page = a["page"]
+        rows = np.flatnonzero((page >= start) & (page < stop))
+        local = page[rows] - self.start
+        clip_y0 = a["page_y0"][local] + _per_page(top_cm, local) * 28.35
+        clip_y1 = a["page_y1"][local] - _per_page(bottom_cm, local) * 28.35
+        ink_y0 = a["ink_y0"][rows]
+        ink_y1 = a["ink_y1"][rows]
+
+        inside = (clip_y0 < ink_y0) & (ink_y1 < clip_y1)
+        outside = (ink_y1 < clip_y0) | (ink_y0 > clip_y1) | (clip_y0 >= clip_y1)
+        fallback_pages = np.unique(page[rows[~inside & ~outside]])
+        keep = rows[inside & ~np.isin(page[rows], fallback_pages)]
+
+        # 保留下来的行按 (页, 块) 重新分组，块坐标取其保留行的最小值，与 clip 后的块框一致
+        blocks = []
+        pages = []
+        ys = []
+        if len(keep):
+            key = page[keep].astype(np.int64) << 32 | a["block"][keep]
+            starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+            ends = np.r_[starts[1:], len(keep)]
+            block_x0 = np.minimum.reduceat(a["x0"][keep], starts)
+            block_y0 = np.minimum.reduceat(a["y0"][keep], starts)
+            block_page = page[keep][starts]
+            order = np.lexsort((block_x0, block_y0, block_page))
+            lines = [self.texts[i] for i in keep.tolist()]
+            texts = ["\n".join(lines[s:e]) for s, e in zip(starts[order].tolist(), ends[order].tolist())]
+            if not features:
+                blocks = [(text,) for text in texts]
+            else:
+                block_features = zip(
+                    np.maximum.reduceat(a["size"][keep], starts)[order].tolist(),
+                    a["flags"][keep][starts][order].tolist(),
+                    block_x0[order].tolist(),
+                    (ends - starts)[order].tolist(),
+                )
+                blocks = [(text, *feature) for text, feature in zip(texts, block_features)]
+            pages = block_page[order].tolist()
+            # 页面原点不一定是 (0, 0)，y 换算为相对页面顶部，与书签目标点一致
+            ys = (block_y0[order] - a["page_y0"][block_page[order] - self.start]).tolist()
+
+        if len(fallback_pages):
+            doc = open_pdf(pdf) if not isinstance(pdf, fitz.Document) else pdf
+            merged = ([], [], [])
+            fallback = iter(fallback_pages.tolist())
+            next_page = next(fallback, None)
+            for block, page_no, y in zip(blocks + [None], pages + [stop], ys + [None]):
+                while next_page is not None and next_page < page_no:
+                    local_page = next_page - self.start
+                    top, bottom = _per_page(top_cm, local_page), _per_page(bottom_cm, local_page)
+                    if features:
+                        page_blocks = [(block, None) for block in page_font_blocks(doc[next_page], top, bottom)]
+                    else:
+                        page_y0 = doc[next_page].rect.y0
+                        page_blocks = [((text,), y - page_y0)
+                                       for y, text in page_text_blocks(doc[next_page], top, bottom)]
+                    for page_block, page_block_y in page_blocks:
+                        merged[0].append(page_block)
+                        merged[1].append(next_page)
+                        merged[2].append(page_block_y)
+                    next_page = next(fallback, None)
+                if block is not None:
+                    merged[0].append(block)
+                    merged[1].append(page_no)
+                    merged[2].append(y)
+            blocks, pages, ys = merged
+            if doc is not pdf:
+                doc.close()
+        return blocks, pages, ys
+
+    def extract(self, start, stop, top_cm, bottom_cm, pdf=None, classifier=None):
+        """
+        等价于 extract_page_range(pdf, start, stop, top_cm, bottom_cm, classifier)。
+        top_cm/bottom_cm 也可以是逐页数组（与索引的页一一对应，如自动裁剪的结果）。
+        pdf 为原文档路径或已打开的 fitz.Document，只在需要回退的页上使用。
+        classifier 所需的字号、字体标志、缩进直接取自索引，不需要再解析 PDF。
+        """
+        with stage("index_filter"):
+            blocks, pages, _ = self._blocks(start, stop, top_cm, bottom_cm, pdf, features=classifier is not None)
+        texts = [block[0] for block in blocks]
+        with stage("headings"):
+            if classifier is None:
+                return split_sections(texts)
+            return split_sections(texts, classifier.classify_pages(blocks, pages))
+
+    def extract_outline(self, entries, top_cm, bottom_cm, pdf=None):
+        """等价于 process.extract_outline：按书签切分整份文档，返回 [[标题, 内容], ...]"""
+        with stage("index_filter"):
+            blocks, pages, ys = self._blocks(self.start, self.stop, top_cm, bottom_cm, pdf)
+        with stage("headings"):
+            contents = slice_outline(entries, pages, ys, [block[0] for block in blocks])
+        return [[title, content] for (_, title, _, _), content in zip(entries, contents)]
+
+
+def _per_page(value, local):
+    # 标量原样返回，逐页数组按索引内的页序取值
+    return np.asarray(value)[local] if np.ndim(value) else value
+
+
+def build_index(file, start=0, stop=None):
+    """解析 [start, stop) 页建立索引；file 为路径时在各自的 worker 中独立打开文档"""
+    with stage("get_text"):
+        return _build_index(file, start, stop)
+
+
+def _build_index(file, start, stop):
+    pdf = open_pdf(file) if not isinstance(file, fitz.Document) else file
+    stop = pdf.page_count if stop is None else stop
+    columns = {name: [] for name in LINE_FIELDS}
+    page_columns = {name: [] for name in PAGE_FIELDS}
+    texts = []
+
+    for page_no in range(start, stop):
+        started = time.perf_counter()
+        page = pdf[page_no]
+        rect = page.rect
+        for name, value in zip(PAGE_FIELDS, rect):
+            page_columns[name].append(value)
+
+        layout = page.get_text("dict", flags=fitz.TEXTFLAGS_BLOCKS)["blocks"]
+        ink = page.get_text("dict", flags=fitz.TEXTFLAGS_BLOCKS | fitz.TEXT_ACCURATE_BBOXES)["blocks"]
+        ink_lines = [line["bbox"] for block in ink for line in block["lines"]]
+        if len(ink_lines) != sum(len(block["lines"]) for block in layout):
+            # 两次解析的行结构对不上时，把整页标记为“总是与裁剪线相交”，提取时回退到实时解析
+            ink_lines = None
+        line_no = 0
+        for block_no, block in enumerate(layout):
+            for line in block["lines"]:
+                spans = line["spans"]
+                x0, y0, x1, y1 = line["bbox"]
+                ink_y0, ink_y1 = (ink_lines[line_no][1], ink_lines[line_no][3]) if ink_lines else (-np.inf, np.inf)
+                line_no += 1
+                row = (page_no, block_no, x0, y0, x1, y1, ink_y0, ink_y1,
+                       max((s["size"] for s in spans), default=0), spans[0]["flags"] if spans else 0)
+                for name, value in zip(LINE_FIELDS, row):
+                    columns[name].append(value)
+                texts.append("".join(s["text"] for s in spans).replace("\n", " "))
+        record_page(page_no, time.perf_counter() - started)
+
+    if pdf is not file:
+        pdf.close()
+
+    arrays = {name: np.array(columns[name], dtype=dtype) for name, dtype in LINE_FIELDS.items()}
+    arrays.update({name: np.array(values, dtype=np.float64) for name, values in page_columns.items()})
+    return BlockIndex(start, arrays, texts)
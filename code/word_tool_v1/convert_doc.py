@@ -1,36 +1,52 @@
 import os
 import re
-import subprocess
-import tempfile
+import shutil
+
+from common.metrics import file_type, stage
+from office_pool import get_office_pool
+from common.storage import get_storage
+
+
+def _safe_stem(name):
+    # 清洗文件名（去掉空格、&、/，替换为下划线）
+    raw = os.path.splitext(os.path.basename(name))[0]
+    return re.sub(r'[ \t/&\\\\]+', '_', raw)
+
+
+def convert_docs_to_pdf(paths) -> list:
+    """
+    批量转换：把多个已落盘的 .doc/.docx 复制到同一个临时目录，
+    在一个 LibreOffice 实例上一次性转换，返回与 paths 顺序一致的 PDF 路径列表。
+    临时目录位于受管的 tmp/ 下，用完后由调用方 discard(os.path.dirname(pdf_path))。
+    """
+    tmp_dir = get_storage().temp_dir(prefix="convert_")
+    input_paths = []
+    for i, path in enumerate(paths):
+        # 加序号前缀，保证同一批次内同名文件不会互相覆盖
+        input_path = os.path.join(tmp_dir, f"{i}_{_safe_stem(path)}{os.path.splitext(path)[1]}")
+        shutil.copyfile(path, input_path)
+        input_paths.append(input_path)
+
+    # 一次转换多个文件时按类型记录；.doc 与 .docx 混在一起记为 word
+    kinds = {file_type(path) for path in paths}
+    with stage("convert", kinds.pop() if len(kinds) == 1 else "word"):
+        return get_office_pool().convert(input_paths, tmp_dir)
+
 
 def convert_doc_to_pdf(uploaded_file) -> str:
     """
     把上传的 .doc/.docx 文件保存到临时目录，先给它一个“安全”不含空格/特殊字符的名字，
     再用 LibreOffice 转 PDF，返回转换后的 PDF 路径。
+    uploaded_file 可以是 UploadFile，也可以是已落盘文件的路径（str）。
     """
-    # 1) 清洗文件名（去掉空格、&、/，替换为下划线）
-    raw = os.path.splitext(uploaded_file.filename)[0]
-    safe_stem = re.sub(r'[ \t/&\\\\]+', '_', raw)
-    ext = os.path.splitext(uploaded_file.filename)[1]  # 包含“.”的后缀
+    if isinstance(uploaded_file, str):
+        return convert_docs_to_pdf([uploaded_file])[0]
 
-    # 2) 准备临时目录和文件路径
-    tmp_dir = tempfile.mkdtemp()
-    input_path = os.path.join(tmp_dir, safe_stem + ext)
-
-    # 3) 写入上传内容
+    tmp_dir = get_storage().temp_dir(prefix="convert_")
+    input_path = os.path.join(tmp_dir, _safe_stem(uploaded_file.filename)
+                              + os.path.splitext(uploaded_file.filename)[1])
     with open(input_path, "wb") as f:
-        f.write(uploaded_file.file.read())
-
-    # 4) 调用 LibreOffice CLI 转 PDF
-    subprocess.run([
-        "libreoffice", "--headless",
-        "--convert-to", "pdf",
-        "--outdir", tmp_dir,
-        input_path
-    ], check=True)
-
-    # 5) 输出 PDF 文件路径（同样用 safe_stem）
-    output_pdf = os.path.join(tmp_dir, safe_stem + ".pdf")
-    if not os.path.exists(output_pdf):
-        raise RuntimeError(f"File at path {output_pdf} does not exist.")
-    return output_pdf
+        shutil.copyfileobj(uploaded_file.file, f)
+
+    with stage("convert", file_type(input_path)):
+        return get_office_pool().convert([input_path], tmp_dir)[0]
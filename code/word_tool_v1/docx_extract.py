@@ -0,0 +1,300 @@
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from common.metrics import stage
+from common.sections import write_csv
+from process import block_heading
+
+# .docx 的处理方式：native 直接解析 word/document.xml（默认）；office 与 .doc 一样先用 LibreOffice 转 PDF
+DOCX_ENGINE = os.environ.get("DOCX_ENGINE", "native")
+# 解析逻辑有改动时递增，使缓存中按 native 方式提取的旧结果失效
+DOCX_VERSION = "1"
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _BODY = W + "p", W + "body"
+_T, _TAB, _BR, _CR = W + "t", W + "tab", W + "br", W + "cr"
+_PPR, _VAL = W + "pPr", W + "val"
+
+# 内置标题样式的名称（英文版为 heading 1，中文版 Word 另存时也可能是 标题 1）
+_heading_name = re.compile(r"^(?:heading|标题)\s*(\d)$", re.IGNORECASE)
+# 目录（TOC 1、TOC 2 ……）段落是标题的重复，不作为章节
+_toc_name = re.compile(r"^toc\b", re.IGNORECASE)
+
+
+def is_docx(filename):
+    return filename.rsplit(".", 1)[-1].lower() == "docx"
+
+
+def use_native(path, engine=DOCX_ENGINE):
+    """
+    是否直接解析：只看已落盘文件的后缀和目录结构（读 ZIP 中央目录，不解压），
+    改了后缀的 .doc、加密文档等不是 OOXML 包的文件仍交给 LibreOffice 转换。
+    """
+    if engine != "native" or not is_docx(path):
+        return False
+    try:
+        with zipfile.ZipFile(path) as docx:
+            return "word/document.xml" in docx.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+def docx_key():
+    """缓存键里的解析方式；裁剪、标题判定和书签参数对 native 解析没有影响"""
+    return "docx", f"native{DOCX_VERSION}"
+
+
+def _val(element, path):
+    found = element.find(path)
+    return found.get(_VAL) if found is not None else None
+
+
+def _num_pr(ppr):
+    """段落属性里的 (numId, ilvl)，没有编号时返回 (None, None)"""
+    if ppr is None:
+        return None, None
+    return _val(ppr, f"{W}numPr/{W}numId"), _val(ppr, f"{W}numPr/{W}ilvl")
+
+
+class Styles:
+    """styles.xml 中段落样式的大纲级别、编号和名称，按 basedOn 继承"""
+
+    def __init__(self, root):
+        self.styles = {}
+        self.default = None
+        self._resolved = {}
+        if root is None:
+            return
+        for style in root.iter(W + "style"):
+            if style.get(W + "type") != "paragraph":
+                continue
+            style_id = style.get(W + "styleId")
+            ppr = style.find(_PPR)
+            outline = _val(ppr, W + "outlineLvl") if ppr is not None else None
+            self.styles[style_id] = {
+                "name": _val(style, W + "name") or "",
+                "based_on": _val(style, W + "basedOn"),
+                "outline": int(outline) if outline is not None else None,
+                "num": _num_pr(ppr),
+            }
+            if style.get(W + "default") in ("1", "true"):
+                self.default = style_id
+
+    def _chain(self, style_id):
+        seen = set()
+        while style_id in self.styles and style_id not in seen:
+            seen.add(style_id)
+            yield style_id, self.styles[style_id]
+            style_id = self.styles[style_id]["based_on"]
+
+    def outline_level(self, style_id):
+        """大纲级别（0 起），正文返回 None"""
+        for _, style in self._chain(style_id or self.default):
+            if style["outline"] is not None:
+                return style["outline"] if style["outline"] < 9 else None
+            match = _heading_name.match(style["name"])
+            if match:
+                return int(match.group(1)) - 1
+        return None
+
+    def numbering(self, style_id):
+        """样式（含继承）上的 (numId, ilvl)"""
+        for _, style in self._chain(style_id or self.default):
+            num_id, ilvl = style["num"]
+            if num_id is not None:
+                return num_id, ilvl
+        return None, None
+
+    def is_toc(self, style_id):
+        style = self.styles.get(style_id or self.default)
+        return style is not None and bool(_toc_name.match(style["name"]))
+
+    def resolve(self, style_id):
+        """(是否目录, 大纲级别, numId, ilvl)；同一样式只计算一次"""
+        if style_id not in self._resolved:
+            self._resolved[style_id] = (self.is_toc(style_id), self.outline_level(style_id),
+                                        *self.numbering(style_id))
+        return self._resolved[style_id]
+
+
+def _roman(n):
+    digits = [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+              (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+    out = ""
+    for value, letters in digits:
+        while n >= value:
+            out += letters
+            n -= value
+    return out
+
+
+def _letter(n):
+    return chr(ord("a") + (n - 1) % 26) * ((n - 1) // 26 + 1) if n > 0 else ""
+
+
+def _format_number(n, fmt):
+    if fmt == "lowerLetter":
+        return _letter(n)
+    if fmt == "upperLetter":
+        return _letter(n).upper()
+    if fmt == "lowerRoman":
+        return _roman(n)
+    if fmt == "upperRoman":
+        return _roman(n).upper()
+    if fmt in ("bullet", "none"):
+        return ""
+    # decimal 及中文计数等其余格式一律按阿拉伯数字，与标题编号正则一致
+    return str(n)
+
+
+class Numbering:
+    """
+    numbering.xml 中的多级列表定义，按出现顺序给编号段落生成序号文字（如 "1.2"），
+    与 Word 转 PDF 后页面上显示的编号一致。同一抽象列表的各 numId 共用计数。
+    """
+
+    def __init__(self, root):
+        self.levels = {}  # abstractNumId -> {ilvl: (start, numFmt, lvlText)}
+        self.style_levels = {}  # 与样式关联的级别：styleId -> ilvl
+        self.nums = {}  # numId -> abstractNumId
+        self.counters = {}  # abstractNumId -> {ilvl: 当前序号}
+        if root is None:
+            return
+        for abstract in root.iter(W + "abstractNum"):
+            levels = {}
+            for lvl in abstract.iter(W + "lvl"):
+                ilvl = int(lvl.get(W + "ilvl", "0"))
+                levels[ilvl] = (int(_val(lvl, W + "start") or 1), _val(lvl, W + "numFmt") or "decimal",
+                                _val(lvl, W + "lvlText") or "")
+                style_id = _val(lvl, W + "pStyle")
+                if style_id:
+                    self.style_levels[style_id] = ilvl
+            self.levels[abstract.get(W + "abstractNumId")] = levels
+        for num in root.iter(W + "num"):
+            self.nums[num.get(W + "numId")] = _val(num, W + "abstractNumId")
+
+    def label(self, num_id, ilvl):
+        """推进 (numId, ilvl) 的计数并返回该段的编号文字；没有编号返回空串"""
+        abstract = self.nums.get(num_id)
+        levels = self.levels.get(abstract)
+        if not levels or ilvl not in levels:
+            return ""
+        counters = self.counters.setdefault(abstract, {})
+        start, fmt, text = levels[ilvl]
+        counters[ilvl] = counters.get(ilvl, start - 1) + 1
+        # 上级编号推进时下级重新计数
+        for deeper in [level for level in counters if level > ilvl]:
+            del counters[deeper]
+
+        def number(match):
+            level = int(match.group(1)) - 1
+            if level not in levels:
+                return ""
+            return _format_number(counters.get(level, levels[level][0]), levels[level][1])
+
+        return re.sub(r"%(\d)", number, text)
+
+
+def _read_part(docx, name):
+    try:
+        with docx.open(name) as f:
+            return ElementTree.parse(f).getroot()
+    except KeyError:
+        return None
+
+
+def _paragraph_text(p):
+    """段落文字；嵌套在文本框里的段落已先行处理并清空，不会重复计入"""
+    parts = []
+    for element in p.iter():
+        tag = element.tag
+        if tag == _T:
+            parts.append(element.text or "")
+        elif tag == _TAB:
+            parts.append("\t")
+        elif tag in (_BR, _CR):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def iter_paragraphs(path):
+    """
+    增量解析 word/document.xml，按文档顺序产出 (段落文字, 标题层级)：
+    带大纲级别（标题样式或段落上的 outlineLvl）的段落层级为 1 起的级别，编号文字拼在标题前；
+    其余段落层级为 None，与 PDF 提取一样按编号正则判断。
+    每处理完 body 下的一个段落或表格就释放对应元素，内存占用与文档大小无关。
+    """
+    with zipfile.ZipFile(path) as docx:
+        styles = Styles(_read_part(docx, "word/styles.xml"))
+        numbering = Numbering(_read_part(docx, "word/numbering.xml"))
+        with docx.open("word/document.xml") as f:
+            # document 为第 1 层、body 为第 2 层，结束于第 2 层的元素即 body 的直接子元素
+            depth = 0
+            body = None
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if element.tag == _BODY:
+                        body = element
+                    continue
+                depth -= 1
+                if element.tag == _P:
+                    paragraph = _paragraph(element, styles, numbering)
+                    element.clear()
+                    if paragraph is not None:
+                        yield paragraph
+                if depth == 2 and body is not None:
+                    # body 下的段落/表格处理完后从树上摘掉
+                    body.clear()
+
+
+def _paragraph(p, styles, numbering):
+    """单个段落的 (文字, 标题层级)，目录段落返回 None"""
+    ppr = p.find(_PPR)
+    style_id = _val(ppr, W + "pStyle") if ppr is not None else None
+    toc, level, num_id, ilvl = styles.resolve(style_id)
+    if toc:
+        return None
+    text = _paragraph_text(p)
+    if ppr is not None:
+        outline = _val(ppr, W + "outlineLvl")
+        if outline is not None:
+            level = int(outline) if int(outline) < 9 else None
+        direct_num, direct_ilvl = _num_pr(ppr)
+        if direct_num is not None:
+            num_id, ilvl = direct_num, direct_ilvl
+    if num_id not in (None, "0"):
+        if ilvl is None:
+            ilvl = numbering.style_levels.get(style_id)
+        label = numbering.label(num_id, int(ilvl or 0))
+        if label:
+            text = f"{label} {text}"
+    return text, level + 1 if level is not None else None
+
+
+def docx_sections(path):
+    """
+    与 merge_sections(split_sections(...)) 相同的规则得到 {标题: 内容}：
+    第一个标题之前的文本丢弃，重复出现的标题以后一次为准。
+    """
+    content_dict = {}
+    content = None
+    for text, level in iter_paragraphs(path):
+        text = text.strip()
+        if not text:
+            continue
+        heading = block_heading(text, level)
+        if heading is not None:
+            content = content_dict[heading] = []
+        elif content is not None:
+            content.append(text)
+    return {heading: " ".join(content) for heading, content in content_dict.items()}
+
+
+def extract_docx(path, filename=None):
+    """在进程池中执行：解析 .docx 并写出 CSV，返回路径"""
+    with stage("docx_parse"):
+        sections = docx_sections(path)
+    return write_csv(sections, filename)
@@ -0,0 +1,239 @@
+import logging
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from common.executors import THREADS
+from common.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger("uvicorn.error")
+
+# python3-uno 可选：能导入时通过 socket/UNO 复用常驻的 soffice 实例；
+# 否则退化为“每个槽位一个已预热的独立 profile + 一次调用转换多个文件”的 CLI 模式
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+SOFFICE_BIN = os.environ.get("SOFFICE_BIN", "libreoffice")
+# 常驻实例（槽位）数量（环境变量 OFFICE_INSTANCES），与 office 线程池大小一致
+OFFICE_INSTANCES = THREADS["office"]
+# 单次转换超时（秒），超时视为卡死，强制重启该实例
+OFFICE_TIMEOUT = int(os.environ.get("OFFICE_TIMEOUT", "120"))
+# 等待 soffice 监听端口就绪的最长时间（秒）
+OFFICE_STARTUP_TIMEOUT = 30
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _props(**kwargs):
+    props = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name, prop.Value = name, value
+        props.append(prop)
+    return tuple(props)
+
+
+def _kill_group(process, grace=5):
+    """soffice 会再拉起 soffice.bin 子进程，按进程组整体结束"""
+    if process is None or process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(grace)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+
+class OfficeInstance:
+    """一个 LibreOffice 槽位：独立 profile 目录，UNO 可用时还有一个常驻 soffice 进程"""
+
+    def __init__(self, index):
+        self.index = index
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_profile_{index}_")
+        self.profile_url = "file://" + self.profile_dir
+        self.port = None
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        if uno is None:
+            # 预热 profile：首次启动生成用户配置是冷启动里最慢的部分
+            subprocess.run([
+                SOFFICE_BIN, "--headless", "--terminate_after_init",
+                f"-env:UserInstallation={self.profile_url}",
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=OFFICE_STARTUP_TIMEOUT, start_new_session=True)
+            return
+
+        self.port = _free_port()
+        self.process = subprocess.Popen([
+            SOFFICE_BIN, "--headless", "--invisible", "--nologo", "--nodefault",
+            "--norestore", "--nolockcheck",
+            f"-env:UserInstallation={self.profile_url}",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        deadline = time.monotonic() + OFFICE_STARTUP_TIMEOUT
+        while True:
+            try:
+                local = uno.getComponentContext()
+                resolver = local.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.bridge.UnoUrlResolver", local)
+                ctx = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext")
+                self.desktop = ctx.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", ctx)
+                return
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice 实例 {self.index} 启动失败")
+                time.sleep(0.2)
+
+    def stop(self):
+        self.desktop = None
+        _kill_group(self.process)
+        self.process = None
+
+    def restart(self):
+        """卡死或异常后重启；profile 可能已损坏，一并重建"""
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.start()
+
+    def healthy(self):
+        if uno is None:
+            return os.path.isdir(self.profile_dir)
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                pass
+            self.desktop.getCurrentComponent()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_paths, out_dir):
+        """在本实例上依次转换多个文件，返回与 input_paths 一一对应的 PDF 路径"""
+        outputs = [
+            os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ".pdf")
+            for p in input_paths
+        ]
+        if uno is None:
+            self._convert_cli(input_paths, out_dir)
+        else:
+            # UNO 调用本身不支持超时，用看门狗在超时后杀掉实例，阻塞的调用随之抛错
+            watchdog = threading.Timer(OFFICE_TIMEOUT * len(input_paths), self.stop)
+            watchdog.start()
+            try:
+                for src, dst in zip(input_paths, outputs):
+                    self._convert_uno(src, dst)
+            finally:
+                watchdog.cancel()
+
+        for path in outputs:
+            if not os.path.exists(path):
+                raise RuntimeError(f"File at path {path} does not exist.")
+        return outputs
+
+    def _convert_uno(self, src, dst):
+        doc = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0,
+            _props(Hidden=True, ReadOnly=True))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)),
+                           _props(FilterName="writer_pdf_Export"))
+        finally:
+            doc.close(True)
+
+    def _convert_cli(self, input_paths, out_dir):
+        process = subprocess.Popen([
+            SOFFICE_BIN, "--headless",
+            f"-env:UserInstallation={self.profile_url}",
+            "--convert-to", "pdf",
+            "--outdir", out_dir,
+            *input_paths
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            returncode = process.wait(OFFICE_TIMEOUT * len(input_paths))
+        except subprocess.TimeoutExpired:
+            _kill_group(process)
+            raise
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, SOFFICE_BIN)
+
+
+class OfficePool:
+    """固定数量的 LibreOffice 槽位，借出前做健康检查，转换失败/超时后重启"""
+
+    def __init__(self, size=OFFICE_INSTANCES):
+        if uno is None:
+            logger.warning("python3-uno 不可用，LibreOffice 转换退化为 CLI 模式，每次转换都会冷启动 soffice")
+        self.instances = [OfficeInstance(i) for i in range(size)]
+        self._idle = queue.Queue()
+        for instance in self.instances:
+            instance.start()
+            self._idle.put(instance)
+
+    def convert(self, input_paths, out_dir):
+        QUEUE_DEPTH.inc(queue="office")
+        try:
+            instance = self._idle.get()
+        finally:
+            QUEUE_DEPTH.dec(queue="office")
+        try:
+            if not instance.healthy():
+                instance.restart()
+            return instance.convert(input_paths, out_dir)
+        except Exception:
+            try:
+                instance.restart()
+            except Exception:
+                pass  # 下次借出时健康检查会再次尝试重启
+            raise
+        finally:
+            self._idle.put(instance)
+
+    def close(self):
+        for instance in self.instances:
+            instance.stop()
+            shutil.rmtree(instance.profile_dir, ignore_errors=True)
+
+
+_office_pool = None
+_office_pool_lock = threading.Lock()
+
+
+def get_office_pool():
+    global _office_pool
+    with _office_pool_lock:
+        if _office_pool is None:
+            _office_pool = OfficePool()
+    return _office_pool
+
+
+def shutdown_office_pool():
+    global _office_pool
+    with _office_pool_lock:
+        if _office_pool is not None:
+            _office_pool.close()
+            _office_pool = None
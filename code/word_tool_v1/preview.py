@@ -1,41 +1,143 @@
+import asyncio
 import fitz
-from uuid import uuid4
 import os
+from io import BytesIO
 from fastapi import UploadFile
 
-def generate_preview_image(source, top_cm: float, bottom_cm: float) -> str:
+from common.auto_crop import detect_margins
+from common.executors import run_render
+from common.metrics import stage
+
+try:
+    # Pillow 编码 JPEG 比 Pixmap.tobytes("jpeg") 快一个数量级，并支持 WebP；未安装时退回 PyMuPDF
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 预览渲染逻辑（页码、dpi 等）有改动时递增，使缓存中的旧预览失效
+PREVIEW_VERSION = "2"
+
+# 预览分辨率上限；交互预览的每一帧都从按显示宽度渲染好的整页图上按像素行切片得到
+RASTER_DPI = 150
+# 裁剪帧与缩略图的默认宽度（像素）及 JPEG 质量
+FRAME_WIDTH = 800
+THUMB_WIDTH = 160
+# 缩略图条默认展示的页数，以及一次请求最多的页数
+THUMB_COUNT = 8
+THUMB_MAX = 50
+JPEG_QUALITY = 80
+# 一次缩略图请求最多拆成的并行渲染任务数，每个任务占用一个渲染名额（见 executors.run_render）
+THUMB_THREADS = int(os.environ.get("THUMB_THREADS", "4"))
+
+
+def open_source(source):
     """
-    source: 
+    source:
       - UploadFile      （file.file.read() 可用）
       - str             （PDF 文件路径）
       - 文件二进制流对象（.read() 可用，如 open(..., "rb")）
-    返回：生成的预览 PNG 相对路径
+      - fitz.Document   （文档会话中已打开的 PDF，不会被关闭）
+    返回 fitz.Document
     """
-    os.makedirs("outputs", exist_ok=True)
-
-    # 打开 PDF
-    if isinstance(source, str):
-        pdf = fitz.open(source)
+    if isinstance(source, fitz.Document):
+        return source
+    elif isinstance(source, str):
+        return fitz.open(source)
     elif isinstance(source, UploadFile):
-        data = source.file
-        pdf = fitz.open(stream=data, filetype="pdf")
+        return fitz.open(stream=source.file.read(), filetype="pdf")
     else:
         # 任何有 .read() 方法的流
-        data = source
-        pdf = fitz.open(stream=data, filetype="pdf")
+        return fitz.open(stream=source.read(), filetype="pdf")
+
+
+def preview_page_number(pdf):
+    # 取第11页，不足11页取第二页（只有一页时取第一页）
+    return 10 if pdf.page_count > 10 else min(1, pdf.page_count - 1)
 
-    # 取第11页，不足11页取第二页
-    page_num = 10 if pdf.page_count > 10 else 1
-    page = pdf.load_page(page_num)
+
+def render_preview(source, top_cm, bottom_cm) -> bytes:
+    """
+    渲染预览页的裁剪区域，直接返回 PNG 内容，不再写入 outputs/。
+    top_cm/bottom_cm 为 "auto" 时按检测出的该页尺寸的页眉页脚高度裁剪。
+    """
+    with stage("preview"):
+        return _render_preview(source, top_cm, bottom_cm)
+
+
+def _render_preview(source, top_cm, bottom_cm):
+    pdf = open_source(source)
+    page = pdf.load_page(preview_page_number(pdf))
 
     rect = page.rect
+    if "auto" in (top_cm, bottom_cm):
+        auto_top, auto_bottom = detect_margins(pdf).lookup(rect.width, rect.height)
+        top_cm = auto_top if top_cm == "auto" else top_cm
+        bottom_cm = auto_bottom if bottom_cm == "auto" else bottom_cm
     top = top_cm * 28.35
     bottom = bottom_cm * 28.35
     clip = fitz.Rect(rect.x0, rect.y0 + top, rect.x1, rect.y1 - bottom)
 
-    pix = page.get_pixmap(dpi=150, clip=clip)
-    preview_filename = f"{uuid4().hex}_preview.png"
-    preview_path = os.path.join("outputs", preview_filename)
-    pix.save(preview_path)
+    png = page.get_pixmap(dpi=RASTER_DPI, clip=clip).tobytes("png")
+    if pdf is not source:
+        pdf.close()
+    return png
+
 
-    return preview_path
+def render_page(pdf, page_no, width=FRAME_WIDTH):
+    """
+    按显示宽度整页渲染一次（不超过 RASTER_DPI），返回的 Pixmap 供 crop_frame 反复切片；
+    pix.xres 即渲染 dpi。
+    """
+    page = pdf.load_page(page_no)
+    dpi = max(1, min(RASTER_DPI, round(width / page.rect.width * 72)))
+    return page.get_pixmap(dpi=dpi)
+
+
+def encode_image(pix, y0=0, y1=None, fmt="jpeg"):
+    """把 pix 的 [y0, y1) 像素行编码为 JPEG（或 WebP，需要 Pillow）"""
+    y1 = pix.height if y1 is None else y1
+    rows = bytes(pix.samples_mv[y0 * pix.stride:y1 * pix.stride])
+    if Image is None:
+        return fitz.Pixmap(pix.colorspace, pix.width, y1 - y0, rows, pix.alpha).tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+
+    mode = "RGBA" if pix.alpha else "RGB"
+    image = Image.frombuffer(mode, (pix.width, y1 - y0), rows, "raw", mode, pix.stride, 1)
+    buffer = BytesIO()
+    image.save(buffer, "WEBP" if fmt == "webp" else "JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def crop_frame(pix, top_cm, bottom_cm, fmt="jpeg"):
+    """
+    在整页光栅上按裁剪距离切掉上下像素行并编码。
+    不访问 PDF，也不缩放，拖动滑块时每一帧只有内存切片和编码的开销。
+    """
+    px_per_cm = 28.35 * pix.xres / 72
+    y0 = min(max(round(top_cm * px_per_cm), 0), pix.height - 1)
+    y1 = max(min(pix.height - round(bottom_cm * px_per_cm), pix.height), y0 + 1)
+    return encode_image(pix, y0, y1, fmt)
+
+
+def _render_thumbnails(pdf_path, pages, width):
+    # fitz.Document 不能跨线程共享，每个线程各自打开一份
+    with fitz.open(pdf_path) as pdf:
+        thumbs = []
+        for page_no in pages:
+            page = pdf.load_page(page_no)
+            zoom = width / page.rect.width
+            thumbs.append(encode_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))))
+        return thumbs
+
+
+async def render_thumbnails(pdf_path, pages, width=THUMB_WIDTH):
+    """
+    分组交给渲染线程池并行渲染多页缩略图，与其它渲染任务一样按通道和客户端排队，
+    返回与 pages 顺序一致的 JPEG 列表。
+    """
+    groups = [pages[i::THUMB_THREADS] for i in range(THUMB_THREADS)]
+    results = await asyncio.gather(*[
+        run_render(_render_thumbnails, pdf_path, group, width) for group in groups if group])
+    thumbs = [None] * len(pages)
+    for i, group_thumbs in enumerate(results):
+        thumbs[i::THUMB_THREADS] = group_thumbs
+    return thumbs
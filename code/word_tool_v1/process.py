@@ -1,55 +1,243 @@
-from io import BytesIO
+from io import StringIO
 import os
 import fitz
 import csv
-import re
-from uuid import uuid4
+import numpy as np
+import json
+import time
+
+from common.heading_classifier import HEADING_MODE, heading_pattern, make_classifier, page_blocks
+from common.metrics import call_collecting, observe_stage, record_collected, stage
+from common.request_profile import record_page
+from common.sections import merge_sections, open_pdf, page_ranges, write_csv
+from common.outline import read_outline, slice_outline
 
 os.makedirs("outputs", exist_ok=True)
 
-def process_pdf_and_extract(file, top_cm, bottom_cm, filename=None):
-    # 处理传入的 file 参数：可能是 BytesIO、UploadFile 或 str 路径
-    if hasattr(file, "read"):
-        pdf = fitz.open(stream=file.read(), filetype="pdf")
-    elif isinstance(file, (bytes, bytearray)):
-        pdf = fitz.open(stream=file, filetype="pdf")
-    elif isinstance(file, str):
-        pdf = fitz.open(file)  # 是一个 PDF 文件路径
+# 提取逻辑有改动时递增，使结果缓存中的旧结果失效
+EXTRACTOR_VERSION = "2"
+
+
+def page_sizes(path):
+    """各页的 (宽数组, 高数组)，供 auto_crop.PageMargins.resolve 换算逐页裁剪距离"""
+    with fitz.open(path) as pdf:
+        rects = [page.rect for page in pdf]
+    return np.array([r.width for r in rects]), np.array([r.height for r in rects])
+
+
+def crop_clip(page, top_cm, bottom_cm):
+    """top_cm/bottom_cm 为标量，或按页号取值的逐页数组（自动裁剪的结果）"""
+    if np.ndim(top_cm):
+        top_cm = top_cm[page.number]
+    if np.ndim(bottom_cm):
+        bottom_cm = bottom_cm[page.number]
+    rect = page.rect
+    return fitz.Rect(rect.x0, rect.y0 + top_cm * 28.35, rect.x1, rect.y1 - bottom_cm * 28.35)
+
+
+def page_text_blocks(page, top_cm, bottom_cm):
+    """按 (y, x) 阅读顺序返回单页裁剪区域内各文本块的 (顶部 y, 文字)"""
+    blocks = page.get_text("blocks", clip=crop_clip(page, top_cm, bottom_cm))
+    return [(block[1], block[4]) for block in sorted(blocks, key=lambda b: (b[1], b[0]))]
+
+
+def page_block_texts(page, top_cm, bottom_cm):
+    """按 (y, x) 阅读顺序返回单页裁剪区域内各文本块的文字"""
+    return [text for _, text in page_text_blocks(page, top_cm, bottom_cm)]
+
+
+def page_font_blocks(page, top_cm, bottom_cm):
+    """同 page_block_texts，但每块带字号、字体标志等信息（见 heading_classifier.page_blocks）"""
+    return page_blocks(page, crop_clip(page, top_cm, bottom_cm))
+
+
+def match_heading(text):
+    """text 为标题时返回规范化后的标题（编号 + 空格 + 标题文字），否则返回 None"""
+    match = heading_pattern.match(text)
+    return f"{match.group(1)} {match.group(4).strip()}" if match else None
+
+
+def block_heading(text, level=None):
+    """
+    level 为 None 时按编号正则判断；否则为分类器给出的层级，大于 0 即为标题。
+    返回规范化后的标题，不是标题返回 None。
+    """
+    if level is None:
+        return match_heading(text)
+    if not level:
+        return None
+    return match_heading(text) or " ".join(text.split())
+
+
+def split_sections(texts, levels=None):
+    """
+    把按阅读顺序排列的文本块切分成 (prefix, sections)：
+      - prefix   第一个标题之前的文本，属于上一个分片最后一节的延续
+      - sections [[标题, 内容], ...]，按出现顺序排列
+    levels 为分类器逐块给出的标题层级，缺省时按编号正则判断。
+    """
+    prefix = ""
+    sections = []
+    for text, level in zip(texts, levels if levels is not None else [None] * len(texts)):
+        text = text.strip()
+        if not text:
+            continue
+
+        heading = block_heading(text, level)
+        if heading is not None:
+            sections.append([heading, ""])
+        elif sections:
+            sections[-1][1] += text + " "
+        else:
+            prefix += text + " "
+    return prefix, sections
+
+
+def extract_page_range(file, start, stop, top_cm, bottom_cm, classifier=None):
+    """
+    提取 [start, stop) 页的标题与内容，返回值见 split_sections。
+    file 为路径时，每个分片在各自的 worker 中独立打开文档。
+    classifier 为 heading_classifier.FontClassifier 时按字体判断标题，仍然每页只解析一次。
+    """
+    pdf = open_pdf(file) if not isinstance(file, fitz.Document) else file
+    texts = []
+    blocks = []
+    with stage("get_text"):
+        for page_no in range(start, stop):
+            started = time.perf_counter()
+            if classifier is None:
+                texts.extend(page_block_texts(pdf[page_no], top_cm, bottom_cm))
+            else:
+                blocks.append(page_font_blocks(pdf[page_no], top_cm, bottom_cm))
+                texts.extend(block[0] for block in blocks[-1])
+            record_page(page_no, time.perf_counter() - started)
+
+    if pdf is not file:
+        pdf.close()
+    with stage("headings"):
+        levels = None if classifier is None else [level for page in blocks for level in classifier.classify(page)]
+        return split_sections(texts, levels)
+
+
+def iter_blocks(file, top_cm, bottom_cm, classifier=None):
+    """
+    逐页产出裁剪区域内的 (文本块, 标题层级)，同一时刻只持有一页的解析结果；
+    不使用分类器时层级为 None（由编号正则判断）。
+    """
+    pdf = open_pdf(file) if not isinstance(file, fitz.Document) else file
+    # 流式解析与标题识别交替进行，只累计 get_text 的耗时，结束时记录一次
+    elapsed = 0.0
+    try:
+        for page in pdf:
+            start = time.perf_counter()
+            if classifier is None:
+                texts = page_block_texts(page, top_cm, bottom_cm)
+                elapsed += time.perf_counter() - start
+                for text in texts:
+                    yield text, None
+            else:
+                blocks = page_font_blocks(page, top_cm, bottom_cm)
+                elapsed += time.perf_counter() - start
+                yield from zip((block[0] for block in blocks), classifier.classify(blocks))
+    finally:
+        observe_stage("get_text", elapsed, pages=pdf.page_count)
+        if pdf is not file:
+            pdf.close()
+
+
+def iter_sections(blocks):
+    """
+    流式版本的 split_sections + merge_sections：blocks 为 (文本块, 标题层级) 序列，
+    每遇到下一个标题就产出上一节 (标题, 内容)，内存占用只与单节内容有关，与文档大小无关。
+    第一个标题之前的文本被丢弃。
+    与 merge_sections 不同，重复出现的标题作为新的一节产出（前一节已经发出，无法再覆盖）。
+    """
+    heading = None
+    content = []
+    for text, level in blocks:
+        text = text.strip()
+        if not text:
+            continue
+
+        next_heading = block_heading(text, level)
+        if next_heading is not None:
+            if heading is not None:
+                yield heading, " ".join(content)
+            heading, content = next_heading, []
+        elif heading is not None:
+            content.append(text)
+    if heading is not None:
+        yield heading, " ".join(content)
+
+
+def stream_sections(file, top_cm, bottom_cm, heading_mode=HEADING_MODE):
+    """边解析边产出 (标题, 内容)"""
+    return iter_sections(iter_blocks(file, top_cm, bottom_cm, make_classifier(heading_mode)))
+
+
+def format_sections(sections, fmt="csv"):
+    """
+    把 (标题, 内容) 逐条格式化为文本片段：
+      - csv    与 write_csv 相同的两列格式（开头带 BOM，方便 Excel 识别 UTF-8）
+      - ndjson 每行一个 {"heading": ..., "content": ...}
+    """
+    if fmt == "csv":
+        yield "\ufeff"
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        for heading, content in sections:
+            writer.writerow([heading, content])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
     else:
-        raise TypeError(f"Unsupported file input type: {type(file)}")
-    if filename is None:
-        filename = f"{uuid4().hex}"
-        
-    filename = filename.rsplit('.', 1)[0]
-    csv_path = f"outputs/{filename}.csv"
+        for heading, content in sections:
+            yield json.dumps({"heading": heading, "content": content}, ensure_ascii=False) + "\n"
 
-    heading_pattern = re.compile(r'^(\d+(\.\d+)*)(\s+)(.+)')
-    current_heading = None
-    content_dict = {}
 
+def extract_outline(file, top_cm, bottom_cm, entries):
+    """
+    按书签（outline.read_outline 的结果）切分章节，返回 [[标题, 内容], ...]，顺序与书签一致。
+    标题直接取自书签，不再逐行识别；同名书签各自成节，不会互相覆盖。
+    """
+    pdf = open_pdf(file) if not isinstance(file, fitz.Document) else file
+    pages, ys, texts = [], [], []
     for page in pdf:
-        rect = page.rect
-        top = top_cm * 28.35
-        bottom = bottom_cm * 28.35
-        clip = fitz.Rect(rect.x0, rect.y0 + top, rect.x1, rect.y1 - bottom)
-        blocks = page.get_text("blocks", clip=clip)
-        sorted_blocks = sorted(blocks, key=lambda b: (b[1], b[0]))
-
-        for block in sorted_blocks:
-            text = block[4].strip()
-            if not text:
-                continue
-
-            match = heading_pattern.match(text)
-            if match:
-                current_heading = f"{match.group(1)} {match.group(4).strip()}"
-                content_dict[current_heading] = ""
-            elif current_heading:
-                content_dict[current_heading] += text + " "
-
-    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        for heading, content in content_dict.items():
-            writer.writerow([heading, content.strip()])
-
-    return csv_path
+        for y, text in page_text_blocks(page, top_cm, bottom_cm):
+            pages.append(page.number)
+            ys.append(y - page.rect.y0)
+            texts.append(text)
+    if pdf is not file:
+        pdf.close()
+    contents = slice_outline(entries, pages, ys, texts)
+    return [[title, content] for (_, title, _, _), content in zip(entries, contents)]
+
+
+def process_pdf_and_extract(file, top_cm, bottom_cm, filename=None, executor=None, heading_mode=HEADING_MODE):
+    """
+    文档带书签时直接按书签切分章节，不再识别标题。
+    否则 executor 不为空且 file 为路径时，按 SHARD_PAGES 切分页范围并行提取，输出与串行路径完全一致。
+    font 方式的字体统计随页累加，后面的页依赖前面所有页，只能串行，不分片。
+    """
+    pdf = open_pdf(file)
+    entries = read_outline(pdf)
+    classifier = make_classifier(heading_mode)
+    if entries:
+        sections = extract_outline(pdf, top_cm, bottom_cm, entries)
+    elif executor is not None and isinstance(file, str) and classifier is None:
+        ranges = page_ranges(pdf.page_count)
+        # 与 run_in_pool 相同，子进程里记录的阶段耗时随结果带回，由本进程记录
+        results = list(executor.map(
+            call_collecting, [extract_page_range] * len(ranges),
+            [file] * len(ranges), [s for s, _ in ranges], [e for _, e in ranges],
+            [top_cm] * len(ranges), [bottom_cm] * len(ranges),
+        ))
+        for _, stages in results:
+            record_collected(stages)
+        sections = merge_sections(part for part, _ in results)
+    else:
+        sections = merge_sections([
+            extract_page_range(pdf, 0, pdf.page_count, top_cm, bottom_cm, classifier)])
+    pdf.close()
+
+    return write_csv(sections, filename)
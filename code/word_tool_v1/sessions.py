@@ -0,0 +1,135 @@
+import asyncio
+import os
+import threading
+import time
+from uuid import uuid4
+
+import fitz
+
+from common.admission import check_pages
+from convert_doc import convert_doc_to_pdf
+from common.executors import get_executor, run_io, run_office, run_render
+from common.storage import discard, get_storage
+from common.upload_util import remove_quietly
+from worker_pool import is_word
+
+# 文档会话闲置多久后过期（秒）
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "1800"))
+# 过期检查间隔（秒）
+REAP_INTERVAL = 60
+
+
+class DocumentSession:
+    """
+    一次上传对应一个会话：保存上传文件、（Word）转换后的 PDF，以及已打开的 fitz 文档，
+    之后的预览/处理请求只带 doc_id，不再重新上传和转换。
+    """
+
+    def __init__(self, upload_path, digest, filename, pdf_path):
+        self.id = uuid4().hex
+        self.upload_path = upload_path
+        self.digest = digest
+        self.filename = filename
+        self.pdf_path = pdf_path
+        # 会话存续期间上传文件和转换结果不参与存储清理
+        get_storage().pin(upload_path, pdf_path)
+        self.pdf = fitz.open(pdf_path)
+        # fitz.Document 不是线程安全的，同一会话的渲染需要串行
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        # 正在使用该会话文件的任务数，大于 0 时不会被过期清理，删除也推迟到最后一个任务结束
+        self.busy = 0
+        # 已被删除（DELETE /documents/{id}）但仍有任务在使用
+        self.closed = False
+
+    @property
+    def page_count(self):
+        return self.pdf.page_count
+
+    def close(self):
+        # 与渲染线程互斥，不在渲染中途关闭文档
+        with self.lock:
+            self.pdf.close()
+        get_storage().unpin(self.upload_path, self.pdf_path)
+        remove_quietly(self.upload_path)
+        if self.pdf_path != self.upload_path:
+            discard(os.path.dirname(self.pdf_path))
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.sessions = {}
+        self._reaper = None
+        # release 会在 I/O 线程池中调用，busy / closed 的修改与判断需要加锁
+        self._lock = threading.Lock()
+
+    async def create(self, upload_path, digest, filename):
+        pdf_path = upload_path
+        if is_word(upload_path):
+            pdf_path = await run_office(convert_doc_to_pdf, upload_path)
+        session = await run_render(DocumentSession, upload_path, digest, filename, pdf_path)
+        try:
+            check_pages(session.page_count)
+        except Exception:
+            await run_io(session.close)
+            raise
+        self.sessions[session.id] = session
+        return session
+
+    def get(self, doc_id):
+        session = self.sessions.get(doc_id)
+        if session is not None:
+            session.last_used = time.time()
+        return session
+
+    def acquire(self, session):
+        with self._lock:
+            session.busy += 1
+
+    def release(self, session):
+        """
+        任务用完会话；会话已被删除且这是最后一个使用者时，把关闭文档、删除文件交给 I/O 线程池。
+        不阻塞也不等待，可以在事件循环里（包括被取消的连接处理的 finally 中）直接调用。
+        """
+        with self._lock:
+            session.busy -= 1
+            session.last_used = time.time()
+            last = session.closed and not session.busy
+        if last:
+            get_executor("io").submit(session.close)
+
+    async def close(self, doc_id):
+        """
+        删除会话：之后的请求不再能用这个 doc_id；仍有任务或预览连接在读它的文件时只做标记，
+        由最后一个 release 关闭文档并删除文件，否则立即在 I/O 线程池中删除。
+        """
+        session = self.sessions.pop(doc_id, None)
+        if session is None:
+            return False
+        with self._lock:
+            session.closed = True
+            idle = not session.busy
+        if idle:
+            await run_io(session.close)
+        return True
+
+    async def reap(self):
+        now = time.time()
+        for doc_id in [s.id for s in self.sessions.values()
+                       if not s.busy and now - s.last_used > self.ttl]:
+            await self.close(doc_id)
+
+    def start(self):
+        async def loop():
+            while True:
+                await asyncio.sleep(REAP_INTERVAL)
+                await self.reap()
+        self._reaper = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        for doc_id in list(self.sessions):
+            await self.close(doc_id)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+from collections import OrderedDict
+from uuid import uuid4
+
+import fitz
+
+from common.admission import check_pages
+from common.auto_crop import crop_key, detect_margins
+from block_index import INDEX_VERSION, BlockIndex, build_index
+from common.heading_classifier import heading_key, make_classifier
+from common.outline import outline_key, read_outline
+from convert_doc import convert_docs_to_pdf
+from docx_extract import docx_key, extract_docx, use_native
+from common.executors import run_io, run_office, run_render
+from common.metrics import PAGES_PROCESSED, file_type, set_file
+from office_pool import OFFICE_INSTANCES
+from common.pipeline import Stage, run_pipeline
+from process import EXTRACTOR_VERSION
+from common.process_pool import collect_results, extract_stage, lookup_results, no_progress, preload, run_in_pool
+from common.result_cache import get_cache, file_sha256
+from common.scheduler import demote_if_large
+from common.sections import count_pages, merge_sections, page_ranges, write_csv
+from common.storage import discard
+from common.upload_util import UPLOAD_DIR, remove_quietly
+
+# 批处理流水线转换阶段的并发数：同时占用的 LibreOffice 实例数，以及每次交给一个实例的文件数上限
+CONVERT_WORKERS = int(os.environ.get("CONVERT_WORKERS", OFFICE_INSTANCES))
+CONVERT_BATCH = int(os.environ.get("CONVERT_BATCH", "4"))
+# 内存中保留最近使用的文档索引个数（2000 页约 2 MB），同一文档换裁剪参数时直接命中
+INDEX_MEMORY = int(os.environ.get("INDEX_MEMORY", "8"))
+
+_indexes = OrderedDict()  # digest -> BlockIndex
+
+# 子进程执行的分片解析与 .docx 解析
+preload("block_index", "docx_extract")
+
+
+async def load_index(pdf_path, digest, on_pages=None):
+    """
+    取得文档的 BlockIndex：依次查内存、磁盘缓存；都未命中时按页范围切片，
+    每个分片在各自的子进程中解析，拼接后写回缓存。
+    on_pages(pages_done, pages_total) 在得知总页数及每个分片完成时回调。
+    """
+    index = _indexes.get(digest)
+    cache = get_cache()
+    key = cache.make_key(digest, "index", INDEX_VERSION)
+    index_path = os.path.join(UPLOAD_DIR, f"{uuid4().hex}_index.npz")
+
+    if index is None:
+        index = await run_io(_load_cached_index, cache, key, index_path)
+
+    if index is None:
+        page_count = await run_render(count_pages, pdf_path)
+        check_pages(page_count)
+        demote_if_large(page_count)
+        set_file(pages=page_count)
+        pages_done = 0
+        if on_pages:
+            on_pages(pages_done, page_count)
+
+        async def run_shard(start, stop):
+            nonlocal pages_done
+            part = await run_in_pool(build_index, pdf_path, start, stop)
+            pages_done += stop - start
+            if on_pages:
+                on_pages(pages_done, page_count)
+            return part
+
+        parts = await asyncio.gather(*[
+            run_shard(start, stop) for start, stop in page_ranges(page_count)
+        ])
+        index = BlockIndex.concat(parts)
+        await run_io(_save_index, index, cache, key, index_path)
+    elif on_pages:
+        on_pages(index.stop, index.stop)
+
+    _indexes[digest] = index
+    _indexes.move_to_end(digest)
+    while len(_indexes) > INDEX_MEMORY:
+        _indexes.popitem(last=False)
+    return index
+
+
+def _load_cached_index(cache, key, index_path):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    if cache.get(key, index_path) is None:
+        return None
+    try:
+        return BlockIndex.load(index_path)
+    finally:
+        remove_quietly(index_path)
+
+
+def _save_index(index, cache, key, index_path):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    index.save(index_path)
+    cache.put(key, index_path)
+    remove_quietly(index_path)
+
+
+async def extract_in_pool(pdf_path, top_cm, bottom_cm, filename, on_pages=None, digest=None):
+    """
+    大文档首次处理时按页范围切片建立与裁剪无关的索引（见 load_index），
+    之后按裁剪参数在索引上过滤，输出与串行提取一致。
+    """
+    if digest is None:
+        digest = await run_io(file_sha256, pdf_path)
+    index = await load_index(pdf_path, digest, on_pages)
+    set_file(pages=index.stop - index.start)
+    if "auto" in (top_cm, bottom_cm):
+        # 自动裁剪：按抽样检测出的各页面尺寸的页眉页脚高度，换成逐页的裁剪距离
+        margins = await run_render(detect_margins, pdf_path)
+        top_cm, bottom_cm = margins.resolve(top_cm, bottom_cm, *index.page_sizes())
+    entries = await run_render(outline_entries, pdf_path)
+    if entries:
+        # 带书签的文档直接按书签切分章节，标题层级与书签一致
+        sections = await run_render(index.extract_outline, entries, top_cm, bottom_cm, pdf_path)
+    else:
+        part = await run_render(
+            index.extract, index.start, index.stop, top_cm, bottom_cm, pdf_path, make_classifier())
+        sections = merge_sections([part])
+    csv_path = await run_io(write_csv, sections, filename)
+    PAGES_PROCESSED.inc(index.stop - index.start, file_type=file_type(filename or pdf_path))
+    return csv_path
+
+
+def outline_entries(pdf_path):
+    with fitz.open(pdf_path) as pdf:
+        return read_outline(pdf)
+
+
+def is_word(filename):
+    return filename.rsplit(".", 1)[-1].lower() in ("doc", "docx")
+
+
+async def convert_in_office(paths):
+    """
+    LibreOffice 转换是子进程等待型任务，放在 office 线程池里调用常驻实例池；
+    多个文件按实例数分组，每组在一个实例上一次性转换，返回顺序与 paths 一致。
+    """
+    if not paths:
+        return []
+    groups = [paths[i::OFFICE_INSTANCES] for i in range(OFFICE_INSTANCES)]
+    results = await asyncio.gather(*[
+        run_office(convert_docs_to_pdf, group) for group in groups if group
+    ])
+    pdf_paths = [None] * len(paths)
+    for i, converted in enumerate(results):
+        pdf_paths[i::OFFICE_INSTANCES] = converted
+    return pdf_paths
+
+
+async def iter_saved_files(paths, top_cm, bottom_cm, filenames, progress=no_progress, digests=None):
+    """
+    批量处理已落盘的上传文件：先查结果缓存，未命中的 .docx 直接解析，.doc 分组转 PDF，转换与提取流水线并行。
+    按完成先后产出 (上传序号, CSV 路径)，缓存命中的最先产出，便于边处理边发送结果。
+    progress(index, **fields) 用于上报单个文件的状态与页数进度。
+    digests 为落盘时已算好的 SHA-256，缺省时再读一遍文件计算。
+    """
+    cache = get_cache()
+    if digests is None:
+        digests = await asyncio.gather(*[run_io(file_sha256, path) for path in paths])
+    native = await run_io(lambda: [use_native(path) for path in paths])
+    keys = [cache.make_key(digest, *docx_key()) if is_docx else
+            cache.make_key(digest, "csv", EXTRACTOR_VERSION, *crop_key(top_cm, bottom_cm), *heading_key(), *outline_key())
+            for digest, is_docx in zip(digests, native)]
+    hits, todo = await lookup_results(keys, filenames, progress)
+    for result in hits:
+        yield result
+
+    # 按落盘路径的后缀判断：文档会话里的 .doc 已经转换成 PDF，不需要再转
+    word_index = {i for i in todo if is_word(paths[i]) and not native[i]}
+    for i in word_index:
+        progress(i, state="converting")
+    pdf_paths = list(paths)
+    converted = []
+
+    async def convert(group):
+        # 一组 .doc 在一个 LibreOffice 实例上一次性转换，转完即进入提取阶段，不等其它组
+        results = await run_office(convert_docs_to_pdf, [paths[i] for i in group])
+        for i, pdf_path in zip(group, results):
+            pdf_paths[i] = pdf_path
+            converted.append(pdf_path)
+        return group
+
+    async def extract(i):
+        if native[i]:
+            # .docx 自带标题样式和编号，直接解析 XML，不经过 LibreOffice 和 PDF
+            return await run_in_pool(extract_docx, paths[i], filenames[i])
+        return await extract_in_pool(
+            pdf_paths[i], top_cm, bottom_cm, filenames[i],
+            on_pages=lambda done, total: progress(i, pages_done=done, pages_total=total),
+            digest=digests[i])
+
+    # 转换 → 提取两个阶段同时运行，PDF / .docx 直接进入提取阶段，不等 Word 转换；
+    # 调用方（边收边打包的 ZIP 流）是第三个阶段。出错或调用方提前停止迭代（如客户端断开下载）时取消其余文件
+    stages = [
+        Stage("convert", convert, CONVERT_WORKERS, CONVERT_BATCH, accepts=lambda i: i in word_index),
+        extract_stage(extract, keys, filenames, progress),
+    ]
+    try:
+        async for result in run_pipeline(todo, stages):
+            yield result
+    finally:
+        # Word 转换的中间目录用完即删
+        await run_io(lambda: [discard(os.path.dirname(pdf_path)) for pdf_path in converted])
+
+
+async def process_saved_files(paths, top_cm, bottom_cm, filenames, progress=no_progress, digests=None):
+    """同 iter_saved_files，全部完成后返回与上传顺序一致的 CSV 路径列表"""
+    return await collect_results(
+        iter_saved_files(paths, top_cm, bottom_cm, filenames, progress, digests), len(paths))